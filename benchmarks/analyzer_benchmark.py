@@ -0,0 +1,51 @@
+"""
+Measures the semantic analysis time of generated programs with standard
+libraries of different sizes, and with the function bodies analyzed by
+worker processes. Run it from the repository root:
+
+    python -m benchmarks.analyzer_benchmark
+"""
+import timeit
+from upl import lexer, parser, semantic_analyzer
+from upl.parallel_analysis import ParallelSemanticAnalyzer
+from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode
+from benchmarks.compile_cache_benchmark import EXTERNAL_FUNCS,\
+                                               generated_program
+
+
+def generated_stdlib(functions):
+    return EXTERNAL_FUNCS + [
+        FuncDefAnalyzeNode("lib%d" % (i, ), [BasicType.Int], BasicType.Int)
+        for i in range(functions)]
+
+
+def generated_literals(literals):
+    return "\n".join("def k%d = %d * 2;" % (i, i) for i in range(literals))
+
+
+def run(name, program, stdlib):
+    tree = parser.Parser(lexer.tokenize_program(program)).parse()
+    analyze = lambda: semantic_analyzer.SemanticAnalyzer(tree,
+                                                         stdlib).analyze()
+    seconds = min(timeit.repeat(analyze, number=1, repeat=3))
+    print("%-24s stdlib=%-6d %.4fs" % (name, len(stdlib), seconds))
+
+
+def run_parallel(program, max_workers):
+    tree = parser.Parser(lexer.tokenize_program(program)).parse()
+    analyze = lambda: ParallelSemanticAnalyzer(tree, EXTERNAL_FUNCS,
+                                               max_workers).analyze()
+    seconds = min(timeit.repeat(analyze, number=1, repeat=3))
+    print("parallel workers=%-7d %.4fs" % (max_workers, seconds))
+
+
+if __name__ == "__main__":
+    for functions in (100, 1000):
+        for stdlib_size in (0, 1000):
+            run("functions=%d" % (functions, ), generated_program(functions),
+                generated_stdlib(stdlib_size))
+    for literals in (1000, 3000):
+        run("literals=%d" % (literals, ), generated_literals(literals),
+            generated_stdlib(0))
+    for max_workers in (1, 2, 4):
+        run_parallel(generated_program(5000), max_workers)
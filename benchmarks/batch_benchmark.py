@@ -0,0 +1,46 @@
+"""
+Compares batch evaluation of a scoring function over NumPy columns with
+calling it row by row. Requires numpy. Run it from the repository root:
+
+    python -m benchmarks.batch_benchmark
+"""
+import timeit
+from upl import lexer, parser, semantic_analyzer
+from upl.python_compiler import PythonCompiler
+from upl.batch import BatchEvaluator, numpy
+from benchmarks.executor_benchmark import EXTERNAL_FUNCS
+
+PROGRAM = """
+def score = (a: int, b: int) -> int {
+ if a < b then a + b + b else (if b < 0 then 0 - b else a - b);
+}
+"""
+
+
+def run(rows):
+    tokens = lexer.tokenize_program(PROGRAM)
+    parse_tree = parser.Parser(tokens).parse()
+    consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                       EXTERNAL_FUNCS).analyze()
+    random = numpy.random.RandomState(0)
+    a = random.randint(-1000, 1000, rows)
+    b = random.randint(-1000, 1000, rows)
+
+    compiler = PythonCompiler(consts, funcs)
+    evaluator = BatchEvaluator(consts, funcs)
+    score = funcs[0]
+
+    per_row = lambda: [compiler.call(score, [x, y])
+                       for x, y in zip(a.tolist(), b.tolist())]
+    batch = lambda: evaluator.call_batch(score, [a, b])
+    assert batch().tolist() == per_row()
+
+    row_seconds = min(timeit.repeat(per_row, number=1, repeat=3))
+    batch_seconds = min(timeit.repeat(batch, number=1, repeat=3))
+    print("rows=%-8d per row %.4fs  batch %.4fs  x%.1f" %
+          (rows, row_seconds, batch_seconds, row_seconds / batch_seconds))
+
+
+if __name__ == "__main__":
+    for rows in (10000, 100000, 1000000):
+        run(rows)
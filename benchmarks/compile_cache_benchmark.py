@@ -0,0 +1,48 @@
+"""
+Compares compiling a generated program from source with loading it from the
+compile cache. Run it from the repository root:
+
+    python -m benchmarks.compile_cache_benchmark
+"""
+import operator
+import shutil
+import tempfile
+import timeit
+from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode
+from upl.compile_cache import CompileCache, analyze_program
+
+EXTERNAL_FUNCS = [
+    FuncDefAnalyzeNode(name, [BasicType.Int, BasicType.Int], return_type,
+                       implementation, pure=True)
+    for name, return_type, implementation in (
+        ("+", BasicType.Int, operator.add),
+        ("*", BasicType.Int, operator.mul),
+        ("<", BasicType.Bool, operator.lt),
+    )
+]
+
+
+def generated_program(functions):
+    return "\n".join(
+        "def f%d = (a: int, b: int) -> int { if a < b then a * %d + b "
+        "else b * (a + %d); };" % (i, i, i) for i in range(functions))
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    try:
+        for functions in (10, 100, 1000):
+            program = generated_program(functions)
+            CompileCache(directory).compile(program, EXTERNAL_FUNCS)
+
+            compile_seconds = min(timeit.repeat(
+                lambda: analyze_program(program, EXTERNAL_FUNCS),
+                number=1, repeat=3))
+            cached_seconds = min(timeit.repeat(
+                lambda: CompileCache(directory).compile(program,
+                                                        EXTERNAL_FUNCS),
+                number=1, repeat=3))
+            print("functions=%-5d compile %.4fs  cached %.4fs" %
+                  (functions, compile_seconds, cached_seconds))
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,44 @@
+"""
+Compares compiling an edited version of a generated program from source with
+compiling it in a CompilerSession which compiled the previous version. Each
+edit changes the body of one function in the middle of the program, or
+inserts a line before it. Run it from the repository root:
+
+    python -m benchmarks.compiler_session_benchmark
+"""
+import timeit
+from upl.compile_cache import analyze_program
+from upl.compiler_session import CompilerSession
+from benchmarks.compile_cache_benchmark import EXTERNAL_FUNCS,\
+                                               generated_program
+
+
+def edited_versions(functions, edit):
+    program = generated_program(functions)
+    line = "def f%d = " % (functions // 2, )
+    if edit == "body":
+        return [program.replace(line + "(a: int, b: int) -> int { if a < b",
+                                line + "(a: int, b: int) -> int { if b < a"),
+                program]
+    return [program.replace(line, "\n" + line), program]
+
+
+if __name__ == "__main__":
+    for functions in (100, 1000):
+        for edit in ("body", "insert"):
+            versions = edited_versions(functions, edit)
+
+            compile_seconds = min(timeit.repeat(
+                lambda: [analyze_program(version, EXTERNAL_FUNCS)
+                         for version in versions],
+                number=1, repeat=3))
+
+            session = CompilerSession(EXTERNAL_FUNCS)
+            session.compile(versions[-1])
+            session_seconds = min(timeit.repeat(
+                lambda: [session.compile(version) for version in versions],
+                number=1, repeat=3))
+
+            print("functions=%-5d edit=%-7s compile %.4fs  session %.4fs" %
+                  (functions, edit, compile_seconds / len(versions),
+                   session_seconds / len(versions)))
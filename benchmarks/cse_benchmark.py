@@ -0,0 +1,68 @@
+"""
+Compares running a generated function with repeated subexpressions before
+and after common subexpression elimination, and the number of distinct
+nodes it keeps in memory. Run it from the repository root:
+
+    python -m benchmarks.cse_benchmark
+"""
+import operator
+import timeit
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode
+from upl.interpreter import Interpreter
+from upl.python_compiler import PythonCompiler
+from upl.bytecode import BytecodeVM
+from upl.cse import ExpressionInterner, get_children
+
+EXTERNAL_FUNCS = [
+    FuncDefAnalyzeNode(name, [BasicType.Int, BasicType.Int], return_type,
+                       implementation, pure=True)
+    for name, return_type, implementation in (
+        ("+", BasicType.Int, operator.add),
+        ("*", BasicType.Int, operator.mul),
+        ("<", BasicType.Bool, operator.lt),
+    )
+]
+
+
+def generated_rule(terms):
+    term = "(if a * b < c then a * b * c else c * (a * b))"
+    return "def f = (a: int, b: int, c: int) -> int { %s; };" %\
+           (" + ".join([term] * terms), )
+
+
+def get_unique_nodes(node, visited):
+    if node not in visited:
+        visited.add(node)
+        for child in get_children(node):
+            get_unique_nodes(child, visited)
+    return visited
+
+
+def analyze(program):
+    tokens = lexer.tokenize_program(program)
+    parse_tree = parser.Parser(tokens).parse()
+    return semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                              EXTERNAL_FUNCS).analyze()
+
+
+def run(name, terms, consts, funcs):
+    nodes = len(get_unique_nodes(funcs[0].body, set()))
+    results = []
+    for engine in (Interpreter, BytecodeVM, PythonCompiler):
+        executor = engine(consts, funcs)
+        call = lambda: executor.call(funcs[0], [3, 4, 20])
+        results.append(call())
+        seconds = min(timeit.repeat(call, number=100, repeat=3))
+        print("terms=%-4d %-8s %-15s nodes=%-5d %.4fs" %
+              (terms, name, engine.__name__, nodes, seconds))
+    return results
+
+
+if __name__ == "__main__":
+    for terms in (10, 50):
+        program = generated_rule(terms)
+        before = run("tree", terms, *analyze(program))
+        after = run("dag", terms,
+                    *ExpressionInterner(*analyze(program)).intern())
+        assert before == after
@@ -0,0 +1,65 @@
+"""
+Compares the engines which run analyzed programs on the recursive fib
+function from main.py. Run it from the repository root:
+
+    python -m benchmarks.executor_benchmark
+"""
+import operator
+import timeit
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode
+from upl.interpreter import Interpreter
+from upl.python_compiler import PythonCompiler
+from upl.bytecode import BytecodeVM
+
+PROGRAM = """
+def fib = (n: int) -> int {
+ if n < 2 then n else fib(n - 1) + fib(n - 2);
+}
+"""
+
+EXTERNAL_FUNCS = [
+    FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int], BasicType.Int,
+                       operator.add, pure=True),
+    FuncDefAnalyzeNode("-", [BasicType.Int, BasicType.Int], BasicType.Int,
+                       operator.sub, pure=True),
+    FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int], BasicType.Bool,
+                       operator.lt, pure=True),
+]
+
+ENGINES = (
+    ("interpreter", Interpreter, {}),
+    ("bytecode", BytecodeVM, {}),
+    ("python", PythonCompiler, {}),
+    ("memoized", Interpreter, {"memoize": True}),
+)
+
+
+def run(n, engines):
+    tokens = lexer.tokenize_program(PROGRAM)
+    parse_tree = parser.Parser(tokens).parse()
+    consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                       EXTERNAL_FUNCS).analyze()
+    baseline = None
+    results = []
+    for name, engine, options in engines:
+        executor = engine(consts, funcs, **options)
+        fib = executor.get_function("fib")
+
+        def call():
+            # Memoized results must not carry over between runs.
+            for cache in executor.caches.values():
+                cache.clear()
+            return executor.call(fib, [n])
+
+        results.append(call())
+        seconds = min(timeit.repeat(call, number=1, repeat=3))
+        baseline = baseline or seconds
+        print("fib(%d) %-12s %.4fs  x%.1f" %
+              (n, name, seconds, baseline / seconds))
+    assert all(result == results[0] for result in results)
+
+
+if __name__ == "__main__":
+    for n in (15, 20, 22):
+        run(n, ENGINES)
@@ -0,0 +1,37 @@
+"""
+Compares the lexer engines on a generated program. Run it from the
+repository root:
+
+    python -m benchmarks.lexer_benchmark
+"""
+import sys
+import timeit
+from upl import lexer
+
+
+def generate_program(functions, terms):
+    lines = []
+    for i in range(functions):
+        body = " + ".join("a * %d - f%d(b, 1.5e-3)" % (j, j) for j in range(terms))
+        lines.append("def f%d = (a: int, b: real) -> int { %s; } # rule %d"
+                     % (i, body, i))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # The recursive engine recurses once per token, so long lines need room.
+    sys.setrecursionlimit(100000)
+
+    for terms in (10, 100, 400):
+        program = generate_program(50, terms)
+        regex_tokens = lexer.tokenize_program(program, "regex")
+        recursive_tokens = lexer.tokenize_program(program, "recursive")
+        assert [(t.type, t.value, t.location) for t in regex_tokens] ==\
+               [(t.type, t.value, t.location) for t in recursive_tokens]
+
+        for engine in ("recursive", "regex"):
+            seconds = min(timeit.repeat(
+                lambda: lexer.tokenize_program(program, engine),
+                number=1, repeat=3))
+            print("%-9s terms/line=%-4d tokens=%-7d %.4fs" %
+                  (engine, terms, len(regex_tokens), seconds))
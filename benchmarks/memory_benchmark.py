@@ -0,0 +1,63 @@
+"""
+Measures the memory taken by the parse tree and the analyzed functions of a
+large generated program, and the average footprint of a node. Run it from the
+repository root:
+
+    python -m benchmarks.memory_benchmark
+"""
+import gc
+import tracemalloc
+from upl import lexer, parser, semantic_analyzer
+from upl.cse import get_children
+from benchmarks.compile_cache_benchmark import EXTERNAL_FUNCS,\
+                                               generated_program
+
+
+def count_parse_nodes(node):
+    count = 1
+    for name in ("statements", "arg_list", "args"):
+        for child in getattr(node, name, ()):
+            count += count_parse_nodes(child)
+    for name in ("expression", "condition", "on_true", "on_false",
+                 "left_operand", "right_operand", "operand"):
+        child = getattr(node, name, None)
+        if child is not None:
+            count += count_parse_nodes(child)
+    return count
+
+
+def count_analyze_nodes(node, visited):
+    if node not in visited:
+        visited.add(node)
+        for child in get_children(node):
+            count_analyze_nodes(child, visited)
+    return len(visited)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    for functions in (1000, 5000):
+        tokens = lexer.tokenize_program(generated_program(functions))
+
+        tree, size = measure(lambda: parser.Parser(tokens).parse())
+        nodes = count_parse_nodes(tree)
+        print("functions=%-6d parse tree    nodes=%-7d %10d bytes %6.1f bytes/node"
+              % (functions, nodes, size, size / float(nodes)))
+
+        analyzed, size = measure(lambda: semantic_analyzer.SemanticAnalyzer(
+            tree, EXTERNAL_FUNCS).analyze())
+        visited = set()
+        for func_def in analyzed[1]:
+            count_analyze_nodes(func_def.body, visited)
+        nodes = len(visited) + len(analyzed[1])
+        print("functions=%-6d analyze tree  nodes=%-7d %10d bytes %6.1f bytes/node"
+              % (functions, nodes, size, size / float(nodes)))
@@ -0,0 +1,53 @@
+"""
+Compares running a function with constant subexpressions before and after
+the optimizer. Run it from the repository root:
+
+    python -m benchmarks.optimizer_benchmark
+"""
+import operator
+import timeit
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode
+from upl.interpreter import Interpreter
+from upl.optimizer import Optimizer, get_node_count
+
+PROGRAM = """
+def f = (n: int) -> int {
+ def scale = 60 * 60 * 24;
+ def offset = (1 + 2) * (3 + 4) - 0;
+ if 1 < 2 then n * scale + offset * 1 else n - scale;
+}
+"""
+
+EXTERNAL_FUNCS = [
+    FuncDefAnalyzeNode(name, [BasicType.Int, BasicType.Int], return_type,
+                       implementation, pure=True, foldable=True)
+    for name, return_type, implementation in (
+        ("+", BasicType.Int, operator.add),
+        ("-", BasicType.Int, operator.sub),
+        ("*", BasicType.Int, operator.mul),
+        ("<", BasicType.Bool, operator.lt),
+    )
+]
+
+
+def analyze():
+    tokens = lexer.tokenize_program(PROGRAM)
+    parse_tree = parser.Parser(tokens).parse()
+    return semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                              EXTERNAL_FUNCS).analyze()
+
+
+def run(name, consts, funcs):
+    interpreter = Interpreter(consts, funcs)
+    call = lambda: [interpreter.call(funcs[0], [n]) for n in range(10000)]
+    seconds = min(timeit.repeat(call, number=1, repeat=3))
+    print("%-10s nodes=%-3d %.4fs" %
+          (name, get_node_count(funcs[0].body), seconds))
+    return call()
+
+
+if __name__ == "__main__":
+    before = run("analyzed", *analyze())
+    after = run("optimized", *Optimizer(*analyze()).optimize())
+    assert before == after
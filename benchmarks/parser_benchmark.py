@@ -0,0 +1,87 @@
+"""
+Compares parser modes on deeply nested generated expressions, reporting
+parse time and the peak memory allocated while parsing. Run it from the
+repository root:
+
+    python -m benchmarks.parser_benchmark
+"""
+import sys
+import timeit
+import tracemalloc
+from upl import lexer, parser
+from upl.exceptions import ParserException
+
+
+def nested_unary(depth):
+    return "-(" * depth + "1" + ")" * depth + ";"
+
+
+def nested_calls(depth):
+    return "f(1, " * depth + "2" + ")" * depth + ";"
+
+
+def long_sum(terms):
+    return " + ".join("(a * %d)" % (i, ) for i in range(terms)) + ";"
+
+
+def failing_terms(terms):
+    return " + ".join(["- (x * - y)"] * terms) + ";"
+
+
+def peak_allocation(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(name, program, modes):
+    tokens = lexer.tokenize_program(program)
+    trees = []
+    for mode, options in modes:
+        parse = lambda: parser.Parser(tokens, **options).parse()
+        trees.append(parse().to_dict())
+        seconds = min(timeit.repeat(parse, number=1, repeat=3))
+        peak = peak_allocation(parse)
+        print("%-16s %-12s tokens=%-6d %.4fs  peak=%8.1f KiB" %
+              (name, mode, len(tokens), seconds, peak / 1024.0))
+    assert all(tree == trees[0] for tree in trees)
+
+
+def run_failing(name, program, modes):
+    tokens = lexer.tokenize_program(program)
+    for mode, options in modes:
+        def parse():
+            try:
+                parser.Parser(tokens, **options).parse()
+            except ParserException:
+                pass
+        seconds = min(timeit.repeat(parse, number=1, repeat=3))
+        print("%-16s %-12s tokens=%-6d %.4fs" %
+              (name, mode, len(tokens), seconds))
+
+
+if __name__ == "__main__":
+    sys.setrecursionlimit(100000)
+
+    modes = (
+        ("list slices", {"token_window": False}),
+        ("token window", {"precedence_climbing": False}),
+        ("precedence", {}),
+    )
+
+    for depth in (100, 200, 400):
+        run("unary depth=%d" % (depth, ), nested_unary(depth), modes)
+        run("calls depth=%d" % (depth, ), nested_calls(depth), modes)
+    for terms in (100, 200):
+        run("sum terms=%d" % (terms, ), long_sum(terms), modes)
+
+    failing_modes = (
+        ("cascade", {"precedence_climbing": False}),
+        ("packrat", {"precedence_climbing": False, "packrat": True}),
+    )
+    for terms in (8, 10, 12):
+        run_failing("failing terms=%d" % (terms, ), failing_terms(terms),
+                    failing_modes)
@@ -0,0 +1,43 @@
+"""
+Compares the size and speed of the binary encoding of parse trees and
+analyzed programs with dumping to_dict() as JSON. Run it from the repository
+root:
+
+    python -m benchmarks.serialization_benchmark
+"""
+import json
+import timeit
+from upl import lexer, parser
+from upl.serialization import dump_parse_tree, load_parse_tree,\
+                              dump_analyzed, load_analyzed
+from upl.compile_cache import analyze_program
+from benchmarks.compile_cache_benchmark import EXTERNAL_FUNCS,\
+                                               generated_program
+
+
+def measure(func):
+    return min(timeit.repeat(func, number=1, repeat=3))
+
+
+if __name__ == "__main__":
+    for functions in (100, 1000):
+        program = generated_program(functions)
+        tree = parser.Parser(lexer.tokenize_program(program)).parse()
+        consts, func_defs = analyze_program(program, EXTERNAL_FUNCS)
+
+        text = json.dumps(tree.to_dict())
+        data = dump_parse_tree(tree)
+        print("functions=%-5d parse tree  json %8d bytes %.4fs  "
+              "binary %8d bytes dump %.4fs load %.4fs" %
+              (functions, len(text), measure(lambda: json.dumps(tree.to_dict())),
+               len(data), measure(lambda: dump_parse_tree(tree)),
+               measure(lambda: load_parse_tree(data))))
+
+        text = json.dumps([f.to_dict() for f in func_defs])
+        data = dump_analyzed(consts, func_defs)
+        print("functions=%-5d analyzed    json %8d bytes %.4fs  "
+              "binary %8d bytes dump %.4fs load %.4fs" %
+              (functions, len(text),
+               measure(lambda: json.dumps([f.to_dict() for f in func_defs])),
+               len(data), measure(lambda: dump_analyzed(consts, func_defs)),
+               measure(lambda: load_analyzed(data, EXTERNAL_FUNCS))))
@@ -1,6 +1,8 @@
-from upl import lexer, parser, semantic_analyzer
+from upl import lexer, parser, semantic_analyzer, optimizer
+from upl.interpreter import Interpreter
 from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode
 import json
+import operator
 
 if __name__ == "__main__":
     
@@ -11,15 +13,21 @@ if __name__ == "__main__":
     """
 
     external_funcs = [
-        FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int], BasicType.Int),
-        FuncDefAnalyzeNode("-", [BasicType.Int, BasicType.Int], BasicType.Int),
-        FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int], BasicType.Bool),
+        FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int], BasicType.Int,
+                           operator.add, pure=True, foldable=True),
+        FuncDefAnalyzeNode("-", [BasicType.Int, BasicType.Int], BasicType.Int,
+                           operator.sub, pure=True, foldable=True),
+        FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int], BasicType.Bool,
+                           operator.lt, pure=True, foldable=True),
     ]
 
     tokens = lexer.tokenize_program(program)
     parse_tree = parser.Parser(tokens).parse()
     consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree, external_funcs).analyze()
+    consts, funcs = optimizer.Optimizer(consts, funcs).optimize()
     for func in funcs:
-        print json.dumps(func.to_dict(), indent=2)
-        print ""
+        print(json.dumps(func.to_dict(), indent=2))
+        print("")
 
+    interpreter = Interpreter(consts, funcs, memoize=True)
+    print("fib(20) = %d" % (interpreter.call(interpreter.get_function("fib"), [20]), ))
@@ -0,0 +1,124 @@
+import unittest
+from tests_common import UPLTestCase
+from interpreter_tests import STDLIB, FIB
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.exceptions import RuntimeException
+from upl.batch import BatchEvaluator, numpy
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatchEvaluator(UPLTestCase):
+    def test_arithmetic(self):
+        self.checkBatch("def f = (a: int, b: int) -> int { a * 2 - b; };",
+                        "f", [[1, 2, 3], [3, 2, 1]], [-1, 2, 5])
+
+    def test_real_and_bool_columns(self):
+        self.checkBatch("def f = (a: real) -> real { a + 0.5; };",
+                        "f", [[1.0, 2.0]], [1.5, 2.5])
+        self.checkBatch("def f = (a: int) -> bool { a < 2; };",
+                        "f", [[1, 2, 3]], [True, False, False])
+
+    def test_constant_function(self):
+        self.checkBatch("""
+            def one = () -> int { 1; };
+            def f = (a: int) -> int { a + one(); };
+        """, "f", [[1, 2]], [2, 3])
+
+    def test_conditional(self):
+        self.checkBatch("""
+            def f = (a: int) -> int { if a < 2 then a * 10 else -a; };
+        """, "f", [[0, 1, 2, 3]], [0, 10, -2, -3])
+
+    def test_conditional_evaluates_taken_rows_only(self):
+        rows = []
+
+        def trace(value):
+            rows.append(value)
+            return value
+
+        stdlib = STDLIB + (
+            FuncDefAnalyzeNode("trace", [BasicType.Int], BasicType.Int, trace),
+        )
+        self.checkBatch("""
+            def f = (a: int) -> int { if a < 2 then a else trace(a); };
+        """, "f", [[0, 5, 1, 7]], [0, 5, 1, 7], stdlib)
+        self.assertEqual(rows, [5, 7])
+
+    def test_recursive_function_runs_per_row(self):
+        evaluator = self.makeEvaluator(FIB + """;
+            def g = (n: int) -> int { fib(n) + 1; };
+        """)
+        fib, g = evaluator.func_defs
+        self.assertEqual(evaluator.recursive_functions, set([fib]))
+        self.checkValues(evaluator.call_batch(g, [[1, 5, 10]]), [2, 6, 56])
+
+    def test_mutual_recursion(self):
+        evaluator = self.makeEvaluator("""
+            def even = (n: int) -> bool { if n < 1 then true else odd(n - 1); };
+            def odd = (n: int) -> bool { if n < 1 then false else even(n - 1); };
+            def h = (n: int) -> int { n * 2; };
+        """)
+        even, odd, h = evaluator.func_defs
+        self.assertEqual(evaluator.recursive_functions, set([even, odd]))
+        self.checkValues(evaluator.call_batch(even, [[0, 1, 4]]),
+                         [True, False, True])
+
+    def test_custom_ufunc(self):
+        double = lambda a: a * 2
+        stdlib = STDLIB + (
+            FuncDefAnalyzeNode("double", [BasicType.Int], BasicType.Int,
+                               double),
+        )
+        evaluator = self.makeEvaluator(
+            "def f = (a: int) -> int { double(a) + 1; };", stdlib,
+            ufuncs={double: lambda column: column * 2})
+        self.checkValues(evaluator.call_batch(evaluator.func_defs[0],
+                                              [numpy.arange(4)]),
+                         [1, 3, 5, 7])
+
+    def test_external_without_ufunc(self):
+        stdlib = STDLIB + (
+            FuncDefAnalyzeNode("double", [BasicType.Int], BasicType.Int,
+                               lambda a: a * 2),
+        )
+        self.checkBatch("def f = (a: int) -> int { double(a) + 1; };",
+                        "f", [[1, 2]], [3, 5], stdlib)
+
+    def test_matches_row_by_row(self):
+        program = """
+            def f = (a: int, b: int) -> int {
+                if a < b then (if b - a < 3 then a * b else b) else a - b;
+            };
+        """
+        evaluator = self.makeEvaluator(program)
+        f = evaluator.func_defs[0]
+        a = numpy.arange(-10, 10).repeat(20)
+        b = numpy.tile(numpy.arange(-10, 10), 20)
+        expected = [evaluator.call(f, [x, y])
+                    for x, y in zip(a.tolist(), b.tolist())]
+        self.checkValues(evaluator.call_batch(f, [a, b]), expected)
+
+    def test_errors(self):
+        evaluator = self.makeEvaluator(
+            "def f = (a: int, b: int) -> int { a + b; };")
+        f = evaluator.func_defs[0]
+        with self.assertRaises(RuntimeException):
+            evaluator.call_batch(f, [[1, 2]])
+        with self.assertRaises(RuntimeException):
+            evaluator.call_batch(f, [[1, 2], [1]])
+
+    def makeEvaluator(self, program, stdlib=STDLIB, **options):
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                           stdlib).analyze()
+        return BatchEvaluator(consts, funcs, **options)
+
+    def checkValues(self, values, expected):
+        self.assertIsInstance(values, numpy.ndarray)
+        self.assertEqual(values.tolist(), expected)
+
+    def checkBatch(self, program, name, columns, expected, stdlib=STDLIB):
+        evaluator = self.makeEvaluator(program, stdlib)
+        func = evaluator.get_function(name)
+        self.checkValues(evaluator.call_batch(func, columns), expected)
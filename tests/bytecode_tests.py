@@ -0,0 +1,45 @@
+import unittest
+import operator
+import interpreter_tests
+from upl.bytecode import BytecodeVM
+
+class TestBytecodeVM(interpreter_tests.TestInterpreter):
+    executor = BytecodeVM
+
+    def test_code(self):
+        vm = self.makeInterpreter("""
+            def f = (a: int) -> int { if a < 2 then a else f(a - 1); };
+        """)
+        function = vm.functions[0]
+        one = function.const_registers[vm.constants.index(1)]
+        two = function.const_registers[vm.constants.index(2)]
+        self.assertEqual(function.disassemble(), [
+            ("CALL_EXTERNAL", 3, 1, 2, 0, two),
+            ("JUMP_IF_FALSE", 3, 11),
+            ("RETURN", 0),
+            ("CALL_EXTERNAL", 3, 2, 2, 0, one),
+            ("LOAD_ARG", 0, 3),
+            ("JUMP", 0),
+        ])
+        self.assertEqual(function.template[one - 1], 1)
+        self.assertEqual(function.template[two - 1], 2)
+
+    def test_call_code(self):
+        vm = self.makeInterpreter("""
+            def f = (a: int) -> int { if a < 2 then a else f(a - 1) + 1; };
+        """)
+        function = vm.functions[0]
+        one = function.const_registers[vm.constants.index(1)]
+        add = vm.functions.index(operator.add)
+        sub = vm.functions.index(operator.sub)
+        self.assertEqual(function.disassemble()[3:], [
+            ("CALL_EXTERNAL", 5, sub, 2, 0, one),
+            ("CALL", 4, 0, 1, 5),
+            ("CALL_EXTERNAL", 3, add, 2, 4, one),
+            ("RETURN", 3),
+        ])
+
+    def test_deep_recursion(self):
+        self.checkResult("""
+            def f = (a: int) -> int { if a < 1 then 0 else f(a - 1) + 1; };
+        """, "f", [100000], 100000)
@@ -0,0 +1,117 @@
+import unittest
+import os
+import shutil
+import tempfile
+from interpreter_tests import STDLIB, FIB
+from upl import lexer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.compile_cache import CompileCache, get_cache_key
+from upl.interpreter import Interpreter
+
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_second_compile_is_cached(self):
+        cache = CompileCache(self.directory)
+        consts, funcs = cache.compile(FIB, STDLIB)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        calls = []
+        tokenize_program = lexer.tokenize_program
+        lexer.tokenize_program = lambda *args: calls.append(args)
+        try:
+            cached_consts, cached_funcs = CompileCache(self.directory)\
+                                              .compile(FIB, STDLIB)
+        finally:
+            lexer.tokenize_program = tokenize_program
+        self.assertEqual(calls, [])
+
+        self.assertEqual(cached_consts, consts)
+        self.assertEqual([f.to_dict() for f in cached_funcs],
+                         [f.to_dict() for f in funcs])
+
+        interpreter = Interpreter(cached_consts, cached_funcs)
+        self.assertEqual(interpreter.call(interpreter.get_function("fib"),
+                                          [15]), 610)
+
+    def test_cached_calls_bind_first_duplicate(self):
+        stdlib = STDLIB + (FuncDefAnalyzeNode("<", [BasicType.Int,
+                                                    BasicType.Int],
+                                              BasicType.Bool,
+                                              lambda a, b: False),)
+        consts, (fib, ) = CompileCache(self.directory).compile(FIB, stdlib)
+        cache = CompileCache(self.directory)
+        cached_consts, (cached_fib, ) = cache.compile(FIB, stdlib)
+        self.assertEqual(cache.hits, 1)
+        self.assertIs(cached_fib.body.condition.function,
+                      fib.body.condition.function)
+
+    def test_changes_are_not_cached(self):
+        cache = CompileCache(self.directory)
+        cache.compile(FIB, STDLIB)
+        cache.compile(FIB.replace("n < 2", "n < 3"), STDLIB)
+        cache.compile(FIB, STDLIB + (
+            FuncDefAnalyzeNode("*", [BasicType.Real, BasicType.Real],
+                               BasicType.Real),))
+        cache.compile(FIB, STDLIB)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_external_signatures_are_in_the_key(self):
+        renamed = STDLIB[:-1] + (FuncDefAnalyzeNode("<", [BasicType.Real,
+                                                          BasicType.Real],
+                                                    BasicType.Bool),)
+        self.assertNotEqual(get_cache_key(FIB, STDLIB),
+                            get_cache_key(FIB, renamed))
+
+    def test_externals_are_bound_on_load(self):
+        cache = CompileCache(self.directory)
+        cache.compile(FIB, STDLIB)
+
+        stdlib = [FuncDefAnalyzeNode(f.name, f.arg_types, f.return_type,
+                                     f.implementation) for f in STDLIB]
+        consts, funcs = CompileCache(self.directory).compile(FIB, stdlib)
+        fib = funcs[0]
+        self.assertIs(fib.body.condition.function, stdlib[-1])
+        self.assertIs(fib.body.on_false.args[0].function, fib)
+
+    def test_corrupt_entry_is_replaced(self):
+        cache = CompileCache(self.directory)
+        path = cache.get_path(get_cache_key(FIB, STDLIB))
+        with open(path, "w") as f:
+            f.write("{\"consts\": [")
+
+        consts, funcs = cache.compile(FIB, STDLIB)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(funcs[0].name, "fib")
+
+        cache.compile(FIB, STDLIB)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(path)])
+
+    def test_entry_is_replaced_without_os_replace(self):
+        cache = CompileCache(self.directory)
+        path = cache.get_path(get_cache_key(FIB, STDLIB))
+        with open(path, "w") as f:
+            f.write("{\"consts\": [")
+
+        replace = getattr(os, "replace", None)
+        if replace is not None:
+            del os.replace
+        try:
+            cache.compile(FIB, STDLIB)
+        finally:
+            if replace is not None:
+                os.replace = replace
+
+        cache = CompileCache(self.directory)
+        consts, funcs = cache.compile(FIB, STDLIB)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(funcs[0].name, "fib")
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(path)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+import unittest
+import random
+from upl import lexer, parser, semantic_analyzer
+from upl.compiler_session import CompilerSession
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType,\
+                                       ConstantAnalyzeNode, FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.exceptions import ParserException, SemanticAnalyzerException
+
+STDLIB = [
+    FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int], BasicType.Int),
+    FuncDefAnalyzeNode("+", [BasicType.Real, BasicType.Real], BasicType.Real),
+    FuncDefAnalyzeNode("-", [BasicType.Int, BasicType.Int], BasicType.Int),
+    FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int], BasicType.Bool),
+]
+
+PROGRAM = """
+def one = 1;
+def f = (a: int) -> int { a + one; };
+def g = (a: int) -> int {
+    if a < 3 then f(a) else g(a - 2);
+};
+def h = () -> int { g(5) + 2; };
+"""
+
+EDIT_STATEMENTS = [
+    "def one = 1;",
+    "def one = 1.5;",
+    "def r = 1.5;",
+    "def two = one + one;",
+    "def t = () -> int { one + one; };",
+    "def f = (a: int) -> int { a + one; };",
+    "def f = (a: real) -> real { a + r; };",
+    "def g = (a: int) -> int {\n    if a < 3 then f(a) else g(a - 2);\n};",
+    "def h = () -> int { g(5) + 2; };",
+    "def k = () -> real { one + 1.5; };",
+    "1 + 2;",
+]
+
+def analyze(program):
+    tokens = lexer.tokenize_program(program)
+    parse_tree = parser.Parser(tokens).parse()
+    return semantic_analyzer.SemanticAnalyzer(parse_tree, STDLIB).analyze()
+
+def get_constant_nodes(node):
+    if isinstance(node, ConstantAnalyzeNode):
+        return [node]
+    elif isinstance(node, FuncCallAnalyzeNode):
+        return sum([get_constant_nodes(arg) for arg in node.args], [])
+    elif isinstance(node, ConditionalAnalyzeNode):
+        return get_constant_nodes(node.condition) +\
+               get_constant_nodes(node.on_true) +\
+               get_constant_nodes(node.on_false)
+    return []
+
+class TestCompilerSession(unittest.TestCase):
+    def checkCompile(self, session, program):
+        consts, func_defs = session.compile(program)
+        expected_consts, expected_func_defs = analyze(program)
+        self.assertEqual(consts, expected_consts)
+        self.assertEqual([f.to_dict() for f in func_defs],
+                         [f.to_dict() for f in expected_func_defs])
+        for func_def in func_defs:
+            for node in get_constant_nodes(func_def.body):
+                self.assertIs(node.const_table, consts)
+        return func_defs
+
+    def test_first_compile(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, PROGRAM)
+        self.assertEqual(session.lexed_lines, len(PROGRAM.split("\n")))
+        self.assertEqual(session.parsed_statements, 4)
+        self.assertEqual(session.analyzed_declarations, 4)
+
+    def test_unchanged_program(self):
+        session = CompilerSession(STDLIB)
+        f, g, h = self.checkCompile(session, PROGRAM)
+        bodies = [f.body, g.body, h.body]
+        self.assertEqual(self.checkCompile(session, PROGRAM), [f, g, h])
+        self.assertEqual([f.body, g.body, h.body], bodies)
+        self.assertEqual(session.lexed_lines, 0)
+        self.assertEqual(session.parsed_statements, 0)
+        self.assertEqual(session.analyzed_declarations, 0)
+
+    def test_changed_body(self):
+        session = CompilerSession(STDLIB)
+        f, g, h = self.checkCompile(session, PROGRAM)
+        g_body, h_body = g.body, h.body
+        self.checkCompile(session, PROGRAM.replace("a + one", "a + 7"))
+        self.assertEqual(session.lexed_lines, 1)
+        self.assertEqual(session.parsed_statements, 1)
+        self.assertEqual(session.analyzed_declarations, 1)
+        self.assertIs(g.body, g_body)
+        self.assertIs(h.body, h_body)
+
+    def test_changed_constants(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, PROGRAM)
+        # The constants of the later functions move in the constant table.
+        self.checkCompile(session, PROGRAM.replace("def one = 1;",
+                                                   "def one = 9 + 8;"))
+        self.assertEqual(session.analyzed_declarations, 2)
+
+    def test_inserted_lines(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, PROGRAM)
+        program = PROGRAM.replace("def f", "def k = 2;\n\ndef f")
+        self.checkCompile(session, program)
+        self.assertEqual(session.lexed_lines, 2)
+        self.assertEqual(session.parsed_statements, 1)
+
+        # Errors in moved statements have their new locations.
+        program = program.replace("-> int {\n", "-> bool {\n")
+        with self.assertRaises(SemanticAnalyzerException) as expected:
+            analyze(program)
+        with self.assertRaises(SemanticAnalyzerException) as context:
+            session.compile(program)
+        self.assertEqual(context.exception.location,
+                         expected.exception.location)
+        self.assertIsNotNone(context.exception.location)
+
+    def test_changed_signature(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, PROGRAM)
+        program = PROGRAM.replace("def f = (a: int) -> int { a + one; };",
+                                  "def f = (a: bool) -> int { one; };")
+        with self.assertRaises(SemanticAnalyzerException):
+            session.compile(program)
+        program = program.replace("f(a)", "f(a < 1)")
+        self.checkCompile(session, program)
+        self.assertEqual(session.analyzed_declarations, 2)
+
+    def test_new_global_conflicts_with_local(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, PROGRAM)
+        with self.assertRaises(SemanticAnalyzerException):
+            session.compile("def a = 1;\n" + PROGRAM)
+
+    def test_tail_calls_of_reused_globals(self):
+        session = CompilerSession(STDLIB)
+        program = """
+            def x = 1 + 2;
+            def f = () -> int { x; };
+        """
+        self.checkCompile(session, program)
+        self.checkCompile(session, program.replace("{ x; }", "{ x + 1; }"))
+
+    def test_errors_keep_last_result(self):
+        session = CompilerSession(STDLIB)
+        f, g, h = self.checkCompile(session, PROGRAM)
+        f_body = f.body
+        with self.assertRaises(ParserException):
+            session.compile(PROGRAM.replace("a + one", "a + def"))
+        with self.assertRaises(SemanticAnalyzerException):
+            session.compile(PROGRAM.replace("a + one", "a + two"))
+        self.assertIs(f.body, f_body)
+        self.checkCompile(session, PROGRAM.replace("a + one", "one + a"))
+        self.checkCompile(session, PROGRAM)
+
+    def test_duplicate_statements(self):
+        session = CompilerSession(STDLIB)
+        program = "1 + 2;\n1 + 2;\ndef f = () -> int { 3; };"
+        self.checkCompile(session, program)
+        self.checkCompile(session, "\n" + program + "\n1 + 2;")
+        self.assertEqual(session.parsed_statements, 1)
+
+    def test_reused_constants_keep_their_types(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, "def one = 1;\n"
+                                   "def f = (a: int) -> int { one; };")
+        self.checkCompile(session, "def r = 1.5;\ndef one = 1;\n"
+                                   "def two = () -> int { one + one; };")
+
+    def test_random_edits(self):
+        for seed in range(10):
+            self.checkRandomEdits(random.Random(seed), 200)
+
+    def checkRandomEdits(self, rng, edits):
+        """
+        Compiles a random sequence of edits of a program in a session, and
+        checks each against compiling the program from scratch.
+        """
+        session = CompilerSession(STDLIB)
+        statements = []
+        for _ in range(edits):
+            edit = rng.randint(0, 2)
+            if edit == 0 or not statements:
+                statements.insert(rng.randint(0, len(statements)),
+                                  rng.choice(EDIT_STATEMENTS))
+            elif edit == 1:
+                del statements[rng.randrange(len(statements))]
+            else:
+                i = rng.randrange(len(statements))
+                statements.insert(rng.randint(0, len(statements) - 1),
+                                  statements.pop(i))
+
+            program = "\n".join(statements)
+            try:
+                analyze(program)
+            except SemanticAnalyzerException as expected:
+                with self.assertRaises(SemanticAnalyzerException) as context:
+                    session.compile(program)
+                self.assertEqual(str(context.exception), str(expected))
+                self.assertEqual(context.exception.location,
+                                 expected.location)
+            else:
+                self.checkCompile(session, program)
+
+    def test_reset(self):
+        session = CompilerSession(STDLIB)
+        self.checkCompile(session, PROGRAM)
+        session.reset()
+        self.checkCompile(session, PROGRAM)
+        self.assertEqual(session.parsed_statements, 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import BasicType
+from upl.constant_pool import ConstantPool
+
+class TestConstantPool(unittest.TestCase):
+    def test_insertion_order(self):
+        pool = ConstantPool()
+        self.assertEqual(pool.add(BasicType.Int, 5), 0)
+        self.assertEqual(pool.add(BasicType.Bool, True), 1)
+        self.assertEqual(pool.add(BasicType.Int, 5), 0)
+        self.assertEqual(pool.add(BasicType.Real, 2.5), 2)
+        self.assertEqual(pool.constants, [(BasicType.Int, 5),
+                                          (BasicType.Bool, True),
+                                          (BasicType.Real, 2.5)])
+        self.assertEqual(len(pool), 3)
+
+    def test_equal_values_of_different_types(self):
+        pool = ConstantPool()
+        indices = [pool.add(BasicType.Bool, True), pool.add(BasicType.Int, 1),
+                   pool.add(BasicType.Real, 1.0), pool.add(BasicType.Real, 0.0),
+                   pool.add(BasicType.Real, -0.0), pool.add(BasicType.Int, 0),
+                   pool.add(BasicType.Bool, False)]
+        self.assertEqual(indices, list(range(7)))
+        self.assertEqual([type(value) for _, value in pool.constants],
+                         [bool, int, float, float, float, int, bool])
+        self.assertEqual(pool.index(BasicType.Real, -0.0), 4)
+
+    def test_index(self):
+        pool = ConstantPool()
+        pool.add(BasicType.Int, 1)
+        self.assertEqual(pool.index(BasicType.Int, 1), 0)
+        self.assertRaises(ValueError, pool.index, BasicType.Bool, True)
+        self.assertRaises(ValueError, pool.index, BasicType.Real, 1.0)
+
+    def test_existing_constants(self):
+        constants = [(BasicType.Int, 1), (BasicType.Real, 1.0)]
+        pool = ConstantPool(constants)
+        self.assertEqual(pool.add(BasicType.Real, 1.0), 1)
+        self.assertEqual(pool.add(BasicType.Int, 2), 2)
+        self.assertIs(pool.constants, constants)
+        self.assertEqual(constants[2], (BasicType.Int, 2))
+
+    def test_analyzer_constant_order(self):
+        tokens = lexer.tokenize_program("""
+            def a = 3;
+            def b = true;
+            def c = 1.0;
+            def d = 1;
+            def e = 3;
+            def f = false;
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, _ = semantic_analyzer.SemanticAnalyzer(parse_tree).analyze()
+        self.assertEqual(consts, [(BasicType.Int, 3), (BasicType.Bool, True),
+                                  (BasicType.Real, 1.0), (BasicType.Int, 1),
+                                  (BasicType.Bool, False)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from interpreter_tests import PURE_STDLIB
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.cse import ExpressionInterner, get_children
+from upl.optimizer import get_node_count
+
+STDLIB = PURE_STDLIB + (
+    FuncDefAnalyzeNode("log", [BasicType.Int], BasicType.Int, lambda a: a),
+)
+
+def get_unique_node_count(node, visited=None):
+    visited = set() if visited is None else visited
+    if node in visited:
+        return 0
+    visited.add(node)
+    return 1 + sum(get_unique_node_count(child, visited)
+                   for child in get_children(node))
+
+class TestExpressionInterner(unittest.TestCase):
+    def test_identical_calls_are_shared(self):
+        funcs = self.intern("""
+            def f = (a: int) -> int { (a + 1) * (a + 1); };
+        """)
+        body = funcs[0].body
+        self.assertIs(body.args[0], body.args[1])
+        self.assertTrue(body.args[0].shared)
+        self.assertFalse(body.shared)
+
+    def test_leaves_are_interned(self):
+        funcs = self.intern("""
+            def f = (a: int, b: int) -> int { a + 1 + a + 1 + b; };
+        """)
+        self.assertEqual(get_unique_node_count(funcs[0].body), 7)
+
+    def test_nodes_are_shared_between_functions(self):
+        f, g = self.intern("""
+            def f = (a: int) -> int { a * 2 + 1; };
+            def g = (a: int) -> int { (a * 2 + 1) - 1; };
+        """)
+        self.assertIs(g.body.args[0], f.body)
+        self.assertFalse(f.body.shared)
+
+    def test_different_calls_are_not_shared(self):
+        funcs = self.intern("""
+            def f = (a: int, b: int) -> int { (a - 1) * (b - 1) * (1 - a); };
+        """)
+        self.assertEqual(get_unique_node_count(funcs[0].body), 8)
+
+    def test_impure_calls_are_not_shared(self):
+        funcs = self.intern("""
+            def f = (a: int) -> int { log(a) * log(a); };
+            def g = (a: int) -> int {
+                def b = log(a) + 1;
+                b * b;
+            };
+        """)
+        f, g = funcs
+        self.assertIsNot(f.body.args[0], f.body.args[1])
+        self.assertFalse(g.body.args[0].shared)
+
+    def test_recursive_pure_function_calls_are_shared(self):
+        funcs = self.intern("""
+            def fib = (n: int) -> int {
+                if n < 2 then n else fib(n - 1) + fib(n - 1);
+            };
+        """)
+        on_false = funcs[0].body.on_false
+        self.assertIs(on_false.args[0], on_false.args[1])
+        self.assertTrue(on_false.args[0].shared)
+
+    def test_shared_conditionals(self):
+        funcs = self.intern("""
+            def f = (a: int) -> int {
+                (if a < 2 then a else 2) * (if a < 2 then a else 2);
+            };
+        """)
+        body = funcs[0].body
+        self.assertIs(body.args[0], body.args[1])
+        self.assertTrue(body.args[0].shared)
+
+    def test_generated_function_is_smaller(self):
+        term = "(a * 2 + b * 3)"
+        program = "def f = (a: int, b: int) -> int { %s; };" %\
+                  (" + ".join([term] * 50), )
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(
+            parse_tree, STDLIB).analyze()
+        before = get_node_count(funcs[0].body)
+        ExpressionInterner(consts, funcs).intern()
+        self.assertLess(get_unique_node_count(funcs[0].body), before / 5)
+
+    def intern(self, program):
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(
+            parse_tree, STDLIB).analyze()
+        return ExpressionInterner(consts, funcs).intern()[1]
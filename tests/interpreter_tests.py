@@ -0,0 +1,277 @@
+import unittest
+import operator
+from tests_common import UPLTestCase
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.interpreter import Interpreter
+from upl.cse import ExpressionInterner
+from upl.exceptions import RuntimeException
+
+STDLIB = (
+    # Arithmetic
+    FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int], BasicType.Int,
+                       operator.add),
+    FuncDefAnalyzeNode("-", [BasicType.Int, BasicType.Int], BasicType.Int,
+                       operator.sub),
+    FuncDefAnalyzeNode("-", [BasicType.Int], BasicType.Int, operator.neg),
+    FuncDefAnalyzeNode("*", [BasicType.Int, BasicType.Int], BasicType.Int,
+                       operator.mul),
+    FuncDefAnalyzeNode("+", [BasicType.Real, BasicType.Real], BasicType.Real,
+                       operator.add),
+
+    # Comparison
+    FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int], BasicType.Bool,
+                       operator.lt),
+)
+
+# The same functions, marked pure.
+PURE_STDLIB = tuple(FuncDefAnalyzeNode(f.name, f.arg_types, f.return_type,
+                                       f.implementation, pure=True)
+                    for f in STDLIB)
+
+FIB = """
+    def fib = (n: int) -> int {
+        if n < 2 then n else fib(n - 1) + fib(n - 2);
+    }
+"""
+
+class TestInterpreter(UPLTestCase):
+    executor = Interpreter
+
+    def test_constant_function(self):
+        self.checkResult("def f = () -> int { 2; };", "f", [], 2)
+
+    def test_constants_of_all_types(self):
+        program = """
+            def i = () -> int { 10; };
+            def b = () -> bool { false; };
+            def r = () -> real { 1.5; };
+        """
+        self.checkResult(program, "i", [], 10)
+        self.checkResult(program, "b", [], False)
+        self.checkResult(program, "r", [], 1.5)
+
+    def test_reference_to_arg(self):
+        self.checkResult("def f = (a: int, b: int) -> int { b; };",
+                         "f", [1, 2], 2)
+
+    def test_operators(self):
+        self.checkResult("def f = (a: int) -> int { -a * 3 + 1; };",
+                         "f", [2], -5)
+        self.checkResult("def f = (a: real) -> real { a + 0.5; };",
+                         "f", [1.0], 1.5)
+
+    def test_call_to_another_func(self):
+        self.checkResult("""
+            def f = (a: int) -> int { a * 2; };
+            def g = (a: int) -> int { f(a) - 1; };
+        """, "g", [5], 9)
+
+    def test_conditional(self):
+        program = "def f = (a: int) -> int { if a < 2 then 10 else 20; };"
+        self.checkResult(program, "f", [1], 10)
+        self.checkResult(program, "f", [2], 20)
+
+    def test_conditional_operand(self):
+        program = """
+            def f = (a: int) -> int { (if a < 2 then a else 2) * 10 + 1; };
+        """
+        self.checkResult(program, "f", [1], 11)
+        self.checkResult(program, "f", [3], 21)
+
+    def test_recursion(self):
+        self.checkResult(FIB, "fib", [15], 610)
+
+    def test_only_taken_branch_is_evaluated(self):
+        calls = []
+
+        def trace(value):
+            calls.append(value)
+            return value
+
+        stdlib = STDLIB + (
+            FuncDefAnalyzeNode("trace", [BasicType.Int], BasicType.Int, trace),
+        )
+        self.checkResult("""
+            def f = (a: int) -> int {
+                if a < 2 then trace(1) else trace(2);
+            };
+        """, "f", [5], 2, stdlib)
+        self.assertEqual(calls, [2])
+
+    def test_overloaded_function(self):
+        program = """
+            def f = (a: int) -> int { 1; };
+            def f = (a: real) -> int { 2; };
+        """
+        interpreter = self.makeInterpreter(program)
+        func = interpreter.get_function("f", [BasicType.Real])
+        self.assertEqual(interpreter.call(func, [1.0]), 2)
+
+        with self.assertRaises(RuntimeException):
+            interpreter.get_function("f")
+
+    def test_unknown_function(self):
+        interpreter = self.makeInterpreter(FIB)
+        with self.assertRaises(RuntimeException):
+            interpreter.get_function("g")
+
+    def test_wrong_argument_count(self):
+        interpreter = self.makeInterpreter(FIB)
+        with self.assertRaises(RuntimeException):
+            interpreter.call(interpreter.get_function("fib"), [1, 2])
+
+    def test_missing_implementation(self):
+        stdlib = (FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int],
+                                     BasicType.Int), )
+        interpreter = self.makeInterpreter(
+            "def f = (a: int) -> int { a + 1; };", stdlib)
+        with self.assertRaises(RuntimeException):
+            interpreter.call(interpreter.get_function("f"), [1])
+
+    def test_memoization(self):
+        interpreter = self.makeInterpreter(FIB, PURE_STDLIB, memoize=True)
+        fib = interpreter.get_function("fib")
+        self.assertEqual(interpreter.call(fib, [80]), 23416728348467685)
+
+        cache = interpreter.caches[fib]
+        self.assertEqual(len(cache), 81)
+        self.assertEqual(cache.misses, 81)
+        self.assertEqual(cache.hits, 78)
+
+        self.assertEqual(interpreter.call(fib, [80]), 23416728348467685)
+        self.assertEqual(cache.hits, 79)
+
+    def test_memoization_cache_size(self):
+        interpreter = self.makeInterpreter(FIB, PURE_STDLIB, memoize=True,
+                                           cache_size=2)
+        fib = interpreter.get_function("fib")
+        self.assertEqual(interpreter.call(fib, [30]), 832040)
+        self.assertEqual(len(interpreter.caches[fib]), 2)
+        cache = interpreter.caches[fib]
+        self.assertEqual(cache.evictions, cache.misses - 2)
+
+    def test_impure_function_is_not_memoized(self):
+        interpreter = self.makeInterpreter(FIB, memoize=True)
+        self.assertEqual(interpreter.caches, {})
+        self.assertEqual(interpreter.call(interpreter.get_function("fib"), [10]),
+                         55)
+
+    def test_shared_nodes_are_evaluated_once(self):
+        calls = []
+
+        def square(value):
+            calls.append(value)
+            return value * value
+
+        stdlib = PURE_STDLIB + (
+            FuncDefAnalyzeNode("square", [BasicType.Int], BasicType.Int,
+                               square, pure=True),
+        )
+        program = """
+            def f = (a: int) -> int { square(a + 1) * square(a + 1); };
+            def g = (a: int) -> int {
+                (if a < 2 then square(a) else 0) + square(a);
+            };
+            def h = (a: int) -> int {
+                if square(a) < 10 then square(a) else square(a) + 1;
+            };
+        """
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                           stdlib).analyze()
+        consts, funcs = ExpressionInterner(consts, funcs).intern()
+        interpreter = self.executor(consts, funcs)
+
+        self.assertEqual(interpreter.call(interpreter.get_function("f"), [2]),
+                         81)
+        self.assertEqual(calls, [3])
+
+        del calls[:]
+        self.assertEqual(interpreter.call(interpreter.get_function("g"), [5]),
+                         25)
+        self.assertEqual(calls, [5])
+        self.assertEqual(interpreter.call(interpreter.get_function("g"), [1]),
+                         2)
+
+        del calls[:]
+        for a, result in ((2, 4), (4, 17)):
+            self.assertEqual(interpreter.call(interpreter.get_function("h"),
+                                              [a]), result)
+        self.assertEqual(calls, [2, 4])
+
+    def test_self_tail_calls_run_in_constant_stack(self):
+        program = """
+            def sum = (n: int, acc: int) -> int {
+                if n < 1 then acc else sum(n - 1, acc + n);
+            };
+        """
+        self.checkResult(program, "sum", [100000, 0], 5000050000)
+
+    def test_tail_call_arguments_are_assigned_together(self):
+        program = """
+            def swap = (n: int, a: int, b: int) -> int {
+                if n < 1 then a * 10 + b else swap(n - 1, b, a);
+            };
+        """
+        self.checkResult(program, "swap", [3, 1, 2], 21)
+        self.checkResult(program, "swap", [4, 1, 2], 12)
+
+    def test_tail_calls_in_nested_conditionals(self):
+        program = """
+            def collatz = (n: int, steps: int) -> int {
+                if n < 2 then steps else
+                if n % 2 < 1 then collatz(n / 2, steps + 1)
+                else collatz(3 * n + 1, steps + 1);
+            };
+        """
+        stdlib = STDLIB + (
+            FuncDefAnalyzeNode("/", [BasicType.Int, BasicType.Int],
+                               BasicType.Int, operator.floordiv),
+            FuncDefAnalyzeNode("%", [BasicType.Int, BasicType.Int],
+                               BasicType.Int, operator.mod),
+        )
+        self.checkResult(program, "collatz", [27, 0], 111, stdlib)
+
+    def test_tail_call_with_shared_nodes(self):
+        program = """
+            def f = (n: int, acc: int) -> int {
+                if n < 1 then acc else f(n - 1, acc + (n - 1) * (n - 1));
+            };
+        """
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(
+            parse_tree, PURE_STDLIB).analyze()
+        consts, funcs = ExpressionInterner(consts, funcs).intern()
+        interpreter = self.executor(consts, funcs)
+        self.assertEqual(interpreter.call(funcs[0], [5000, 0]),
+                         sum(i * i for i in range(5000)))
+
+    def test_tail_call_with_available_shared_nodes(self):
+        program = """
+            def f = (b: bool, n: int) -> int {
+                if n < 10 then (if b then n else f(n < 10, n)) else n;
+            };
+        """
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(
+            parse_tree, PURE_STDLIB).analyze()
+        consts, funcs = ExpressionInterner(consts, funcs).intern()
+        interpreter = self.executor(consts, funcs)
+        self.assertEqual(interpreter.call(funcs[0], [False, 3]), 3)
+
+    def makeInterpreter(self, program, stdlib=STDLIB, **options):
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                           stdlib).analyze()
+        return self.executor(consts, funcs, **options)
+
+    def checkResult(self, program, name, args, result, stdlib=STDLIB):
+        interpreter = self.makeInterpreter(program, stdlib)
+        value = interpreter.call(interpreter.get_function(name), args)
+        self.assertEqual(type(value), type(result))
+        self.assertEqual(value, result)
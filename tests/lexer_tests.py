@@ -1,9 +1,12 @@
+import io
 import unittest
 from upl import lexer
-from upl.token import Token, TokenType
+from upl.token import Token, TokenType, TokenWindow
 from upl.exceptions import LexerException
 
 class TestLexer(unittest.TestCase):
+    engine = "regex"
+
     def test_simple_definition(self):
         self.checkTokenTypes("def x = 42 + 8.0 * 98 + a;", 
                              [TokenType.KeywordDef, TokenType.Identifier,
@@ -100,14 +103,33 @@ class TestLexer(unittest.TestCase):
 
     def test_errors(self):
         with self.assertRaises(LexerException):
-            lexer.tokenize_program("`123 440400 4")
+            lexer.tokenize_program("`123 440400 4", self.engine)
 
     def test_location_info(self):
-        tokens = lexer.tokenize_program("1  2\n3 4 #comment\n\n  5;")
+        tokens = lexer.tokenize_program("1  2\n3 4 #comment\n\n  5;",
+                                         self.engine)
         locations = [t.location for t in tokens]
         self.assertEqual(locations, [(1, 1), (1, 4), (2, 1), (2, 3),
                                      (4, 3), (4, 4)])
 
+    def test_error_location(self):
+        with self.assertRaises(LexerException) as context:
+            lexer.tokenize_program("a = 1;\n  b ` c", self.engine)
+        self.assertEqual(context.exception.location, (2, 5))
+
+    def test_engines_agree(self):
+        program = """
+            def f = (a: int, b: real) -> bool { # comment ; with -> tokens
+                def c = if a<=-1 then truex else false;
+                (a->b) == "str\\"ing" = 12.5e-3 + 7defx;
+            }
+            """
+        regex_tokens = lexer.tokenize_program(program, "regex")
+        recursive_tokens = lexer.tokenize_program(program, "recursive")
+        self.assertEqual(
+            [(t.type, t.value, t.uncooked, t.location) for t in regex_tokens],
+            [(t.type, t.value, t.uncooked, t.location) for t in recursive_tokens])
+
     def test_token_to_str(self):
         token1 = Token(type=TokenType.Operator, value="**")
         token2 = Token(type=TokenType.KeywordInt)
@@ -115,16 +137,59 @@ class TestLexer(unittest.TestCase):
         self.assertIn(str(TokenType.Operator), str(token1))
         self.assertIn(str(TokenType.KeywordInt), str(token2))
 
+    def test_token_window(self):
+        tokens = lexer.tokenize_program("a b c d e", self.engine)
+        window = TokenWindow(tokens)[1:-1]
+        self.assertEqual(len(window), 3)
+        self.assertEqual([t.value for t in window], ["b", "c", "d"])
+        self.assertEqual(window[-1].value, "d")
+        self.assertEqual([t.value for t in window[1:]], ["c", "d"])
+        self.assertEqual(len(window[5:]), 0)
+        self.assertEqual(len(window[2:1]), 0)
+        self.assertIs(window[1:].tokens, tokens)
+        with self.assertRaises(IndexError):
+            window[3]
+
     def checkTokenTypes(self, program, expected_token_types):
-        tokens = lexer.tokenize_program(program)
+        tokens = lexer.tokenize_program(program, self.engine)
         self.assertEqual(len(tokens), len(expected_token_types))
 
         for token, expected_token_type in zip(tokens, expected_token_types):
             self.assertEqual(token.type, expected_token_type)
 
     def checkTokenValues(self, program, expected_token_values):
-        tokens = lexer.tokenize_program(program)
+        tokens = lexer.tokenize_program(program, self.engine)
         self.assertEqual(len(tokens), len(expected_token_values))
 
         for token, expected_token_value in zip(tokens, expected_token_values):
             self.assertEqual(token.value, expected_token_value)
+
+
+class TestRecursiveLexer(TestLexer):
+    engine = "recursive"
+
+class TestRegexLexer(unittest.TestCase):
+    def test_long_line(self):
+        tokens = lexer.tokenize_program("1 + " * 5000 + "1;")
+        self.assertEqual(len(tokens), 10002)
+        self.assertEqual(tokens[-1].location, (1, 20002))
+
+    def test_iter_tokens_chunk_boundaries(self):
+        program = u"def f = (a: int) -> int {\n  a + 12.5e3; # c\n}\n\nf(1);"
+        expected = [(t.type, t.value, t.location)
+                    for t in lexer.tokenize_program(program)]
+        for chunk_size in range(1, len(program) + 2):
+            tokens = lexer.iter_tokens(io.StringIO(program), chunk_size)
+            self.assertEqual([(t.type, t.value, t.location) for t in tokens],
+                             expected)
+
+    def test_iter_tokens_is_lazy(self):
+        tokens = lexer.iter_tokens(io.StringIO(u"a;\n`"), chunk_size=3)
+        self.assertEqual(next(tokens).value, "a")
+        self.assertEqual(next(tokens).type, TokenType.StatementSep)
+        with self.assertRaises(LexerException):
+            next(tokens)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            lexer.tokenize_program("1;", "dfa")
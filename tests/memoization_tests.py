@@ -0,0 +1,114 @@
+import math
+import unittest
+from interpreter_tests import STDLIB, PURE_STDLIB
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.memoization import LRUCache, MISSING, memoize, get_cache_key
+from upl.interpreter import Interpreter
+from upl.bytecode import BytecodeVM
+from upl.python_compiler import PythonCompiler
+from upl.call_graph import get_pure_functions, get_recursive_functions
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache = LRUCache(2)
+        self.assertIs(cache.get("a"), MISSING)
+        self.assertIsNone(cache.get("a", None))
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_eviction_order(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertEqual(cache.get("b"), MISSING)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_sizes(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        self.assertEqual(len(cache), 0)
+
+        cache = LRUCache(None)
+        for i in range(5000):
+            cache.put(i, i)
+        self.assertEqual(len(cache), 5000)
+        self.assertEqual(cache.evictions, 0)
+
+        with self.assertRaises(ValueError):
+            LRUCache(-1)
+
+    def test_clear(self):
+        cache = LRUCache()
+        cache.put("a", 1)
+        cache.get("a")
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_memoize(self):
+        calls = []
+
+        def double(a):
+            calls.append(a)
+            return a * 2
+
+        cache = LRUCache()
+        memoized = memoize(double, cache)
+        self.assertEqual([memoized(1), memoized(2), memoized(1)], [2, 4, 2])
+        self.assertEqual(calls, [1, 2])
+
+    def test_cache_key_keeps_sign_of_zero(self):
+        self.assertNotEqual(get_cache_key((0.0, )), get_cache_key((-0.0, )))
+        self.assertEqual(get_cache_key((1, True, 2.5)),
+                         get_cache_key((1, True, 2.5)))
+        memoized = memoize(lambda a: math.copysign(1, a), LRUCache())
+        self.assertEqual([memoized(0.0), memoized(-0.0)], [1.0, -1.0])
+
+    def test_memoized_functions_keep_sign_of_zero(self):
+        tokens = lexer.tokenize_program("""
+            def f = (x: real) -> real { sgn(x); };
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        sgn = FuncDefAnalyzeNode("sgn", [BasicType.Real], BasicType.Real,
+                                 lambda x: math.copysign(1, x), pure=True)
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                           [sgn]).analyze()
+        for executor_type in (Interpreter, BytecodeVM, PythonCompiler):
+            executor = executor_type(consts, funcs, memoize=True)
+            self.assertEqual([executor.call(funcs[0], [0.0]),
+                              executor.call(funcs[0], [-0.0])], [1.0, -1.0],
+                             executor_type.__name__)
+
+
+class TestPurity(unittest.TestCase):
+    def test_pure_functions(self):
+        funcs = self.analyze("""
+            def f = (a: int) -> int { a + 1; };
+            def g = (a: int) -> int { if a < 2 then f(a) else g(a - 1); };
+            def h = (a: int) -> int { log(a); };
+            def k = (a: int) -> int { h(a) + 1; };
+            def c = () -> int { 1; };
+        """, PURE_STDLIB + (
+            FuncDefAnalyzeNode("log", [BasicType.Int], BasicType.Int),
+        ))
+        f, g, h, k, c = funcs
+        self.assertEqual(get_pure_functions(funcs), set([f, g, c]))
+
+    def test_mutual_recursion_with_impure_call(self):
+        funcs = self.analyze("""
+            def even = (n: int) -> bool { if n < 1 then true else odd(n - 1); };
+            def odd = (n: int) -> bool { if n < 1 then false else even(n + -1); };
+        """, PURE_STDLIB[:2] + STDLIB[2:])
+        self.assertEqual(get_pure_functions(funcs), set())
+        self.assertEqual(get_recursive_functions(funcs), set(funcs))
+
+    def analyze(self, program, stdlib):
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        return semantic_analyzer.SemanticAnalyzer(parse_tree, stdlib).analyze()[1]
@@ -0,0 +1,165 @@
+import unittest
+import operator
+from tests_common import UPLTestCase
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.optimizer import Optimizer, get_node_count
+from upl.interpreter import Interpreter
+
+TYPE_INT = "BasicType.Int"
+TYPE_REAL = "BasicType.Real"
+
+def foldable(name, arg_types, return_type, implementation):
+    return FuncDefAnalyzeNode(name, arg_types, return_type, implementation,
+                              pure=True, foldable=True)
+
+INT2 = [BasicType.Int, BasicType.Int]
+REAL2 = [BasicType.Real, BasicType.Real]
+
+STDLIB = (
+    foldable("+", INT2, BasicType.Int, operator.add),
+    foldable("-", INT2, BasicType.Int, operator.sub),
+    foldable("*", INT2, BasicType.Int, operator.mul),
+    foldable("/", INT2, BasicType.Int, operator.floordiv),
+    foldable("-", [BasicType.Int], BasicType.Int, operator.neg),
+    foldable("+", REAL2, BasicType.Real, operator.add),
+    foldable("*", REAL2, BasicType.Real, operator.mul),
+    foldable("-", [BasicType.Real], BasicType.Real, operator.neg),
+    foldable("*", [BasicType.Int, BasicType.Real], BasicType.Real,
+             operator.mul),
+    foldable("+", [BasicType.Real, BasicType.Int], BasicType.Real,
+             operator.add),
+    foldable("<", INT2, BasicType.Bool, operator.lt),
+    foldable("!", [BasicType.Bool], BasicType.Bool, operator.not_),
+    FuncDefAnalyzeNode("%", INT2, BasicType.Int, operator.mod, pure=True),
+)
+
+class TestOptimizer(UPLTestCase):
+    def test_fold_constant_call(self):
+        consts, funcs = self.checkOptimizedTree("""
+            def f = () -> int { 2 + 3 * 4; };
+        """, [{"body": {"type": "ConstantAnalyzeNode", "value": 14,
+                        "value_type": TYPE_INT}}])
+        self.assertIn((BasicType.Int, 14), consts)
+
+    def test_fold_reuses_constant(self):
+        consts, funcs = self.optimize("def f = (a: int) -> int { 1 + 1 + a * 2; };")
+        self.assertEqual(len(consts), 2)
+
+    def test_fold_real_constants(self):
+        consts, funcs = self.checkOptimizedTree("""
+            def f = () -> real { -(0.0); };
+        """, [{"body": {"type": "ConstantAnalyzeNode", "value": -0.0}}])
+        self.assertEqual(str(consts[funcs[0].body.index][1]), "-0.0")
+
+    def test_not_foldable(self):
+        self.checkOptimizedTree("""
+            def f = () -> int { 5 % 3; };
+        """, [{"body": {"type": "FuncCallAnalyzeNode"}}])
+
+    def test_fold_error_is_kept(self):
+        self.checkOptimizedTree("""
+            def f = () -> int { 1 / 0; };
+        """, [{"body": {"type": "FuncCallAnalyzeNode"}}])
+
+    def test_fold_error_in_untaken_branch(self):
+        table = {1: 10}
+        lookup = foldable("lookup", [BasicType.Int], BasicType.Int,
+                          lambda k: table[k])
+        tokens = lexer.tokenize_program("""
+            def f = (x: int) -> int { if x < 0 then lookup(7) else lookup(1); };
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(
+            parse_tree, list(STDLIB) + [lookup]).analyze()
+
+        consts, funcs = Optimizer(consts, funcs).optimize()
+        self.assertEqual(funcs[0].body.on_true.to_dict()["type"],
+                         "FuncCallAnalyzeNode")
+        self.assertEqual(Interpreter(consts, funcs).call(funcs[0], [3]), 10)
+
+    def test_constant_condition(self):
+        self.checkOptimizedTree("""
+            def f = (a: int) -> int { if 1 < 2 then a else 0; };
+            def g = (a: int) -> int { if 2 < 1 then a else 0; };
+        """, [
+            {"body": {"type": "FuncArgAnalyzeNode"}},
+            {"body": {"type": "ConstantAnalyzeNode", "value": 0}}
+        ])
+
+    def test_boolean_conditional(self):
+        self.checkOptimizedTree("""
+            def f = (a: int) -> bool { if a < 2 then true else false; };
+        """, [{"body": {"type": "FuncCallAnalyzeNode", "function": "<"}}])
+
+    def test_identities(self):
+        self.checkOptimizedTree("""
+            def f = (a: int) -> int { (0 + a - 0) * 1; };
+            def g = (a: int) -> int { 1 * (-(-a)); };
+            def h = (a: real) -> real { a * 1.0; };
+            def k = (a: int) -> bool { !(!(a < 1)); };
+        """, [
+            {"body": {"type": "FuncArgAnalyzeNode"}},
+            {"body": {"type": "FuncArgAnalyzeNode"}},
+            {"body": {"type": "FuncArgAnalyzeNode"}},
+            {"body": {"type": "FuncCallAnalyzeNode", "function": "<"}}
+        ])
+
+    def test_real_addition_of_zero_is_kept(self):
+        self.checkOptimizedTree("""
+            def f = (a: real) -> real { a + 0.0; };
+        """, [{"body": {"type": "FuncCallAnalyzeNode"}}])
+
+    def test_mixed_type_identities_are_kept(self):
+        consts, funcs = self.checkOptimizedTree("""
+            def f = (a: int) -> real { a * 1.0; };
+            def g = (a: real) -> real { a + 0; };
+        """, [
+            {"body": {"type": "FuncCallAnalyzeNode", "function": "*"}},
+            {"body": {"type": "FuncCallAnalyzeNode", "function": "+"}}
+        ])
+        interpreter = Interpreter(consts, funcs)
+        result = interpreter.call(funcs[0], [3])
+        self.assertEqual((type(result), result), (float, 3.0))
+        self.assertEqual(repr(interpreter.call(funcs[1], [-0.0])), "0.0")
+
+    def test_shared_nodes_are_not_modified(self):
+        consts, funcs = self.optimize("""
+            def f = (a: int) -> int {
+                def b = a * (2 + 3);
+                b + b;
+            };
+        """)
+        body = funcs[0].body
+        self.assertIs(body.args[0], body.args[1])
+        self.assertEqual(body.args[0].args[1].to_dict()["value"], 5)
+
+    def test_tree_is_smaller_and_equivalent(self):
+        program = """
+            def f = (a: int) -> int {
+                if a < 2 * 3 then a * (1 + 1) - 0 else (if 3 < 1 then 7 else a);
+            };
+        """
+        consts, funcs = self.analyze(program)
+        before = get_node_count(funcs[0].body)
+        expected = [Interpreter(consts, funcs).call(funcs[0], [a])
+                    for a in range(10)]
+
+        consts, funcs = Optimizer(consts, funcs).optimize()
+        self.assertLess(get_node_count(funcs[0].body), before)
+        self.assertEqual([Interpreter(consts, funcs).call(funcs[0], [a])
+                          for a in range(10)], expected)
+
+    def analyze(self, program):
+        tokens = lexer.tokenize_program(program)
+        parse_tree = parser.Parser(tokens).parse()
+        return semantic_analyzer.SemanticAnalyzer(parse_tree, STDLIB).analyze()
+
+    def optimize(self, program):
+        consts, funcs = self.analyze(program)
+        return Optimizer(consts, funcs).optimize()
+
+    def checkOptimizedTree(self, program, partial_tree):
+        consts, funcs = self.optimize(program)
+        self.matchValues([f.to_dict() for f in funcs], partial_tree)
+        return consts, funcs
@@ -0,0 +1,112 @@
+import os
+import unittest
+from upl import lexer, parser, semantic_analyzer
+from upl.parallel_analysis import ParallelSemanticAnalyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.exceptions import SemanticAnalyzerException
+
+STDLIB = (
+    FuncDefAnalyzeNode("+", [BasicType.Int, BasicType.Int], BasicType.Int),
+    FuncDefAnalyzeNode("-", [BasicType.Int, BasicType.Int], BasicType.Int),
+    FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int], BasicType.Bool),
+)
+
+PROGRAM = """
+    def one = 1;
+    def fib = (n: int) -> int {
+        if n < 3 then one else fib(n - 1) + fib(n - 2);
+    };
+    def two = one + one;
+    def f = (a: int) -> int { def b = a + 7; b + b + two; };
+    def g = (a: int) -> int { f(a) + 7 + 8; };
+    def h = (a: bool) -> bool { a; };
+    def k = () -> int { 9 + one; };
+"""
+
+def parse(program):
+    tokens = lexer.tokenize_program(program)
+    return parser.Parser(tokens).parse()
+
+def analyze_serial(program):
+    return semantic_analyzer.SemanticAnalyzer(parse(program),
+                                              list(STDLIB)).analyze()
+
+def analyze_parallel(program):
+    return ParallelSemanticAnalyzer(parse(program), list(STDLIB),
+                                    max_workers=2).analyze()
+
+class TestParallelSemanticAnalyzer(unittest.TestCase):
+    def test_same_as_serial(self):
+        serial_consts, serial_funcs = analyze_serial(PROGRAM)
+        consts, funcs = analyze_parallel(PROGRAM)
+        self.assertEqual(consts, serial_consts)
+        self.assertEqual([f.to_dict() for f in funcs],
+                         [f.to_dict() for f in serial_funcs])
+
+    def test_function_references(self):
+        consts, funcs = analyze_parallel(PROGRAM)
+        fib, f, g = funcs[0], funcs[1], funcs[2]
+        self.assertIs(fib.body.on_false.args[0].function, fib)
+        self.assertIs(g.body.args[0].function, f)
+        self.assertIs(g.body.function, STDLIB[0])
+
+    def test_shared_nodes(self):
+        consts, funcs = analyze_parallel(PROGRAM)
+        fib, f = funcs[0], funcs[1]
+        # Both branches refer to the node of the global value "one" ...
+        self.assertIs(fib.body.on_true, funcs[-1].body.args[1])
+        # ... and both uses of a local refer to the same node.
+        self.assertIs(f.body.args[0], f.body.args[1].args[0])
+
+    def test_tail_calls(self):
+        consts, funcs = analyze_parallel("""
+            def f = (a: int) -> int { if a < 1 then a else f(a - 1); };
+            def g = (a: int) -> int { f(a); };
+        """)
+        self.assertTrue(funcs[0].body.on_false.is_tail_call)
+        self.assertTrue(funcs[1].body.is_tail_call)
+
+    def test_first_error_in_function(self):
+        with self.assertRaises(SemanticAnalyzerException) as context:
+            analyze_parallel("""
+                def f = () -> int { x; };
+                def g = () -> int { 1; };
+                def x = y;
+                def h = () -> int { z; };
+            """)
+        self.assertIn("x could not be resolved", str(context.exception))
+
+    def test_first_error_in_global(self):
+        with self.assertRaises(SemanticAnalyzerException) as context:
+            analyze_parallel("""
+                def f = () -> int { 1; };
+                def x = y;
+                def g = () -> int { 1; };
+                def h = () -> int { z; };
+            """)
+        self.assertIn("y could not be resolved", str(context.exception))
+
+    def test_serial_fallback(self):
+        analyzer = ParallelSemanticAnalyzer(parse(PROGRAM), list(STDLIB),
+                                            max_workers=1)
+        consts, funcs = analyzer.analyze()
+        self.assertEqual(consts, analyze_serial(PROGRAM)[0])
+
+    def test_parse_tree_is_sent_as_file(self):
+        class RecordingAnalyzer(ParallelSemanticAnalyzer):
+            def submit_chunks(self, executor, workers, program,
+                              function_indices):
+                self.program = program
+                return super(RecordingAnalyzer, self).submit_chunks(
+                    executor, workers, program, function_indices)
+
+        analyzer = RecordingAnalyzer(parse(PROGRAM), list(STDLIB),
+                                     max_workers=2)
+        consts, funcs = analyzer.analyze()
+        self.assertEqual(consts, analyze_serial(PROGRAM)[0])
+        path, signatures = analyzer.program
+        self.assertEqual(len(signatures), len(STDLIB))
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == "__main__":
+    unittest.main()
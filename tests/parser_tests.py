@@ -1,6 +1,9 @@
+import io
+import threading
 import unittest
 from tests_common import UPLTestCase
 from upl import lexer, parser, parse_nodes
+from upl.token import TokenType
 from upl.exceptions import ParserException
 import json
 
@@ -9,6 +12,8 @@ BOOL_TYPE_NODE = "TokenType.KeywordBool"
 REAL_TYPE_NODE = "TokenType.KeywordReal"
 
 class TestParser(UPLTestCase):
+    parser_options = {}
+
     def test_literal_expressions(self):
         self.checkParseTree("""
             1;
@@ -427,14 +432,322 @@ class TestParser(UPLTestCase):
             "statements": [{"type": "IntLiteralNode"}]
         })
 
+    def test_parse_token_stream(self):
+        program = u"""
+            def a = 1 + 2;
+            def f = (x: int) -> int {
+                def y = x * a;;
+                if y > 1 then F(y, (2)) else -y;
+            };
+            ;f(3)
+        """
+        tokens = lexer.tokenize_program(program)
+        expected = self.makeParser(tokens).parse().to_dict()
+        stream = lexer.iter_tokens(io.StringIO(program), chunk_size=5)
+        self.assertEqual(self.makeParser(stream).parse().to_dict(), expected)
+
+    def test_iter_statements_is_lazy(self):
+        def token_stream():
+            for token in lexer.tokenize_program("1 + 2; (a;"):
+                yield token
+            raise AssertionError("read past the statement")
+
+        statements = self.makeParser([]).iter_statements(token_stream())
+        self.assertEqual(next(statements).operator, "+")
+
+    def test_iter_statement_tokens(self):
+        tokens = lexer.tokenize_program("1 + 2;; def f = () -> int { 3; }; a")
+        statements = list(self.makeParser([]).iter_statement_tokens(tokens))
+        self.assertEqual([len(s) for s in statements], [3, 11, 1])
+        self.assertEqual(statements[1][-1].type, TokenType.CloseBracket)
+
+    def test_parse_token_stream_error(self):
+        with self.assertRaises(ParserException):
+            self.makeParser(iter(lexer.tokenize_program("1; def;"))).parse()
+
+    def test_bracket_index(self):
+        tokens = lexer.tokenize_program("f(a, (b, c)) , {d, }")
+        index = parser.BracketIndex(tokens)
+        self.assertEqual(index.depths,
+                         [0, 0, 1, 1, 1, 2, 2, 2, 2, 1, 0, 0, 1, 1, 1])
+        self.assertEqual(index.matches[1], 9)
+        self.assertEqual(index.matches[8], 4)
+        self.assertEqual(index.matches[11], 14)
+        self.assertEqual(index.find_delimiters(0, 15, TokenType.ArgumentSep),
+                         [10])
+        self.assertEqual(index.find_delimiters(2, 9, TokenType.ArgumentSep),
+                         [3])
+        self.assertEqual(index.find_delimiters(5, 8, TokenType.ArgumentSep),
+                         [6])
+        self.assertEqual(index.find_delimiters(12, 15, TokenType.ArgumentSep),
+                         [13])
+        self.assertEqual(index.find_delimiters(2, 9, TokenType.ArgumentSep, 2),
+                         [])
+
+    def test_find_delimiters_matches_scan(self):
+        tokens = lexer.tokenize_program("(a + b) * c ; d(-e, f) - {g + h}; i + -j")
+        indexed_parser = parser.Parser(tokens)
+        window = indexed_parser.make_token_range(tokens)
+        scanning_parser = parser.Parser(tokens, token_window=False)
+        for start in range(len(tokens)):
+            for stop in range(start, len(tokens) + 1):
+                for type in (TokenType.Operator, TokenType.StatementSep):
+                    for skip in (0, 1):
+                        self.assertEqual(
+                            indexed_parser.find_delimiters(window[start:stop],
+                                                           type, skip),
+                            scanning_parser.find_delimiters(tokens[start:stop],
+                                                            type, skip))
+        self.assertEqual(indexed_parser.find_delimiters(window, TokenType.Operator,
+                                                        limit=2), [5, 15])
+
+    def test_unary_after_higher_priority_operator(self):
+        self.checkParseFails("a * -b;")
+        self.checkParseTree("a + -b * c;", {
+            "statements": [
+                {
+                    "operator": "+",
+                    "left_operand": {"type": "IdentifierNode"},
+                    "right_operand": {
+                        "operator": "*",
+                        "left_operand": {"type": "UnaryOperationNode"}
+                    }
+                }
+            ]
+        })
+        self.checkParseTree("- - a + b;", {
+            "statements": [
+                {
+                    "type": "UnaryOperationNode",
+                    "operand": {
+                        "type": "BinaryOperationNode",
+                        "left_operand": {"type": "UnaryOperationNode"}
+                    }
+                }
+            ]
+        })
+
+    def test_registered_operators(self):
+        self.checkParseTree("a |> b |> c + d @> e @> f;", {
+            "statements": [
+                {
+                    "operator": "|>",
+                    "left_operand": {
+                        "operator": "|>",
+                        "left_operand": {"name": "a"},
+                        "right_operand": {"name": "b"}
+                    },
+                    "right_operand": {
+                        "operator": "+",
+                        "left_operand": {"name": "c"},
+                        "right_operand": {
+                            "operator": "@>",
+                            "left_operand": {
+                                "operator": "@>",
+                                "left_operand": {"name": "d"},
+                                "right_operand": {"name": "e"}
+                            },
+                            "right_operand": {"name": "f"}
+                        }
+                    }
+                }
+            ]
+        }, operators=[("|>", -1, parser.Associativity.Left),
+                      ("@>", 6.5, parser.Associativity.Left)])
+
+    def test_registered_operator_priority(self):
+        self.checkParseTree("a + b * c;", {
+            "statements": [
+                {
+                    "operator": "*",
+                    "left_operand": {"operator": "+"},
+                }
+            ]
+        }, operators=[("*", 4.5, parser.Associativity.Right)])
+
+    def makeParser(self, tokens):
+        return parser.Parser(tokens, **self.parser_options)
+
     def checkParseFails(self, program):
         with self.assertRaises(ParserException):
             tokens = lexer.tokenize_program(program)
-            parse_tree = parser.Parser(tokens).parse()
+            parse_tree = self.makeParser(tokens).parse()
 
-    def checkParseTree(self, program, partial_parse_tree):
+    def checkParseTree(self, program, partial_parse_tree, operators=()):
         tokens = lexer.tokenize_program(program)
-        parse_tree = parser.Parser(tokens).parse()
+        program_parser = self.makeParser(tokens)
+        for operator in operators:
+            program_parser.register_operator(*operator)
+        parse_tree = program_parser.parse()
         self.assertIsNotNone(parse_tree)
 
         self.matchValues(parse_tree.to_dict(), partial_parse_tree)
+
+
+class TestListParser(TestParser):
+    parser_options = {"token_window": False}
+
+class TestCascadeParser(TestParser):
+    parser_options = {"precedence_climbing": False}
+
+class TestParseNodes(unittest.TestCase):
+    def test_nodes_have_slots(self):
+        tokens = lexer.tokenize_program("""
+            def f = (a: int) -> real { if !true then -a else g(a * 2, 1.5); };
+        """)
+        nodes = [parser.Parser(tokens).parse()]
+        while nodes:
+            node = nodes.pop()
+            self.assertFalse(hasattr(node, "__dict__"), type(node).__name__)
+            for name in ("statements", "arg_list", "args"):
+                nodes.extend(getattr(node, name, []))
+            for name in ("expression", "condition", "on_true", "on_false",
+                         "left_operand", "right_operand", "operand"):
+                if hasattr(node, name):
+                    nodes.append(getattr(node, name))
+
+class TestNodeIds(unittest.TestCase):
+    PROGRAM = """
+        def f = (a: int) -> int { if a < 2 then a else f(a - 1) + -a; };
+        f(3);
+    """
+
+    def get_ids(self, node):
+        ids = [node.id]
+        for name in ("statements", "arg_list", "args"):
+            for child in getattr(node, name, []):
+                ids.extend(self.get_ids(child))
+        for name in ("expression", "condition", "on_true", "on_false",
+                     "left_operand", "right_operand", "operand"):
+            if hasattr(node, name):
+                ids.extend(self.get_ids(getattr(node, name)))
+        return ids
+
+    def parse_ids(self, program_parser=None):
+        tokens = lexer.tokenize_program(self.PROGRAM)
+        program_parser = program_parser or parser.Parser(tokens)
+        return self.get_ids(program_parser.parse())
+
+    def test_ids_are_unique(self):
+        ids = self.parse_ids()
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertNotIn(None, ids)
+
+    def test_ids_are_reset_per_parse(self):
+        first = self.parse_ids()
+        parser.Parser(lexer.tokenize_program("1 + 2;")).parse()
+        self.assertEqual(self.parse_ids(), first)
+
+        program_parser = parser.Parser(lexer.tokenize_program(self.PROGRAM))
+        self.assertEqual(self.parse_ids(program_parser), first)
+        self.assertEqual(self.parse_ids(program_parser), first)
+
+    def test_parallel_parses(self):
+        expected = self.parse_ids()
+        results = []
+
+        def parse():
+            for _ in range(4):
+                results.append(self.parse_ids())
+
+        threads = [threading.Thread(target=parse) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * 16)
+
+class TestOperatorExpressionParser(unittest.TestCase):
+    def test_long_operator_chain(self):
+        tokens = lexer.tokenize_program(" + ".join(["f(a)"] * 3000) + ";")
+        node = parser.Parser(tokens).parse().statements[0]
+        depth = 0
+        while isinstance(node, parse_nodes.BinaryOperationNode):
+            self.assertIsInstance(node.left_operand, parse_nodes.FuncCallNode)
+            node = node.right_operand
+            depth += 1
+        self.assertEqual(depth, 2999)
+
+    def test_falls_back_to_cascade(self):
+        tokens = lexer.tokenize_program("if a then b else c + 1")
+        operator_parser = parser.Parser(tokens)
+        window = operator_parser.make_token_range(tokens)
+        self.assertIsNone(operator_parser.parse_operator_expression(window))
+        self.assertIsNotNone(operator_parser.parse_operator_expression(window[5:]))
+
+    def test_failed_operands_are_parsed_once(self):
+        class CountingParser(parser.Parser):
+            calls = 0
+
+            def parse_operator_expression(self, tokens):
+                self.calls += 1
+                return super(CountingParser,
+                             self).parse_operator_expression(tokens)
+
+        depth = 10
+        tokens = lexer.tokenize_program("a + f(" * depth +
+                                        "(x: int) -> int { 1; } b" +
+                                        ")" * depth + ";")
+        counting_parser = CountingParser(tokens)
+        with self.assertRaises(ParserException):
+            counting_parser.parse()
+        self.assertLess(counting_parser.calls, 4 * depth)
+
+class TestPackratParser(TestParser):
+    parser_options = {"packrat": True}
+
+class TestPackratCascadeParser(TestParser):
+    parser_options = {"packrat": True, "precedence_climbing": False}
+
+class TestOperatorRegistration(unittest.TestCase):
+    def test_priority_lookup(self):
+        program_parser = parser.Parser([])
+        self.assertEqual(program_parser.get_operator_priority("||"), 0)
+        self.assertEqual(program_parser.get_operator_priority("**"), 7)
+        self.assertEqual(program_parser.get_operator_priority("@>"),
+                         parser.DEFAULT_OPERATOR_PRIORITY)
+
+    def test_registration_is_per_parser(self):
+        program_parser = parser.Parser([])
+        program_parser.register_operator("@>", 1)
+        self.assertEqual(program_parser.get_operator_priority("@>"), 1)
+        self.assertEqual(parser.Parser([]).get_operator_priority("@>"),
+                         parser.DEFAULT_OPERATOR_PRIORITY)
+
+    def test_associativity_conflict(self):
+        program_parser = parser.Parser([])
+        with self.assertRaises(ValueError):
+            program_parser.register_operator("@>", 5, parser.Associativity.Left)
+        with self.assertRaises(ValueError):
+            program_parser.register_operator("@>", parser.DEFAULT_OPERATOR_PRIORITY,
+                                             parser.Associativity.Left)
+        program_parser.register_operator("@>", 20, parser.Associativity.Left)
+        with self.assertRaises(ValueError):
+            program_parser.register_operator("<@", 20)
+
+class TestPackratCache(unittest.TestCase):
+    def test_counters(self):
+        tokens = lexer.tokenize_program(" + ".join(["- (x * - y)"] * 16) + ";")
+        cascade_parser = parser.Parser(tokens, precedence_climbing=False,
+                                       packrat=True)
+        with self.assertRaises(ParserException):
+            cascade_parser.parse()
+        self.assertGreater(cascade_parser.packrat_hits, 0)
+        self.assertGreater(cascade_parser.packrat_misses, 0)
+
+    def test_cleared_per_parse(self):
+        tokens = lexer.tokenize_program("f(a + b, -c);")
+        packrat_parser = parser.Parser(tokens, packrat=True)
+        first = packrat_parser.parse()
+        misses = packrat_parser.packrat_misses
+        second = packrat_parser.parse()
+        self.assertEqual(packrat_parser.packrat_misses, misses)
+        self.assertEqual(first.to_dict(), second.to_dict())
+        self.assertIsNot(first.statements[0], second.statements[0])
+
+    def test_disabled_by_default(self):
+        tokens = lexer.tokenize_program("f(a + b, -c);")
+        default_parser = parser.Parser(tokens)
+        default_parser.parse()
+        self.assertEqual(default_parser.packrat_misses, 0)
+        self.assertEqual(default_parser.packrat_cache, {})
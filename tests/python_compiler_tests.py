@@ -0,0 +1,45 @@
+import unittest
+import interpreter_tests
+from interpreter_tests import STDLIB, PURE_STDLIB, FIB
+from upl import lexer, parser, semantic_analyzer
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.cse import ExpressionInterner
+from upl.python_compiler import PythonCompiler
+
+class TestPythonCompiler(interpreter_tests.TestInterpreter):
+    executor = PythonCompiler
+
+    def test_operators_are_inlined(self):
+        compiler = self.makeInterpreter(FIB)
+        self.assertIn("(a0 < 2)", compiler.source)
+        self.assertIn("(a0 - 1)", compiler.source)
+        self.assertEqual(sorted(compiler.names.values()), ["f0"])
+
+    def test_shared_nodes_use_old_syntax(self):
+        tokens = lexer.tokenize_program("""
+            def f = (a: int) -> int {
+                if a < 2 then (a + 1) * (a + 1) else f(a - 1);
+            };
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, funcs = semantic_analyzer.SemanticAnalyzer(
+            parse_tree, PURE_STDLIB).analyze()
+        consts, funcs = ExpressionInterner(consts, funcs).intern()
+        compiler = PythonCompiler(consts, funcs)
+
+        self.assertIn("store_temporary(t, 0, ", compiler.source)
+        # Assignment expressions are not available before Python 3.8.
+        self.assertNotIn(":=", compiler.source)
+        self.assertEqual(compiler.call(funcs[0], [5]), 4)
+
+    def test_external_function_is_called(self):
+        stdlib = STDLIB + (
+            FuncDefAnalyzeNode("twice", [BasicType.Int], BasicType.Int,
+                               lambda a: a * 2),
+        )
+        self.checkResult("def f = (a: int) -> int { twice(a) + 1; };",
+                         "f", [3], 7, stdlib)
+
+    def test_unusual_constant(self):
+        self.checkResult("def f = () -> real { 1.0e999; };",
+                         "f", [], float("inf"))
@@ -89,6 +89,30 @@ class TestSemanticAnalyzer(UPLTestCase):
             {"body": {"type": "ConditionalAnalyzeNode"}}
         ])
 
+    def test_tail_calls(self):
+        self.checkSemanticTree("""
+            def f = (a: int) -> int {
+                if a < 2 then f(a - 1) else (if a < 5 then a else f(a) - 1);
+            };
+        """, [
+            {"body": {
+                "type": "ConditionalAnalyzeNode",
+                "condition": {"is_tail_call": False},
+                "on_true": {
+                    "is_tail_call": True,
+                    "args": [{"is_tail_call": False}]
+                },
+                "on_false": {
+                    "on_true": {"type": "FuncArgAnalyzeNode"},
+                    "on_false": {
+                        "is_tail_call": True,
+                        "function": "-",
+                        "args": [{"is_tail_call": False}, {}]
+                    }
+                }
+            }}
+        ])
+
     def test_multi_statement_body(self):
         self.checkSemanticTree("""
             def f = () -> int {
@@ -135,6 +159,20 @@ class TestSemanticAnalyzer(UPLTestCase):
             {"body": {"type": "ConstantAnalyzeNode"}}
         ])
 
+    def test_only_analyzed_literals_are_constants(self):
+        tokens = lexer.tokenize_program("""
+            7;
+            def f = () -> int {
+                1 + 2;
+                5;
+            };
+            def a = 5 < 6;
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, _ = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                       STDLIB).analyze()
+        self.assertEqual(consts, [(BasicType.Int, 5), (BasicType.Int, 6)])
+
     def test_duplicate_function(self):
         self.checkAnalyzeFails("""
             def f = () -> int {1;};
@@ -165,6 +203,26 @@ class TestSemanticAnalyzer(UPLTestCase):
             };
         """)
 
+    def test_local_scope(self):
+        self.checkAnalyzeFails("""
+            def f = (a: int) -> int { def b = 1; b; };
+            def g = () -> int { b; };
+        """)
+        self.checkAnalyzeFails("""
+            def f = (a: int) -> int { a; };
+            def g = () -> int { a; };
+        """)
+        self.checkSemanticTree("""
+            def f = (a: int) -> int { def b = 1; b; };
+            def g = (b: int) -> int { def a = b; a; };
+        """, [{}, {"body": {"type": "FuncArgAnalyzeNode", "index": 0}}])
+
+    def test_global_used_before_definition(self):
+        self.checkAnalyzeFails("""
+            def f = () -> int { a; };
+            def a = 1;
+        """)
+
     def test_return_type_check(self):
         self.checkAnalyzeFails("""
             def f = () -> bool { 1; };
@@ -190,6 +248,66 @@ class TestSemanticAnalyzer(UPLTestCase):
             }
         """)
 
+    def test_overload_resolution(self):
+        first = FuncDefAnalyzeNode("g", [BasicType.Int], BasicType.Bool)
+        stdlib = STDLIB + (
+            first,
+            FuncDefAnalyzeNode("g", [BasicType.Int], BasicType.Int),
+            FuncDefAnalyzeNode("g", [BasicType.Bool], BasicType.Int),
+            FuncDefAnalyzeNode("g", [], BasicType.Int),
+        )
+        tokens = lexer.tokenize_program("""
+            def g = (a: real) -> real { a; };
+            def f = (a: int) -> bool { if g(a) then g(true) < g() else false; };
+            def h = () -> real { g(1.5); };
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, (g, f, h) = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                               stdlib).analyze()
+        self.assertIs(f.body.condition.function, first)
+        self.assertIs(f.body.on_true.args[0].function, stdlib[-2])
+        self.assertIs(f.body.on_true.args[1].function, stdlib[-1])
+        self.assertIs(h.body.function, g)
+
+    def test_unresolved_overload(self):
+        tokens = lexer.tokenize_program("def f = (a: int) -> int { a - true; };")
+        parse_tree = parser.Parser(tokens).parse()
+        analyzer = semantic_analyzer.SemanticAnalyzer(parse_tree, STDLIB)
+        with self.assertRaises(SemanticAnalyzerException) as context:
+            analyzer.analyze()
+        self.assertEqual(str(context.exception),
+                         "Could not resolve function - "
+                         "[<BasicType.Int: 1>, <BasicType.Bool: 0>]")
+
+    def test_nodes_have_slots(self):
+        tokens = lexer.tokenize_program("""
+            def f = (a: int) -> int { if a < 1 then 0 else f(a - 1); };
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        consts, (f, ) = semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                                           STDLIB).analyze()
+        for node in (f, f.body, f.body.on_true, f.body.on_false,
+                     f.body.on_false.args[0].args[0]):
+            self.assertFalse(hasattr(node, "__dict__"), type(node).__name__)
+            self.assertFalse(node.shared)
+
+    def test_subclass_overrides_handler(self):
+        class CountingAnalyzer(semantic_analyzer.SemanticAnalyzer):
+            conditionals = 0
+
+            def analyze_conditional(self, node, symtab):
+                self.conditionals += 1
+                return super(CountingAnalyzer, self).analyze_conditional(
+                    node, symtab)
+
+        tokens = lexer.tokenize_program("""
+            def f = (a: int) -> int { if a < 1 then 0 else f(a - 1); };
+        """)
+        parse_tree = parser.Parser(tokens).parse()
+        analyzer = CountingAnalyzer(parse_tree, STDLIB)
+        analyzer.analyze()
+        self.assertEqual(analyzer.conditionals, 1)
+
     def checkSemanticTree(self, program, partial_semantic_tree):
         tokens = lexer.tokenize_program(program)
         parse_tree = parser.Parser(tokens).parse()
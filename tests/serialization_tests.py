@@ -0,0 +1,140 @@
+import unittest
+from array import array
+from interpreter_tests import STDLIB, PURE_STDLIB, FIB
+from upl import lexer, parser, serialization
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, BasicType
+from upl.serialization import dump_parse_tree, load_parse_tree,\
+                              dump_analyzed, load_analyzed
+from upl.compile_cache import analyze_program
+from upl.interpreter import Interpreter
+from upl.cse import ExpressionInterner
+
+PROGRAM = """
+    def x = 1.5e300 * 2.0;
+    def flag = !false;
+    def big = 123456789012345678901234567890;
+    def f = (a: int, b: real) -> real {
+        def c = if a < 0 then -a else a + big;
+        g(c, b, x);
+    };
+"""
+
+def parse(program):
+    return parser.Parser(lexer.tokenize_program(program)).parse()
+
+class TestParseTreeSerialization(unittest.TestCase):
+    def test_round_trip(self):
+        tree = parse(PROGRAM)
+        loaded = load_parse_tree(dump_parse_tree(tree))
+        self.assertEqual(loaded.to_dict(), tree.to_dict())
+
+    def test_locations_are_kept(self):
+        tree = parse("def a = 1;\n  f(a, 2);")
+        loaded = load_parse_tree(dump_parse_tree(tree))
+        self.assertEqual(loaded.statements[1].location,
+                         tree.statements[1].location)
+        self.assertEqual(loaded.statements[1].args[1].location, (2, 8))
+
+    def test_ids_are_kept(self):
+        tree = parse(PROGRAM)
+        loaded = load_parse_tree(dump_parse_tree(tree))
+        self.assertEqual(loaded.id, tree.id)
+        self.assertEqual(loaded.statements[3].expression.statements[1].id,
+                         tree.statements[3].expression.statements[1].id)
+
+    def test_strings_are_interned(self):
+        repeated = dump_parse_tree(parse("abcdefgh; abcdefgh;"))
+        different = dump_parse_tree(parse("abcdefgh; hgfedcba;"))
+        self.assertEqual(len(different) - len(repeated),
+                         len("hgfedcba") + 4)
+
+    def test_invalid_data(self):
+        data = dump_parse_tree(parse(FIB))
+        for invalid in (b"", b"UPLA" + data[4:], data[:-3], data[:20]):
+            self.assertRaises(ValueError, load_parse_tree, invalid)
+
+        analyzed = dump_analyzed(*analyze_program(FIB, STDLIB))
+        self.assertRaises(ValueError, load_parse_tree, analyzed)
+
+    def test_array_typecodes(self):
+        for typecode, size in zip("bhiq", (1, 2, 4, 8)):
+            array_typecode = serialization.ARRAY_TYPECODES[typecode]
+            self.assertEqual(array(array_typecode).itemsize, size)
+
+    def test_without_8_byte_arrays(self):
+        tree = parse(PROGRAM)
+        tree.id = 1 << 40
+        data = dump_parse_tree(tree)
+
+        typecodes = serialization.ARRAY_TYPECODES
+        serialization.ARRAY_TYPECODES = dict(typecodes, q=None)
+        try:
+            self.assertEqual(dump_parse_tree(tree), data)
+            loaded = load_parse_tree(data)
+        finally:
+            serialization.ARRAY_TYPECODES = typecodes
+        self.assertEqual(loaded.id, 1 << 40)
+        self.assertEqual(loaded.to_dict(), tree.to_dict())
+
+class TestAnalyzedSerialization(unittest.TestCase):
+    def test_round_trip(self):
+        consts, funcs = analyze_program(FIB, STDLIB)
+        loaded_consts, loaded_funcs = load_analyzed(
+            dump_analyzed(consts, funcs), STDLIB)
+        self.assertEqual(loaded_consts, consts)
+        self.assertEqual([f.to_dict() for f in loaded_funcs],
+                         [f.to_dict() for f in funcs])
+
+        interpreter = Interpreter(loaded_consts, loaded_funcs)
+        self.assertEqual(interpreter.call(interpreter.get_function("fib"),
+                                          [15]), 610)
+
+    def test_sharing_and_flags_are_kept(self):
+        consts, funcs = analyze_program("""
+            def f = (a: int) -> int { (a + 1) * (a + 1); };
+            def g = (a: int) -> int { if a < 1 then a else g(a - 1); };
+        """, PURE_STDLIB)
+        consts, funcs = ExpressionInterner(consts, funcs).intern()
+
+        consts, (f, g) = load_analyzed(dump_analyzed(consts, funcs),
+                                       PURE_STDLIB)
+        self.assertIs(f.body.args[0], f.body.args[1])
+        self.assertTrue(f.body.args[0].shared)
+        self.assertFalse(f.body.shared)
+        self.assertTrue(g.body.on_false.is_tail_call)
+        self.assertFalse(g.body.on_false.args[0].is_tail_call)
+
+    def test_constants_keep_their_type(self):
+        consts, funcs = analyze_program("""
+            def x = () -> real { 1.0 + 0.5; };
+            def b = () -> bool { true; };
+            def i = () -> int { 123456789012345678901234567890; };
+        """, STDLIB)
+        loaded, _ = load_analyzed(dump_analyzed(consts, funcs), STDLIB)
+        self.assertEqual(loaded, consts)
+        self.assertEqual([type(value) for _, value in loaded],
+                         [type(value) for _, value in consts])
+
+    def test_externals_are_bound_by_signature(self):
+        data = dump_analyzed(*analyze_program(FIB, STDLIB))
+        consts, (fib, ) = load_analyzed(data, PURE_STDLIB)
+        self.assertIs(fib.body.condition.function, PURE_STDLIB[-1])
+
+        stdlib = STDLIB[:-1] + (FuncDefAnalyzeNode("<", [BasicType.Real,
+                                                         BasicType.Real],
+                                                   BasicType.Bool),)
+        self.assertRaises(ValueError, load_analyzed, data, stdlib)
+
+    def test_first_duplicate_external_is_bound(self):
+        duplicate = FuncDefAnalyzeNode("<", [BasicType.Int, BasicType.Int],
+                                       BasicType.Bool)
+        stdlib = STDLIB + (duplicate, )
+        consts, (fib, ) = analyze_program(FIB, stdlib)
+        first = fib.body.condition.function
+        self.assertIsNot(first, duplicate)
+
+        consts, (fib, ) = load_analyzed(dump_analyzed(consts, [fib]), stdlib)
+        self.assertIs(fib.body.condition.function, first)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from upl.symbol_table import SymbolTable
+
+class TestSymbolTable(unittest.TestCase):
+    def test_lookup_through_parents(self):
+        globals_scope = SymbolTable()
+        globals_scope["a"] = [1]
+        local_scope = globals_scope.push()
+        local_scope["b"] = [2]
+
+        self.assertIn("a", local_scope)
+        self.assertIn("b", local_scope)
+        self.assertNotIn("b", globals_scope)
+        self.assertNotIn("c", local_scope)
+        self.assertEqual(local_scope["a"], [1])
+        self.assertEqual(local_scope["b"], [2])
+        self.assertRaises(KeyError, lambda: globals_scope["b"])
+
+    def test_inner_scope_shadows(self):
+        outer = SymbolTable()
+        outer["a"] = [1]
+        inner = outer.push()
+        inner["a"] = [2]
+        self.assertEqual(inner["a"], [2])
+        self.assertEqual(outer["a"], [1])
+
+    def test_pop(self):
+        outer = SymbolTable()
+        inner = outer.push()
+        self.assertIs(inner.pop(), outer)
+        self.assertIsNone(outer.pop())
+
+    def test_parent_changes_are_visible(self):
+        outer = SymbolTable()
+        inner = outer.push()
+        outer["a"] = [1]
+        self.assertEqual(inner["a"], [1])
+
+if __name__ == "__main__":
+    unittest.main()
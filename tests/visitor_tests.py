@@ -0,0 +1,64 @@
+import unittest
+from upl.parse_nodes import LiteralNode, IntLiteralNode, RealLiteralNode,\
+                            BoolLiteralNode, IdentifierNode
+from upl.visitor import NodeDispatcher
+
+class Describer(object):
+    describe = NodeDispatcher("describe")
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @describe.register(IntLiteralNode, RealLiteralNode)
+    def describe_number(self, node, suffix=""):
+        return "%snumber %s%s" % (self.prefix, node.value, suffix)
+
+    @describe.register(LiteralNode)
+    def describe_literal(self, node, suffix=""):
+        return "%sliteral %s%s" % (self.prefix, node.value, suffix)
+
+class DefaultDescriber(Describer):
+    describe = NodeDispatcher("describe",
+                              default=lambda self, node: "unknown")
+
+class LoudDescriber(Describer):
+    def describe_number(self, node, suffix=""):
+        return super(LoudDescriber, self).describe_number(node, suffix).upper()
+
+class TestNodeDispatcher(unittest.TestCase):
+    def test_dispatch_by_class(self):
+        describer = Describer("> ")
+        self.assertEqual(describer.describe(IntLiteralNode((1, 1), 2)),
+                         "> number 2")
+        self.assertEqual(describer.describe(RealLiteralNode((1, 1), 2.5), "!"),
+                         "> number 2.5!")
+
+    def test_dispatch_to_base_class(self):
+        describer = Describer("")
+        self.assertEqual(describer.describe(BoolLiteralNode((1, 1), True)),
+                         "literal True")
+
+    def test_unhandled_node(self):
+        describer = Describer("")
+        with self.assertRaises(TypeError):
+            describer.describe(IdentifierNode((1, 1), "a"))
+        self.assertEqual(
+            DefaultDescriber("").describe(IdentifierNode((1, 1), "a")),
+            "unknown")
+
+    def test_overridden_handler(self):
+        describer = LoudDescriber("> ")
+        self.assertEqual(describer.describe(IntLiteralNode((1, 1), 2)),
+                         "> NUMBER 2")
+        self.assertEqual(describer.describe(BoolLiteralNode((1, 1), True)),
+                         "> literal True")
+        self.assertEqual(Describer("").describe(IntLiteralNode((1, 1), 2)),
+                         "number 2")
+
+    def test_register_returns_method(self):
+        self.assertEqual(Describer("").describe_number(IntLiteralNode((1, 1), 1)),
+                         "number 1")
+        self.assertIsInstance(Describer.describe, NodeDispatcher)
+
+if __name__ == "__main__":
+    unittest.main()
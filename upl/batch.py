@@ -0,0 +1,192 @@
+import operator
+from upl.semantic_analyze_nodes import BasicType, FuncArgAnalyzeNode,\
+                                       ConstantAnalyzeNode, FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.interpreter import Interpreter, missing_implementation
+from upl.python_compiler import PythonCompiler
+from upl.exceptions import RuntimeException
+from upl.call_graph import get_recursive_functions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def get_default_ufuncs():
+    """
+    Returns the NumPy ufuncs which compute the operator module functions
+    element-wise.
+    """
+    return {
+        operator.add: numpy.add,
+        operator.sub: numpy.subtract,
+        operator.mul: numpy.multiply,
+        operator.truediv: numpy.true_divide,
+        operator.floordiv: numpy.floor_divide,
+        operator.mod: numpy.remainder,
+        operator.lt: numpy.less,
+        operator.le: numpy.less_equal,
+        operator.gt: numpy.greater,
+        operator.ge: numpy.greater_equal,
+        operator.eq: numpy.equal,
+        operator.ne: numpy.not_equal,
+        operator.neg: numpy.negative,
+        operator.pos: numpy.positive,
+        operator.not_: numpy.logical_not,
+    }
+
+
+def get_dtype(basic_type):
+    """
+    Returns the NumPy dtype which holds values of the given BasicType.
+    """
+    return {
+        BasicType.Bool: numpy.bool_,
+        BasicType.Int: numpy.int64,
+        BasicType.Real: numpy.float64,
+    }[basic_type]
+
+
+class BatchEvaluator(Interpreter):
+    """
+    BatchEvaluator runs a function on whole columns of arguments at once.
+    Every argument is a NumPy array with one element per row, and calls to
+    external functions run the matching ufunc over the whole column.
+
+    Conditionals are evaluated with masks: each branch only runs on the rows
+    which take it. Calls which cannot be vectorized run row by row on a
+    row executor (PythonCompiler by default). These are calls to recursive
+    functions, and calls to external functions without a ufunc.
+
+    Values are stored in NumPy types, so integers are 64 bit and operations
+    like division by zero follow NumPy instead of raising exceptions.
+    """
+
+    def __init__(self, consts, func_defs, ufuncs=None,
+                 row_executor=PythonCompiler):
+        """
+        Constructor for BatchEvaluator. consts and func_defs are the outputs
+        of SemanticAnalyzer.analyze(), see Interpreter. Optional arguments:
+
+          * ufuncs: Dict from implementations of external functions to the
+            functions which compute them on arrays. They extend the ufuncs
+            of the operator module functions.
+          * row_executor: Class which runs functions row by row.
+        """
+        if numpy is None:
+            raise ImportError("BatchEvaluator requires numpy")
+
+        super(BatchEvaluator, self).__init__(consts, func_defs)
+
+        self.ufuncs = get_default_ufuncs()
+        self.ufuncs.update(ufuncs or {})
+        self.row_executor = row_executor(consts, func_defs)
+        self.recursive_functions = get_recursive_functions(func_defs)
+
+    def call_batch(self, func_def, columns):
+        """
+        Calls the given function once for every row of the given argument
+        columns, and returns the array of the results.
+        """
+        if len(columns) != len(func_def.arg_types):
+            raise RuntimeException("%s expects %d arguments, but received %d"
+                                   % (func_def.name, len(func_def.arg_types),
+                                      len(columns)))
+
+        columns = [numpy.asarray(column, dtype=get_dtype(arg_type))
+                   for column, arg_type in zip(columns, func_def.arg_types)]
+        sizes = set(len(column) for column in columns)
+        if len(sizes) > 1:
+            raise RuntimeException("Argument columns of %s differ in length"
+                                   % (func_def.name, ))
+
+        size = sizes.pop() if sizes else 1
+        return self.evaluate_call(func_def, columns, size)
+
+    def evaluate_call(self, func_def, columns, size):
+        """
+        Calls the given function on the given argument columns of size rows.
+        """
+        if func_def.body is not None:
+            if func_def in self.recursive_functions:
+                return self.evaluate_rows(func_def, columns, size)
+            return self.evaluate_batch(func_def.body, columns, size)
+
+        ufunc = self.get_ufunc(func_def)
+        if ufunc is None or not columns:
+            return self.evaluate_rows(func_def, columns, size)
+
+        return numpy.asarray(ufunc(*columns), dtype=get_dtype(func_def.return_type))
+
+    def get_ufunc(self, func_def):
+        """
+        Returns the function which computes the given external function on
+        arrays, or None if it has none.
+        """
+        try:
+            return self.ufuncs.get(func_def.implementation)
+        except TypeError:
+            # Unhashable implementations can not have a ufunc.
+            return None
+
+    def evaluate_rows(self, func_def, columns, size):
+        """
+        Calls the given function separately for each row of the given
+        argument columns.
+        """
+        if func_def.body is None:
+            function = func_def.implementation or\
+                       missing_implementation(func_def)
+        else:
+            function = lambda *args: self.row_executor.call_function(func_def,
+                                                                     args)
+
+        if columns:
+            rows = zip(*[column.tolist() for column in columns])
+            values = [function(*row) for row in rows]
+        else:
+            values = [function() for _ in range(size)]
+
+        return numpy.array(values, dtype=get_dtype(func_def.return_type))
+
+    def evaluate_batch(self, node, columns, size):
+        """
+        Evaluates the given analyze node on the given argument columns of
+        size rows, and returns the array of its values.
+        """
+        if isinstance(node, FuncCallAnalyzeNode):
+            args = [self.evaluate_batch(arg, columns, size) for arg in node.args]
+            return self.evaluate_call(node.function, args, size)
+
+        elif isinstance(node, FuncArgAnalyzeNode):
+            return columns[node.index]
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            value_type, value = node.const_table[node.index]
+            return numpy.full(size, value, dtype=get_dtype(value_type))
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            mask = self.evaluate_batch(node.condition, columns, size)
+            if mask.all():
+                return self.evaluate_batch(node.on_true, columns, size)
+            elif not mask.any():
+                return self.evaluate_batch(node.on_false, columns, size)
+
+            on_true = self.evaluate_masked(node.on_true, columns, mask)
+            on_false = self.evaluate_masked(node.on_false, columns, ~mask)
+            result = numpy.empty(size, dtype=on_true.dtype)
+            result[mask] = on_true
+            result[~mask] = on_false
+            return result
+
+        else:
+            raise RuntimeException("Cannot evaluate %s" % (type(node).__name__, ))
+
+    def evaluate_masked(self, node, columns, mask):
+        """
+        Evaluates the given analyze node on the rows selected by the mask.
+        """
+        rows = numpy.flatnonzero(mask)
+        return self.evaluate_batch(node, [column[rows] for column in columns],
+                                   len(rows))
@@ -0,0 +1,448 @@
+from upl.semantic_analyze_nodes import FuncArgAnalyzeNode, ConstantAnalyzeNode,\
+                                       FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.interpreter import Interpreter, missing_implementation
+from upl.exceptions import RuntimeException
+from upl.memoization import MISSING, get_cache_key
+from upl.cse import get_children
+
+# Opcodes of the register machine. Code is a flat list of integers: every
+# instruction is its opcode followed by its operands, which are register
+# numbers, indices or jump targets.
+#
+#   LOAD_CONST    dst, const      regs[dst] = consts[const]
+#   LOAD_ARG      dst, src        regs[dst] = regs[src]
+#   CALL          dst, function, count, src...
+#   CALL_EXTERNAL dst, function, count, src...
+#                                 regs[dst] = function(regs[src]...)
+#   JUMP_IF_FALSE src, target     pc = target if not regs[src]
+#   JUMP          target          pc = target
+#   RETURN        src             return regs[src]
+#
+# The registers of a function start with its arguments, followed by the
+# constants it uses, which are filled in when the frame is created, and by
+# the values of shared nodes and the temporary values. Arguments, constants
+# and shared nodes which are already computed are therefore read in place,
+# and only need LOAD_ARG and LOAD_CONST when a value has to be copied.
+LOAD_CONST = 0
+LOAD_ARG = 1
+CALL = 2
+CALL_EXTERNAL = 3
+JUMP_IF_FALSE = 4
+JUMP = 5
+RETURN = 6
+
+opcode_names = ["LOAD_CONST", "LOAD_ARG", "CALL", "CALL_EXTERNAL",
+                "JUMP_IF_FALSE", "JUMP", "RETURN"]
+
+
+def get_operand_count(code, pc):
+    """
+    Returns the number of operands of the instruction at pc.
+    """
+    opcode = code[pc]
+    if opcode in (CALL, CALL_EXTERNAL):
+        return 3 + code[pc + 3]
+    elif opcode in (JUMP, RETURN):
+        return 1
+    return 2
+
+
+class BytecodeFunction(object):
+    """
+    A UPL function compiled to bytecode.
+    """
+
+    def __init__(self, name, arg_count):
+        self.name = name
+        self.arg_count = arg_count
+        self.register_count = arg_count
+        self.code = []
+
+        # Maps indices of the constant table to the registers which hold them.
+        self.const_registers = {}
+
+        # Maps shared nodes to the registers which hold their values.
+        self.shared_registers = {}
+
+        # The registers after the arguments of a new frame.
+        self.template = []
+
+        # The LRUCache of the results if the function is memoized.
+        self.cache = None
+
+    def disassemble(self):
+        """
+        Returns the code as a list of (opcode name, operands...) tuples.
+        """
+        instructions = []
+        pc = 0
+        while pc < len(self.code):
+            count = get_operand_count(self.code, pc)
+            instructions.append((opcode_names[self.code[pc]], ) +
+                                tuple(self.code[pc + 1:pc + 1 + count]))
+            pc += 1 + count
+        return instructions
+
+
+class BytecodeVM(Interpreter):
+    """
+    BytecodeVM compiles the analyzed functions to code for a register
+    machine and runs it. The frames of the running functions are kept in a
+    list instead of on the Python stack, so a UPL call costs a few list
+    operations and does not nest Python calls.
+
+    It has the same interface as Interpreter: get_function() and call().
+    """
+
+    def __init__(self, consts, func_defs, **options):
+        """
+        Constructor for BytecodeVM. Arguments are the same as for
+        Interpreter.
+        """
+        super(BytecodeVM, self).__init__(consts, func_defs, **options)
+
+        # The constant pool holds the values of the constant table.
+        self.constants = [value for _, value in consts]
+
+        # The function table holds a BytecodeFunction for every function of
+        # the program, and the implementation of every external function
+        # they call.
+        self.functions = [BytecodeFunction(func_def.name,
+                                           len(func_def.arg_types))
+                          for func_def in func_defs]
+        self.function_indices = dict((func_def, i)
+                                     for i, func_def in enumerate(func_defs))
+
+        for func_def in func_defs:
+            self.compile_function(func_def)
+
+        for func_def, cache in self.caches.items():
+            self.functions[self.function_indices[func_def]].cache = cache
+
+    def call_function(self, func_def, args):
+        """
+        Runs the given function without checking its arguments.
+        """
+        if func_def not in self.function_indices:
+            return self.get_implementation(func_def)(*args)
+
+        function = self.functions[self.function_indices[func_def]]
+        if function.cache is None:
+            return self.run(function, args)
+
+        key = get_cache_key(args)
+        value = function.cache.get(key)
+        if value is MISSING:
+            value = self.run(function, args)
+            function.cache.put(key, value)
+        return value
+
+    def get_implementation(self, func_def):
+        """
+        Returns the implementation of the given external function, or a
+        function which fails if it has none.
+        """
+        if func_def.implementation is not None:
+            return func_def.implementation
+        return missing_implementation(func_def)
+
+    def get_function_index(self, func_def):
+        """
+        Returns the index of the given function in the function table, adding
+        external functions when they are first called.
+        """
+        if func_def not in self.function_indices:
+            self.function_indices[func_def] = len(self.functions)
+            self.functions.append(self.get_implementation(func_def))
+        return self.function_indices[func_def]
+
+    def compile_function(self, func_def):
+        """
+        Compiles the body of the given function into its BytecodeFunction.
+        """
+        function = self.functions[self.function_indices[func_def]]
+
+        for index in self.get_const_indices(func_def.body):
+            if index not in function.const_registers:
+                function.const_registers[index] = function.register_count
+                function.register_count += 1
+
+        for node in self.get_shared_nodes(func_def.body):
+            function.shared_registers[node] = function.register_count
+            function.register_count += 1
+
+        # Shared nodes whose register holds their value on every path which
+        # leads to the code being compiled.
+        self.available = set()
+
+        self.compile_return(function, func_def.body, function.register_count)
+
+        function.template = [None] * (function.register_count -
+                                      function.arg_count)
+        for index, register in function.const_registers.items():
+            function.template[register - function.arg_count] =\
+                self.constants[index]
+
+    def get_const_indices(self, node):
+        """
+        Returns the indices of the constants used by the given analyze node.
+        """
+        if isinstance(node, FuncCallAnalyzeNode):
+            return [i for arg in node.args for i in self.get_const_indices(arg)]
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            return [node.index]
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            return self.get_const_indices(node.condition) +\
+                   self.get_const_indices(node.on_true) +\
+                   self.get_const_indices(node.on_false)
+
+        else:
+            return []
+
+    def get_shared_nodes(self, body):
+        """
+        Returns the list of the shared nodes in the given function body.
+        """
+        shared = []
+        visited = set([body])
+        pending = [body]
+        while pending:
+            node = pending.pop()
+            if node.shared:
+                shared.append(node)
+            for child in get_children(node):
+                if child not in visited:
+                    visited.add(child)
+                    pending.append(child)
+        return shared
+
+    def get_operand(self, function, node):
+        """
+        Returns the register which already holds the value of the given
+        analyze node, or None if it has to be computed.
+        """
+        if isinstance(node, FuncArgAnalyzeNode):
+            return node.index
+        elif isinstance(node, ConstantAnalyzeNode):
+            return function.const_registers[node.index]
+        elif node in self.available:
+            return function.shared_registers[node]
+        return None
+
+    def compile_return(self, function, node, free):
+        """
+        Emits the code which returns the value of the given analyze node.
+        Branches of a conditional return their value themselves instead of
+        jumping to a common return, and tail calls of the function to itself
+        replace the arguments and jump to the start.
+        """
+        operand = self.get_operand(function, node)
+
+        if operand is not None:
+            self.emit(function, RETURN, operand)
+
+        elif isinstance(node, FuncCallAnalyzeNode) and node.is_tail_call and\
+             self.functions[self.get_function_index(node.function)] is function:
+            # All new values are computed before any argument is replaced.
+            # Arguments which are available shared nodes only emit a move, so
+            # the registers they are moved through are reserved here.
+            function.register_count = max(function.register_count,
+                                          free + len(node.args))
+            moves = []
+            for i, arg in enumerate(node.args):
+                if isinstance(arg, FuncArgAnalyzeNode) and arg.index == i:
+                    continue
+                self.compile_expression(function, arg, free + i,
+                                        free + len(node.args))
+                moves.append((i, free + i))
+
+            for dst, src in moves:
+                self.emit(function, LOAD_ARG, dst, src)
+            self.emit(function, JUMP, 0)
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            condition = self.compile_operand(function, node.condition, free)
+            jump_to_false = self.emit(function, JUMP_IF_FALSE, condition, None)
+            available = self.available
+
+            self.available = set(available)
+            self.compile_return(function, node.on_true, free)
+
+            self.available = set(available)
+            function.code[jump_to_false + 2] = len(function.code)
+            self.compile_return(function, node.on_false, free)
+
+        else:
+            self.emit(function, RETURN,
+                      self.compile_operand(function, node, free))
+
+    def compile_operand(self, function, node, free):
+        """
+        Returns the register which holds the value of the given analyze node,
+        emitting the code which computes it into register free if needed.
+        """
+        operand = self.get_operand(function, node)
+        if operand is not None:
+            return operand
+
+        if node.shared:
+            dst = function.shared_registers[node]
+            self.compile_node(function, node, dst, free)
+            self.available.add(node)
+            return dst
+
+        self.compile_node(function, node, free, free + 1)
+        return free
+
+    def compile_expression(self, function, node, dst, free):
+        """
+        Emits the code which stores the value of the given analyze node in
+        register dst. Registers from free on are unused and can hold
+        temporary values.
+        """
+        if node.shared:
+            src = self.compile_operand(function, node, free)
+            self.emit(function, LOAD_ARG, dst, src)
+        else:
+            self.compile_node(function, node, dst, free)
+
+    def compile_node(self, function, node, dst, free):
+        """
+        Emits the code which computes the value of the given analyze node into
+        register dst, without looking whether it is already computed.
+        """
+        function.register_count = max(function.register_count, free)
+
+        if isinstance(node, FuncCallAnalyzeNode):
+            operands = [self.compile_operand(function, arg, free + i)
+                        for i, arg in enumerate(node.args)]
+
+            index = self.get_function_index(node.function)
+            opcode = CALL if index < len(self.func_defs) else CALL_EXTERNAL
+            self.emit(function, opcode, dst, index, len(operands), *operands)
+
+        elif isinstance(node, FuncArgAnalyzeNode):
+            self.emit(function, LOAD_ARG, dst, node.index)
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            self.emit(function, LOAD_CONST, dst, node.index)
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            condition = self.compile_operand(function, node.condition, free)
+            jump_to_false = self.emit(function, JUMP_IF_FALSE, condition, None)
+            available = self.available
+
+            # Only the shared nodes computed by both branches are available
+            # after the conditional.
+            self.available = set(available)
+            self.compile_expression(function, node.on_true, dst, free)
+            jump_to_end = self.emit(function, JUMP, None)
+            true_available = self.available
+
+            self.available = set(available)
+            function.code[jump_to_false + 2] = len(function.code)
+            self.compile_expression(function, node.on_false, dst, free)
+            function.code[jump_to_end + 1] = len(function.code)
+            self.available &= true_available
+
+        else:
+            raise RuntimeException("Cannot compile %s" % (type(node).__name__, ))
+
+    def emit(self, function, opcode, *operands):
+        """
+        Appends an instruction to the code of the function, and returns its
+        position.
+        """
+        pc = len(function.code)
+        function.code.append(opcode)
+        function.code.extend(operands)
+        return pc
+
+    def run(self, function, args):
+        """
+        Runs the given BytecodeFunction with the given argument values and
+        returns its result.
+        """
+        constants = self.constants
+        functions = self.functions
+
+        # Local names are faster to look up than the module constants.
+        load_arg, load_const, call, call_external, jump_if_false, jump =\
+            LOAD_ARG, LOAD_CONST, CALL, CALL_EXTERNAL, JUMP_IF_FALSE, JUMP
+
+        frames = []
+        code = function.code
+        regs = list(args) + function.template
+        pc = 0
+
+        while True:
+            opcode = code[pc]
+
+            if opcode == call_external:
+                count = code[pc + 3]
+                if count == 2:
+                    value = functions[code[pc + 2]](regs[code[pc + 4]],
+                                                    regs[code[pc + 5]])
+                elif count == 1:
+                    value = functions[code[pc + 2]](regs[code[pc + 4]])
+                else:
+                    value = functions[code[pc + 2]](
+                        *[regs[r] for r in code[pc + 4:pc + 4 + count]])
+                regs[code[pc + 1]] = value
+                pc += 4 + count
+
+            elif opcode == jump_if_false:
+                if regs[code[pc + 1]]:
+                    pc += 3
+                else:
+                    pc = code[pc + 2]
+
+            elif opcode == call:
+                callee = functions[code[pc + 2]]
+                count = code[pc + 3]
+                if count == 1:
+                    args = [regs[code[pc + 4]]]
+                else:
+                    args = [regs[r] for r in code[pc + 4:pc + 4 + count]]
+
+                cache = callee.cache
+                key = None
+                if cache is not None:
+                    key = get_cache_key(args)
+                    value = cache.get(key)
+                    if value is not MISSING:
+                        regs[code[pc + 1]] = value
+                        pc += 4 + count
+                        continue
+
+                frames.append((code, pc + 4 + count, regs, code[pc + 1],
+                               cache, key))
+                regs = args + callee.template
+                code = callee.code
+                pc = 0
+
+            elif opcode == load_arg:
+                regs[code[pc + 1]] = regs[code[pc + 2]]
+                pc += 3
+
+            elif opcode == load_const:
+                regs[code[pc + 1]] = constants[code[pc + 2]]
+                pc += 3
+
+            elif opcode == jump:
+                pc = code[pc + 1]
+
+            elif opcode == RETURN:
+                value = regs[code[pc + 1]]
+                if not frames:
+                    return value
+                code, pc, regs, dst, cache, key = frames.pop()
+                regs[dst] = value
+                if cache is not None:
+                    cache.put(key, value)
+
+            else:
+                raise RuntimeException("Invalid opcode %d" % (opcode, ))
@@ -0,0 +1,101 @@
+from upl.semantic_analyze_nodes import FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+
+
+def get_callees(node):
+    """
+    Returns the set of functions called by the given analyze node.
+    """
+    if isinstance(node, FuncCallAnalyzeNode):
+        callees = set([node.function])
+        for arg in node.args:
+            callees |= get_callees(arg)
+        return callees
+
+    elif isinstance(node, ConditionalAnalyzeNode):
+        return get_callees(node.condition) |\
+               get_callees(node.on_true) |\
+               get_callees(node.on_false)
+
+    else:
+        return set()
+
+
+def mark_tail_calls(body):
+    """
+    Marks the calls in tail positions of the given function body: the body
+    itself and the branches of conditionals in tail positions.
+    """
+    while isinstance(body, ConditionalAnalyzeNode):
+        mark_tail_calls(body.on_true)
+        body = body.on_false
+
+    if isinstance(body, FuncCallAnalyzeNode):
+        body.is_tail_call = True
+
+
+def get_self_tail_calls(func_def):
+    """
+    Returns the list of the calls in tail positions of the given function
+    body which call the function itself.
+    """
+    calls = []
+    pending = [func_def.body]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ConditionalAnalyzeNode):
+            pending.extend([node.on_true, node.on_false])
+        elif isinstance(node, FuncCallAnalyzeNode) and node.is_tail_call and\
+             node.function is func_def:
+            calls.append(node)
+    return calls
+
+
+def get_recursive_functions(func_defs):
+    """
+    Returns the set of functions which can call themselves, directly or
+    through other functions.
+    """
+    callees = dict((func_def, get_callees(func_def.body))
+                   for func_def in func_defs)
+
+    recursive = set()
+    for func_def in func_defs:
+        visited = set()
+        pending = list(callees[func_def])
+        while pending:
+            callee = pending.pop()
+            if callee is func_def:
+                recursive.add(func_def)
+                break
+            if callee not in visited and callee in callees:
+                visited.add(callee)
+                pending.extend(callees[callee])
+    return recursive
+
+
+def get_pure_functions(func_defs):
+    """
+    Returns the set of functions which are pure end to end: every external
+    function they can call, directly or through other functions, is marked
+    pure.
+    """
+    callees = dict((func_def, get_callees(func_def.body))
+                   for func_def in func_defs)
+
+    # Start from all functions and drop the ones which call an impure
+    # function until nothing changes, so recursive functions stay pure.
+    pure = set(func_defs)
+    changed = True
+    while changed:
+        changed = False
+        for func_def in list(pure):
+            for callee in callees[func_def]:
+                if callee in callees and callee in pure:
+                    continue
+                if callee not in callees and callee.pure:
+                    continue
+                pure.remove(func_def)
+                changed = True
+                break
+    return pure
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import tempfile
+from upl import lexer, parser, semantic_analyzer
+from upl.serialization import dump_analyzed, load_analyzed
+
+# Changes whenever the format of the cache entries changes, so old entries
+# are not read.
+CACHE_FORMAT_VERSION = 2
+
+
+def get_signature(func_def):
+    """
+    Returns the signature of the given function as a list of its name, the
+    names of its argument types and the name of its return type.
+    """
+    return [func_def.name,
+            [arg_type.name for arg_type in func_def.arg_types],
+            func_def.return_type.name]
+
+
+def get_cache_key(program, external_functions):
+    """
+    Returns the key of the cache entry for the given program compiled with
+    the given external functions.
+    """
+    data = json.dumps([CACHE_FORMAT_VERSION, program,
+                       [get_signature(f) for f in external_functions]])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def replace_file(source, destination):
+    """
+    Renames the source file to the destination, replacing the destination if
+    it exists. os.replace() is not available before Python 3.3, and
+    os.rename() does not replace files on Windows.
+    """
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+        return
+
+    if os.name == "nt" and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+def analyze_program(program, external_functions):
+    """
+    Runs the lexer, the parser and the semantic analyzer on the given
+    program, and returns the output of SemanticAnalyzer.analyze().
+    """
+    tokens = lexer.tokenize_program(program)
+    parse_tree = parser.Parser(tokens).parse()
+    return semantic_analyzer.SemanticAnalyzer(parse_tree,
+                                              external_functions).analyze()
+
+
+class CompileCache(object):
+    """
+    CompileCache stores the output of the semantic analysis of programs in
+    a directory, so compiling a program again with the same external
+    function signatures skips lexing, parsing and analysis.
+
+    Entries are files in the binary format of upl.serialization, named by
+    the SHA-256 hash of the program, the signatures of the external functions
+    and the cache format version.
+    Entries which can not be read are compiled again and replaced.
+
+    The hits and misses attributes count the compilations which were found
+    in the cache and the ones which were not.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def get_path(self, key):
+        """
+        Returns the path of the cache entry with the given key.
+        """
+        return os.path.join(self.directory, key + ".uplb")
+
+    def compile(self, program, external_functions):
+        """
+        Returns the output of SemanticAnalyzer.analyze() for the given
+        program, from the cache if possible.
+        """
+        path = self.get_path(get_cache_key(program, external_functions))
+
+        result = self.load(path, external_functions)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        consts, func_defs = analyze_program(program, external_functions)
+        self.store(path, dump_analyzed(consts, func_defs))
+        return consts, func_defs
+
+    def load(self, path, external_functions):
+        """
+        Returns the analyzed program stored at the given path, or None if
+        there is no valid entry.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            return load_analyzed(data, external_functions)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def store(self, path, data):
+        """
+        Writes the given entry data to the given path. The entry is written to
+        a temporary file first, so readers never see a partial entry.
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            replace_file(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
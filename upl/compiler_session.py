@@ -0,0 +1,425 @@
+"""
+Incremental compilation of successive versions of a program.
+
+A CompilerSession keeps the tokens, the parse trees of the top level
+statements and the analyzed declarations of the last program it compiled.
+Compiling an edited version then only redoes the work which the edit
+requires:
+
+  * Lexing: the lexer works line by line, so only the lines between the
+    unchanged first and last lines are tokenized again. The tokens of the
+    lines after them are moved to their new rows.
+  * Parsing: the tokens are split into top level statements with
+    Parser.iter_statement_tokens(). A statement whose tokens are the same as
+    in a statement of the last program, relative to its first row, reuses
+    that parse tree, moved to its new rows. The other statements are parsed.
+  * Analysis: a declaration is analyzed again if its parse tree changed, or
+    if a top level value or function it used resolves to something else
+    now, e.g. because the signature of a function it calls changed. The
+    other declarations keep their analyzed nodes.
+
+The result of every compile is the same as the result of compiling the
+program from scratch with the lexer, the parser and the SemanticAnalyzer.
+"""
+from upl import lexer, parser
+from upl.token import Token
+from upl.parse_nodes import ProgramNode, DeclNode, FuncDefNode,\
+                            ConditionalNode, FuncCallNode, BinaryOperationNode,\
+                            UnaryOperationNode
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, ConstantAnalyzeNode,\
+                                       FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.semantic_analyzer import SemanticAnalyzer
+from upl.call_graph import mark_tail_calls
+
+
+def get_statement_key(tokens, first_row):
+    """
+    Returns the key which identifies a statement with the given tokens at any
+    row. Statements with the same key have the same parse tree, apart from
+    the rows of its locations.
+    """
+    return tuple((token.uncooked, token.location[0] - first_row,
+                  token.location[1]) for token in tokens)
+
+
+def move_tokens(tokens, rows):
+    """
+    Returns copies of the given tokens, moved down by the given number of
+    rows.
+    """
+    return [Token(token.type, token.value, token.uncooked,
+                  (token.location[0] + rows, token.location[1]))
+            for token in tokens]
+
+
+def get_parse_children(node):
+    """
+    Returns the child nodes of the given parse node.
+    """
+    if isinstance(node, DeclNode):
+        return [node.expression]
+    elif isinstance(node, ConditionalNode):
+        return [node.condition, node.on_true, node.on_false]
+    elif isinstance(node, FuncDefNode):
+        return node.arg_list + node.statements
+    elif isinstance(node, FuncCallNode):
+        return node.args
+    elif isinstance(node, BinaryOperationNode):
+        return [node.left_operand, node.right_operand]
+    elif isinstance(node, UnaryOperationNode):
+        return [node.operand]
+    else:
+        return []
+
+
+def move_parse_tree(node, rows):
+    """
+    Moves the locations of the given parse tree down by the given number of
+    rows, in place.
+    """
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if node.location is not None:
+            node.location = (node.location[0] + rows, node.location[1])
+        pending.extend(get_parse_children(node))
+
+
+def clear_tail_calls(body):
+    """
+    Clears the marks which mark_tail_calls() sets on the given node.
+    """
+    while isinstance(body, ConditionalAnalyzeNode):
+        clear_tail_calls(body.on_true)
+        body = body.on_false
+
+    if isinstance(body, FuncCallAnalyzeNode):
+        body.is_tail_call = False
+
+
+class DeclarationRecord(object):
+    """
+    DeclarationRecord is what a SessionAnalyzer keeps of a top level
+    declaration it analyzed:
+
+      * value: The analyzed value, or the body of a function,
+      * constants: The (type, value) pairs of the literals it analyzed, in
+        order,
+      * identifiers: The (name, analyze node) pairs of the top level values
+        it looked up,
+      * functions: The (name, argument types, function definition) triples
+        of the functions it resolved.
+    """
+
+    def __init__(self):
+        self.value = None
+        self.constants = []
+        self.identifiers = []
+        self.functions = []
+
+
+class SessionAnalyzer(SemanticAnalyzer):
+    """
+    SessionAnalyzer is the SemanticAnalyzer of a CompilerSession. It reuses
+    the function definitions and the declaration records of the last
+    compile, and analyzes only the declarations whose records are no longer
+    valid.
+
+    Function bodies are stored in their definitions and reused nodes are
+    updated only after the whole program is analyzed, so a program with
+    errors leaves the last result unchanged.
+    """
+
+    def __init__(self, parse_tree, external_functions, functions, records):
+        """
+        Constructor for SessionAnalyzer. functions maps the signatures of
+        the functions of the last compile to their definitions, and records
+        maps its declaration nodes to their DeclarationRecords.
+        """
+        super(SessionAnalyzer, self).__init__(parse_tree, external_functions)
+        self.previous_functions = functions
+        self.previous_records = records
+        self.records = {}
+        self.record = None
+        self.reused_values = []
+        self.bodies = []
+        self.analyzed_declarations = 0
+
+    def make_func_def(self, name, arg_types, return_type):
+        signature = (name, tuple(arg_types), return_type)
+        func_def = self.previous_functions.get(signature)
+        if func_def is None:
+            func_def = FuncDefAnalyzeNode(name, arg_types, return_type)
+        return func_def
+
+    def analyze_program(self, node, symtab):
+        super(SessionAnalyzer, self).analyze_program(node, symtab)
+
+        # Reused nodes refer to the constant table of the last compile, and
+        # may carry tail call marks of bodies which no longer use them.
+        visited = set()
+        for value in self.reused_values:
+            self.update_constants(value, visited)
+            clear_tail_calls(value)
+
+        for func_def, body in self.bodies:
+            mark_tail_calls(body)
+            func_def.body = body
+
+    def analyze_function_decl(self, node, symtab):
+        func_def = self.get_declared_function(node)
+
+        local_names = [arg.name for arg in node.expression.arg_list] +\
+                      [s.identifier for s in node.expression.statements[:-1]
+                       if isinstance(s, DeclNode)]
+        record = self.get_valid_record(node, symtab, local_names)
+        if record is None:
+            record = self.start_record()
+            try:
+                record.value = self.analyze_function_body(node.expression,
+                                                          symtab.push())
+            finally:
+                self.record = None
+
+        self.records[node] = record
+        self.bodies.append((func_def, record.value))
+
+    def analyze_global_value(self, node, symtab):
+        record = self.get_valid_record(node, symtab, [])
+        if record is None:
+            record = self.start_record()
+            try:
+                record.value = super(SessionAnalyzer,
+                                     self).analyze_global_value(node, symtab)
+            finally:
+                self.record = None
+
+        self.records[node] = record
+        return record.value
+
+    def start_record(self):
+        """
+        Returns a new DeclarationRecord, which records the declaration
+        analyzed next.
+        """
+        self.analyzed_declarations += 1
+        self.record = DeclarationRecord()
+        return self.record
+
+    def get_valid_record(self, node, symtab, local_names):
+        """
+        Returns the record of the given declaration from the last compile if
+        analyzing it again would give the same result, and None otherwise.
+        symtab is the top level symbol table, and local_names are the names
+        which the declaration adds to its own scope.
+
+        The constants of a valid record are added to the constant table, in
+        the order in which analyzing the declaration would add them.
+        """
+        record = self.previous_records.get(node)
+        if record is None:
+            return None
+
+        for name in local_names:
+            if name in symtab:
+                return None
+
+        for name, value in record.identifiers:
+            if name not in symtab or symtab[name][0] is not value:
+                return None
+
+        for name, arg_types, func_def in record.functions:
+            if self.overloads.get(name, {}).get(arg_types) is not func_def:
+                return None
+
+        for value_type, value in record.constants:
+            self.constant_pool.add(value_type, value)
+
+        self.reused_values.append(record.value)
+        return record
+
+    def update_constants(self, node, visited):
+        """
+        Points the constants of the given reused node to the current
+        constant table.
+        """
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+
+            if isinstance(node, FuncCallAnalyzeNode):
+                pending.extend(node.args)
+            elif isinstance(node, ConditionalAnalyzeNode):
+                pending.extend([node.condition, node.on_true, node.on_false])
+            elif isinstance(node, ConstantAnalyzeNode) and\
+                 node.const_table is not self.consts:
+                node.index = self.constant_pool.index(
+                    *node.const_table[node.index])
+                node.const_table = self.consts
+
+    def analyze_literal(self, type, value):
+        if self.record is not None:
+            self.record.constants.append((type, value))
+        return super(SessionAnalyzer, self).analyze_literal(type, value)
+
+    def analyze_identifier(self, name, symtab):
+        result = super(SessionAnalyzer, self).analyze_identifier(name, symtab)
+        # Names which are not in the innermost scope of a function body are
+        # top level values.
+        if self.record is not None and\
+           (symtab.parent is None or name not in symtab.symbols):
+            self.record.identifiers.append((name, result))
+        return result
+
+    def resolve_function(self, name, arg_types):
+        result = super(SessionAnalyzer, self).resolve_function(name,
+                                                               arg_types)
+        if self.record is not None:
+            self.record.functions.append((name, tuple(arg_types), result))
+        return result
+
+
+class CompilerSession(object):
+    """
+    CompilerSession compiles successive versions of a program, such as the
+    versions of a file being edited, and reuses the work done for the last
+    version which compiled without errors. See the module documentation.
+
+    compile() updates the function definitions of the last result in place,
+    and reuses the nodes of their bodies, so only the latest result should
+    be used.
+
+    The lexed_lines, parsed_statements and analyzed_declarations attributes
+    count the work done by the last call to compile().
+    """
+
+    def __init__(self, external_functions=None):
+        """
+        Constructor for CompilerSession. external_functions is the same as
+        for SemanticAnalyzer, and is used for every version of the program.
+        """
+        self.external_functions = external_functions or []
+        self.line_tokenizer = lexer.get_line_tokenizer(lexer.DEFAULT_ENGINE)
+        self.parser = parser.Parser([])
+        self.reset()
+
+    def reset(self):
+        """
+        Drops everything kept from the last compile, so the next one compiles
+        the whole program.
+        """
+        self.lines = []
+        self.line_tokens = []
+
+        # Maps statement keys to lists of (parse node, first row) pairs.
+        self.statements = {}
+
+        # Maps (name, argument types, return type) signatures to function
+        # definitions, and declaration nodes to their DeclarationRecords.
+        self.functions = {}
+        self.records = {}
+
+        self.lexed_lines = 0
+        self.parsed_statements = 0
+        self.analyzed_declarations = 0
+
+    def compile(self, program):
+        """
+        Returns the output of SemanticAnalyzer.analyze() for the given
+        program. Raises the same exceptions as the lexer, the parser and the
+        semantic analyzer.
+
+        A program which does not lex or parse leaves the session unchanged.
+        The tokens and parse trees of a program with semantic errors are
+        kept, so the compile which fixes the errors does not redo them, but
+        the analyzed declarations stay those of the last result.
+        """
+        lines = program.split("\n")
+        line_tokens = self.lex(lines)
+        tokens = [token for tokens in line_tokens for token in tokens]
+        statements = self.parse(tokens)
+
+        self.lines = lines
+        self.line_tokens = line_tokens
+        self.statements = {}
+        for key, node, first_row in statements:
+            self.statements.setdefault(key, []).append((node, first_row))
+
+        program_node = self.parser.make_node(ProgramNode, (1, 1),
+                                             [node for _, node, _ in
+                                              statements])
+        analyzer = SessionAnalyzer(program_node, self.external_functions,
+                                   self.functions, self.records)
+        self.analyzed_declarations = 0
+        consts, func_defs = analyzer.analyze()
+        self.analyzed_declarations = analyzer.analyzed_declarations
+
+        self.functions = dict(((f.name, tuple(f.arg_types), f.return_type), f)
+                              for f in func_defs)
+        self.records = analyzer.records
+
+        return consts, func_defs
+
+    def lex(self, lines):
+        """
+        Returns the tokens of each of the given lines, reusing the tokens of
+        the unchanged lines at the start and at the end of the last program.
+        """
+        last = self.lines
+        limit = min(len(last), len(lines))
+
+        prefix = 0
+        while prefix < limit and last[prefix] == lines[prefix]:
+            prefix += 1
+
+        suffix = 0
+        while suffix < limit - prefix and\
+              last[len(last) - suffix - 1] == lines[len(lines) - suffix - 1]:
+            suffix += 1
+
+        line_tokens = self.line_tokens[:prefix]
+        for row in range(prefix, len(lines) - suffix):
+            line_tokens.append(self.line_tokenizer(lines[row], row + 1, 1))
+
+        rows = len(lines) - len(last)
+        for tokens in self.line_tokens[len(last) - suffix:]:
+            line_tokens.append(move_tokens(tokens, rows) if rows else tokens)
+
+        self.lexed_lines = len(lines) - prefix - suffix
+        return line_tokens
+
+    def parse(self, tokens):
+        """
+        Returns a (key, parse node, first row) triple for each of the top
+        level statements in the given tokens. Statements of the last program
+        which did not change are reused, and moved to their new rows.
+        """
+        available = dict((key, list(entries))
+                         for key, entries in self.statements.items())
+
+        statements = []
+        moves = []
+        self.parsed_statements = 0
+        for statement_tokens in self.parser.iter_statement_tokens(tokens):
+            first_row = statement_tokens[0].location[0]
+            key = get_statement_key(statement_tokens, first_row)
+            if available.get(key):
+                node, last_row = available[key].pop(0)
+                if last_row != first_row:
+                    moves.append((node, first_row - last_row))
+            else:
+                node = self.parser.parse_statement(
+                    self.parser.make_token_range(statement_tokens))
+                self.parsed_statements += 1
+
+            statements.append((key, node, first_row))
+
+        # Reused statements are only moved once the whole program parsed.
+        for node, rows in moves:
+            move_parse_tree(node, rows)
+
+        return statements
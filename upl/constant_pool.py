@@ -0,0 +1,52 @@
+def get_constant_key(value_type, value):
+    """
+    Returns the key which identifies the given constant in a ConstantPool.
+    Values are compared by their repr, so 1, 1.0 and True are different
+    constants, as are 0.0 and -0.0.
+    """
+    return (value_type, repr(value))
+
+
+class ConstantPool(object):
+    """
+    ConstantPool builds the constant table of a program, the list of
+    (type, value) pairs which ConstantAnalyzeNode refers to by index. Each
+    constant is stored once, in the order in which it was first added, and a
+    dict finds the index of a constant without searching the list.
+    """
+
+    def __init__(self, constants=None):
+        """
+        Constructor for ConstantPool. If constants is given, the pool adds to
+        that list in place, and its constants keep their indices.
+        """
+        self.constants = [] if constants is None else constants
+        self.indices = {}
+        for index, (value_type, value) in enumerate(self.constants):
+            self.indices.setdefault(get_constant_key(value_type, value), index)
+
+    def __len__(self):
+        return len(self.constants)
+
+    def add(self, value_type, value):
+        """
+        Returns the index of the given constant, adding it to the table if it
+        is not in it yet.
+        """
+        key = get_constant_key(value_type, value)
+        index = self.indices.get(key)
+        if index is None:
+            index = self.indices[key] = len(self.constants)
+            self.constants.append((value_type, value))
+        return index
+
+    def index(self, value_type, value):
+        """
+        Returns the index of the given constant. Raises ValueError if it is not
+        in the table.
+        """
+        index = self.indices.get(get_constant_key(value_type, value))
+        if index is None:
+            raise ValueError("%s %r is not in the constant pool"
+                             % (value_type, value))
+        return index
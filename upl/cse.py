@@ -0,0 +1,142 @@
+from upl.semantic_analyze_nodes import FuncArgAnalyzeNode, ConstantAnalyzeNode,\
+                                       FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.call_graph import get_pure_functions, mark_tail_calls
+
+
+def get_children(node):
+    """
+    Returns the list of the child nodes of the given analyze node.
+    """
+    if isinstance(node, FuncCallAnalyzeNode):
+        return node.args
+    elif isinstance(node, ConditionalAnalyzeNode):
+        return [node.condition, node.on_true, node.on_false]
+    return []
+
+
+class ExpressionInterner(object):
+    """
+    ExpressionInterner eliminates common subexpressions by hash-consing: all
+    structurally identical analyze nodes of the program are replaced by a
+    single node, which turns the function bodies into DAGs.
+
+    Calls are only shared if the called function is pure, since calls to
+    other functions must run each time they appear. Nodes which contain
+    such calls are not shared either, even if the analyzer built them once
+    for a local declaration.
+
+    Call and conditional nodes which are used more than once in a function
+    body are marked as shared, and the executors compute their value only
+    once per call of the function.
+    """
+
+    def __init__(self, consts, func_defs):
+        """
+        Constructor for ExpressionInterner. Arguments are the outputs of
+        SemanticAnalyzer.analyze().
+        """
+        self.consts = consts
+        self.func_defs = func_defs
+
+    def intern(self):
+        """
+        Replaces the bodies of the functions by their interned version.
+
+        On success returns the constant table and the function definitions.
+        """
+        self.pure_functions = get_pure_functions(self.func_defs)
+
+        # Maps keys of the node structure to the interned nodes, and nodes to
+        # their interned version.
+        self.nodes = {}
+        self.interned = {}
+
+        # Interned nodes which can be evaluated once for all their uses.
+        self.sharable = set()
+
+        for func_def in self.func_defs:
+            func_def.body = self.intern_node(func_def.body)
+            mark_tail_calls(func_def.body)
+
+        for func_def in self.func_defs:
+            self.mark_shared_nodes(func_def.body)
+
+        return self.consts, self.func_defs
+
+    def is_pure(self, func_def):
+        """
+        Returns True if calls to the given function can be shared.
+        """
+        if func_def.body is None:
+            return func_def.pure
+        return func_def in self.pure_functions
+
+    def intern_node(self, node):
+        """
+        Returns the interned version of the given analyze node.
+        """
+        if node in self.interned:
+            return self.interned[node]
+
+        if isinstance(node, FuncCallAnalyzeNode):
+            args = [self.intern_node(arg) for arg in node.args]
+            if self.is_pure(node.function) and self.sharable.issuperset(args):
+                key = ("call", node.function) + tuple(args)
+            else:
+                key = None
+            make_node = lambda: FuncCallAnalyzeNode(node.function, args)
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            children = [self.intern_node(child)
+                        for child in get_children(node)]
+            if self.sharable.issuperset(children):
+                key = ("conditional", ) + tuple(children)
+            else:
+                key = None
+            make_node = lambda: ConditionalAnalyzeNode(*children)
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            value_type, value = node.const_table[node.index]
+            key = ("constant", value_type, type(value), repr(value))
+            make_node = lambda: node
+
+        elif isinstance(node, FuncArgAnalyzeNode):
+            key = ("arg", node.index, node.type)
+            make_node = lambda: node
+
+        else:
+            key = None
+            make_node = lambda: node
+
+        if key is None:
+            interned = make_node()
+        elif key in self.nodes:
+            interned = self.nodes[key]
+        else:
+            interned = self.nodes[key] = make_node()
+            self.sharable.add(interned)
+
+        self.interned[node] = interned
+        return interned
+
+    def mark_shared_nodes(self, body):
+        """
+        Marks the call and conditional nodes which have more than one parent
+        in the given function body, or which a parent uses several times.
+        """
+        uses = {}
+        visited = set([body])
+        pending = [body]
+        while pending:
+            node = pending.pop()
+            for child in get_children(node):
+                uses[child] = uses.get(child, 0) + 1
+                if child not in visited:
+                    visited.add(child)
+                    pending.append(child)
+
+        for node, count in uses.items():
+            if count > 1 and node in self.sharable and\
+               isinstance(node, (FuncCallAnalyzeNode, ConditionalAnalyzeNode)):
+                node.shared = True
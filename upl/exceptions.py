@@ -14,3 +14,6 @@ class ParserException(UPLException):
 
 class SemanticAnalyzerException(UPLException):
     """Exceptions that happen while semantic analysis"""
+
+class RuntimeException(UPLException):
+    """Exceptions that happen while running a program"""
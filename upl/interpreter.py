@@ -0,0 +1,173 @@
+from upl.semantic_analyze_nodes import FuncArgAnalyzeNode, ConstantAnalyzeNode,\
+                                       FuncCallAnalyzeNode, ConditionalAnalyzeNode
+from upl.exceptions import RuntimeException
+from upl.call_graph import get_pure_functions, get_self_tail_calls
+from upl.memoization import LRUCache, DEFAULT_CACHE_SIZE, MISSING,\
+                            get_cache_key
+
+
+def missing_implementation(func_def):
+    """
+    Returns a function which fails when it is called in place of an external
+    function without an implementation.
+    """
+    def missing(*args):
+        raise RuntimeException("External function %s has no implementation"
+                               % (func_def.name, ))
+    return missing
+
+
+class Interpreter(object):
+    """
+    Interpreter runs the output of the semantic analysis by walking the
+    analyze trees of the functions. Values are plain Python values: bool for
+    bool, int for int and float for real.
+
+    External functions run their implementation callable, which is given to
+    the FuncDefAnalyzeNode the semantic analyzer received.
+
+    Functions which only call pure external functions can be memoized: their
+    results are cached by their arguments in an LRUCache per function.
+    """
+
+    def __init__(self, consts, func_defs, memoize=False,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Constructor for Interpreter. Arguments are the outputs of
+        SemanticAnalyzer.analyze():
+
+          * consts: Array of (type, value) constants,
+          * func_defs: Array of FuncDefAnalyzeNode.
+
+        If memoize is True, pure functions cache up to cache_size results.
+        """
+        self.consts = consts
+        self.func_defs = func_defs
+
+        # Functions whose tail calls to themselves run as loops.
+        self.looping_functions = set(f for f in func_defs
+                                     if get_self_tail_calls(f))
+
+        # Maps memoized functions to their LRUCache.
+        self.caches = {}
+        if memoize:
+            for func_def in get_pure_functions(func_defs):
+                self.caches[func_def] = LRUCache(cache_size)
+
+    def get_function(self, name, arg_types=None):
+        """
+        Returns the function with the given name, and the given argument
+        types if they are not None. Raises a RuntimeException if there is no
+        such function, or if there are several.
+        """
+        matches = [f for f in self.func_defs
+                   if f.name == name and
+                      (arg_types is None or f.arg_types == arg_types)]
+
+        if len(matches) == 0:
+            raise RuntimeException("Could not find function %s" % (name, ))
+        elif len(matches) > 1:
+            raise RuntimeException("Function %s is ambiguous" % (name, ))
+
+        return matches[0]
+
+    def call(self, func_def, args):
+        """
+        Calls the given function with the given list of argument values, and
+        returns its result.
+        """
+        if len(args) != len(func_def.arg_types):
+            raise RuntimeException("%s expects %d arguments, but received %d"
+                                   % (func_def.name, len(func_def.arg_types),
+                                      len(args)))
+
+        return self.call_function(func_def, list(args))
+
+    def call_function(self, func_def, args):
+        """
+        Runs the given function without checking its arguments.
+        """
+        if func_def.body is not None:
+            cache = self.caches.get(func_def)
+            if cache is None:
+                return self.evaluate_body(func_def, args)
+
+            key = get_cache_key(args)
+            value = cache.get(key)
+            if value is MISSING:
+                value = self.evaluate_body(func_def, args)
+                cache.put(key, value)
+            return value
+
+        if func_def.implementation is None:
+            raise RuntimeException("External function %s has no implementation"
+                                   % (func_def.name, ))
+
+        return func_def.implementation(*args)
+
+    def evaluate_body(self, func_def, args):
+        """
+        Evaluates the body of the given function. Tail calls of the function
+        to itself replace the arguments and start over, instead of nesting
+        another call.
+        """
+        if func_def not in self.looping_functions:
+            return self.evaluate(func_def.body, args, {})
+
+        node = func_def.body
+        memo = {}
+        while True:
+            if node.shared and node in memo:
+                return memo[node]
+
+            if isinstance(node, ConditionalAnalyzeNode):
+                if self.evaluate(node.condition, args, memo):
+                    node = node.on_true
+                else:
+                    node = node.on_false
+
+            elif isinstance(node, FuncCallAnalyzeNode) and node.is_tail_call\
+                 and node.function is func_def:
+                args = [self.evaluate(arg, args, memo) for arg in node.args]
+                node = func_def.body
+                memo = {}
+
+            else:
+                return self.evaluate(node, args, memo)
+
+    def evaluate(self, node, args, memo):
+        """
+        Evaluates the given analyze node, where args are the argument values
+        of the function which contains it. memo maps the shared nodes which
+        are already evaluated during this call to their values.
+        """
+        if isinstance(node, FuncCallAnalyzeNode):
+            if node.shared and node in memo:
+                return memo[node]
+
+            values = [self.evaluate(arg, args, memo) for arg in node.args]
+            value = self.call_function(node.function, values)
+            if node.shared:
+                memo[node] = value
+            return value
+
+        elif isinstance(node, FuncArgAnalyzeNode):
+            return args[node.index]
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            return node.const_table[node.index][1]
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            if node.shared and node in memo:
+                return memo[node]
+
+            if self.evaluate(node.condition, args, memo):
+                value = self.evaluate(node.on_true, args, memo)
+            else:
+                value = self.evaluate(node.on_false, args, memo)
+            if node.shared:
+                memo[node] = value
+            return value
+
+        else:
+            raise RuntimeException("Cannot evaluate %s" % (type(node).__name__, ))
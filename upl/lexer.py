@@ -30,18 +30,149 @@ token_lex_info_list = (
     (TokenType.Identifier, r"[A-Za-z][A-Za-z0-9_]*", lambda v: v),
 )
 
+value_funcs = dict((token_type, value_func)
+                   for token_type, _, value_func in token_lex_info_list)
 
-def tokenize_program(program):
+# The regex engine matches a whole token class with a single alternative, and
+# then refines words and operator runs using the tables below. This gives the
+# same result as trying every regex in token_lex_info_list and taking the
+# longest match: a keyword or bool literal only wins over an identifier, and
+# "=" or "->" only win over an operator, when both match the same text.
+master_regex = re.compile(r"""
+    (?P<Space>\s+) |
+    (?P<Comment>\#.*) |
+    (?P<Word>[A-Za-z][A-Za-z0-9_]*) |
+    (?P<RealLiteral>\d+\.\d+(e[-+]?\d+)?) |
+    (?P<IntLiteral>\d+) |
+    (?P<StringLiteral>\"(\\.|[^\\"])*\") |
+    (?P<Operator>[~\!@$%^&*\-+/=<>|]+) |
+    (?P<OpenBracket>{) |
+    (?P<CloseBracket>}) |
+    (?P<OpenParen>\() |
+    (?P<CloseParen>\)) |
+    (?P<StatementSep>;) |
+    (?P<ArgumentSep>,) |
+    (?P<TypeSep>:)
+""", re.VERBOSE)
+
+keyword_token_types = {
+    "true": TokenType.BoolLiteral,
+    "false": TokenType.BoolLiteral,
+    "def": TokenType.KeywordDef,
+    "bool": TokenType.KeywordBool,
+    "int": TokenType.KeywordInt,
+    "real": TokenType.KeywordReal,
+    "if": TokenType.KeywordIf,
+    "then": TokenType.KeywordThen,
+    "else": TokenType.KeywordElse,
+}
+
+operator_token_types = {
+    "=": TokenType.Assignment,
+    "->": TokenType.ReturnsSep,
+}
+
+DEFAULT_ENGINE = "regex"
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def tokenize_program(program, engine=DEFAULT_ENGINE):
     """
     tokenize splits the give program into tokens and returns the result as
     a list.
+
+    engine selects the line tokenizer: "regex" (the default) uses the
+    precompiled master regex, and "recursive" uses the original
+    tokenize_line. Both produce the same tokens.
     """
+    line_tokenizer = get_line_tokenizer(engine)
     result = []
     row = 0
 
     for line in program.split("\n"):
         row += 1
-        result += tokenize_line(line, row, 1)
+        result += line_tokenizer(line, row, 1)
+
+    return result
+
+
+def iter_tokens(file_like, chunk_size=DEFAULT_CHUNK_SIZE, engine=DEFAULT_ENGINE):
+    """
+    iter_tokens is a generator version of tokenize_program which reads the
+    program from file_like in chunks of chunk_size characters. A line is
+    tokenized once it has been read completely, so memory use depends on the
+    longest line rather than on the size of the program.
+    """
+    line_tokenizer = get_line_tokenizer(engine)
+    row = 0
+    pending = ""
+
+    while True:
+        chunk = file_like.read(chunk_size)
+        if not chunk:
+            break
+
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            row += 1
+            for token in line_tokenizer(line, row, 1):
+                yield token
+
+    for token in line_tokenizer(pending, row + 1, 1):
+        yield token
+
+
+def get_line_tokenizer(engine):
+    """
+    Returns the line tokenizer for the given engine name: "regex" uses the
+    precompiled master regex, and "recursive" uses the original tokenize_line.
+    """
+    if engine == "regex":
+        return tokenize_line_regex
+    elif engine == "recursive":
+        return tokenize_line
+    else:
+        raise ValueError("Unknown lexer engine %s" % (engine, ))
+
+
+def tokenize_line_regex(line, row, col):
+    """
+    tokenize_line_regex splits the given line into tokens and returns the
+    result as a list. It walks the line once using master_regex, so it runs
+    in linear time and does not recurse.
+    """
+    result = []
+    pos = 0
+    end = len(line)
+    match_at = master_regex.match
+
+    while pos < end:
+        match = match_at(line, pos)
+        if match is None:
+            raise LexerException("Invalid token", (row, col + pos))
+
+        kind = match.lastgroup
+        if kind == "Comment":
+            break
+
+        if kind != "Space":
+            uncooked = match.group()
+            if kind == "Word":
+                token_type = keyword_token_types.get(uncooked,
+                                                     TokenType.Identifier)
+            elif kind == "Operator":
+                token_type = operator_token_types.get(uncooked,
+                                                      TokenType.Operator)
+            else:
+                token_type = TokenType[kind]
+
+            result.append(Token(type = token_type,
+                                value = value_funcs[token_type](uncooked),
+                                uncooked = uncooked,
+                                location = (row, col + pos)))
+
+        pos = match.end()
 
     return result
 
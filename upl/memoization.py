@@ -0,0 +1,95 @@
+from collections import OrderedDict
+
+DEFAULT_CACHE_SIZE = 1024
+
+# Returned by LRUCache.get() when the key is not cached.
+MISSING = object()
+
+
+class LRUCache(object):
+    """
+    LRUCache maps keys to values, keeping at most maxsize entries. When it is
+    full, adding an entry evicts the least recently used one. A maxsize of
+    None means the cache is unbounded.
+
+    The hits, misses and evictions attributes count the lookups which found
+    their key, the lookups which did not, and the evicted entries.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Cache size must not be negative")
+
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=MISSING):
+        """
+        Returns the value cached for the key and marks it as recently used,
+        or returns default if the key is not cached.
+        """
+        # Reinserting moves the key to the end; OrderedDict.move_to_end() is
+        # not available on Python 2.
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Caches the value for the key, evicting the least recently used entry
+        if the cache is full.
+        """
+        if self.maxsize == 0:
+            return
+
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries and resets the statistics.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def get_cache_key(args):
+    """
+    Returns the key of the given arguments in a cache of function results.
+    Real arguments are keyed by their repr, like constants in a ConstantPool,
+    so 0.0 and -0.0 are different keys.
+    """
+    return tuple((float, repr(arg)) if type(arg) is float else arg
+                 for arg in args)
+
+
+def memoize(function, cache):
+    """
+    Returns a function which calls the given function, caching its results
+    in the given LRUCache by the key of its arguments.
+    """
+    def memoized(*args):
+        key = get_cache_key(args)
+        value = cache.get(key)
+        if value is MISSING:
+            value = function(*args)
+            cache.put(key, value)
+        return value
+    return memoized
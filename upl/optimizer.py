@@ -0,0 +1,239 @@
+import operator
+from upl.semantic_analyze_nodes import BasicType, FuncArgAnalyzeNode,\
+                                       ConstantAnalyzeNode, FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.call_graph import mark_tail_calls
+from upl.constant_pool import ConstantPool
+
+# Python types of the constant values of each type. bool is a subclass of
+# int, so values are checked with type() instead of isinstance().
+python_types = {
+    BasicType.Bool: bool,
+    BasicType.Int: int,
+    BasicType.Real: float,
+}
+
+
+def get_node_count(node):
+    """
+    Returns the number of analyze nodes in the given tree.
+    """
+    if isinstance(node, FuncCallAnalyzeNode):
+        return 1 + sum(get_node_count(arg) for arg in node.args)
+
+    elif isinstance(node, ConditionalAnalyzeNode):
+        return 1 + get_node_count(node.condition) +\
+               get_node_count(node.on_true) + get_node_count(node.on_false)
+
+    else:
+        return 1
+
+
+def get_value_type(node):
+    """
+    Returns the value type of the given analyze node.
+    """
+    while isinstance(node, ConditionalAnalyzeNode):
+        node = node.on_true
+
+    if isinstance(node, FuncArgAnalyzeNode):
+        return node.type
+    elif isinstance(node, ConstantAnalyzeNode):
+        return node.const_table[node.index][0]
+    else:
+        return node.function.return_type
+
+
+class Optimizer(object):
+    """
+    Optimizer simplifies the bodies of analyzed functions:
+
+      * Calls to foldable external functions with constant arguments are
+        replaced by their result, which is added to the constant table,
+      * Conditionals with a constant condition are replaced by the branch
+        which is taken,
+      * Calls which do not change their argument, like x + 0, x * 1 or
+        -(-x), are replaced by the argument.
+
+    Identities only apply to foldable external functions implemented by the
+    operator module functions. They are not applied where they would change
+    the result for reals, e.g. x + 0.0 is kept because x might be -0.0, or
+    where the argument does not have the return type of the call, e.g. for a
+    * function of an int and a real.
+    """
+
+    def __init__(self, consts, func_defs):
+        """
+        Constructor for Optimizer. Arguments are the outputs of
+        SemanticAnalyzer.analyze().
+        """
+        self.consts = consts
+        self.func_defs = func_defs
+
+    def optimize(self):
+        """
+        Optimizes the bodies of the functions in place.
+
+        On success returns the constant table, which may contain new
+        constants, and the function definitions.
+        """
+        # Maps analyze nodes to their optimized version, so nodes which are
+        # shared by several trees stay shared.
+        self.optimized = {}
+        self.constant_pool = ConstantPool(self.consts)
+
+        for func_def in self.func_defs:
+            func_def.body = self.optimize_expression(func_def.body)
+            mark_tail_calls(func_def.body)
+        return self.consts, self.func_defs
+
+    def optimize_expression(self, node):
+        """
+        Returns the optimized version of the given analyze node. Nodes are
+        not modified, as they can be shared between several trees.
+        """
+        if node not in self.optimized:
+            self.optimized[node] = self.optimize_node(node)
+        return self.optimized[node]
+
+    def optimize_node(self, node):
+        """
+        Returns the optimized version of the given analyze node, whose
+        children have not been optimized yet.
+        """
+        if isinstance(node, FuncCallAnalyzeNode):
+            args = [self.optimize_expression(arg) for arg in node.args]
+            return self.optimize_call(node, args)
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            condition = self.optimize_expression(node.condition)
+            on_true = self.optimize_expression(node.on_true)
+            on_false = self.optimize_expression(node.on_false)
+
+            if isinstance(condition, ConstantAnalyzeNode):
+                return on_true if self.get_value(condition) else on_false
+
+            # if c then true else false is c.
+            if isinstance(on_true, ConstantAnalyzeNode) and\
+               isinstance(on_false, ConstantAnalyzeNode) and\
+               self.get_value(on_true) is True and\
+               self.get_value(on_false) is False:
+                return condition
+
+            return ConditionalAnalyzeNode(condition, on_true, on_false)
+
+        else:
+            return node
+
+    def optimize_call(self, node, args):
+        """
+        Returns the optimized version of the given call, whose arguments are
+        already optimized.
+        """
+        function = node.function
+        if function.body is not None or not function.foldable:
+            return FuncCallAnalyzeNode(function, args)
+
+        if all(isinstance(arg, ConstantAnalyzeNode) for arg in args):
+            folded = self.fold_call(function, args)
+            if folded is not None:
+                return folded
+
+        simplified = self.simplify_call(function, args)
+        if simplified is not None:
+            return simplified
+
+        return FuncCallAnalyzeNode(function, args)
+
+    def fold_call(self, function, args):
+        """
+        Returns the constant result of calling the given function with the
+        given constant arguments, or None if it can not be computed at
+        compile time.
+        """
+        if function.implementation is None:
+            return None
+
+        try:
+            value = function.implementation(*[self.get_value(arg)
+                                              for arg in args])
+        except Exception:
+            # Any error means the call is left to run time, where it only
+            # happens if the call runs at all.
+            return None
+
+        if type(value) is not python_types[function.return_type]:
+            return None
+
+        return self.make_constant(function.return_type, value)
+
+    def simplify_call(self, function, args):
+        """
+        Returns the argument of the given call if the call does not change
+        it, or None.
+        """
+        implementation = function.implementation
+
+        if len(args) == 2:
+            left, right = args
+            # -0.0 + 0 is 0.0, so zeros are only dropped from ints.
+            is_int = function.return_type == BasicType.Int
+            if implementation in (operator.add, operator.sub) and is_int and\
+               self.is_identity(function, args, 0, BasicType.Int, 0):
+                return left
+            if implementation is operator.add and is_int and\
+               self.is_identity(function, args, 1, BasicType.Int, 0):
+                return right
+            if implementation is operator.mul:
+                for value_type, one in ((BasicType.Int, 1),
+                                        (BasicType.Real, 1.0)):
+                    if self.is_identity(function, args, 0, value_type, one):
+                        return left
+                    if self.is_identity(function, args, 1, value_type, one):
+                        return right
+
+        elif len(args) == 1 and isinstance(args[0], FuncCallAnalyzeNode):
+            inner = args[0]
+            if implementation in (operator.neg, operator.not_) and\
+               inner.function.body is None and\
+               inner.function.implementation is implementation and\
+               inner.function.foldable and len(inner.args) == 1 and\
+               get_value_type(inner.args[0]) == function.return_type:
+                return inner.args[0]
+
+        return None
+
+    def is_identity(self, function, args, kept, value_type, value):
+        """
+        Returns True if the given call of two arguments returns the argument
+        with index kept, given that the other one is the given constant: the
+        constant must have the type of its parameter, and the kept argument
+        the return type of the function.
+        """
+        other = 1 - kept
+        return function.arg_types[other] == value_type and\
+               self.is_constant(args[other], value_type, value) and\
+               get_value_type(args[kept]) == function.return_type
+
+    def is_constant(self, node, value_type, value):
+        """
+        Returns True if the given node is the given constant.
+        """
+        return isinstance(node, ConstantAnalyzeNode) and\
+               self.consts[node.index][0] == value_type and\
+               self.get_value(node) == value
+
+    def get_value(self, node):
+        """
+        Returns the value of the given constant node.
+        """
+        return node.const_table[node.index][1]
+
+    def make_constant(self, value_type, value):
+        """
+        Returns a constant node for the given value, adding it to the
+        constant table if needed. See ConstantPool for how values are
+        compared.
+        """
+        return ConstantAnalyzeNode(self.constant_pool.add(value_type, value),
+                                   self.consts)
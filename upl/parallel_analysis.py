@@ -0,0 +1,306 @@
+"""
+Semantic analysis which analyzes the bodies of top level functions in
+several processes.
+
+Once the function signatures are known, a function body only depends on
+the values declared before it. The parse tree is written once, in the format
+of upl.serialization, to a temporary file. Chunks of the bodies are sent to
+the worker processes with the path of that file and the signatures of the
+external functions, and each worker reads the file when it gets its first
+chunk. A worker analyzes a chunk of the bodies along with the value
+declarations which come before them.
+
+Analyze nodes can not be sent between processes as they are, since they
+refer to the functions and the constant table of the worker. A body is
+sent back as a flat table of entries, in which:
+
+  * Functions are referenced by their index in the function list of the
+    analyzer, which is the same in every process,
+  * Constants are stored by value,
+  * Top level values are stored by name, so the body refers to the same
+    nodes as in a serial analysis.
+
+The body also sends the constants it added to the constant table, in the
+order it added them.
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from upl.parse_nodes import DeclNode, FuncDefNode
+from upl.semantic_analyze_nodes import FuncDefAnalyzeNode, FuncArgAnalyzeNode,\
+                                       ConstantAnalyzeNode, FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.semantic_analyzer import SemanticAnalyzer
+from upl.constant_pool import ConstantPool
+from upl.call_graph import mark_tail_calls
+from upl.serialization import dump_parse_tree, load_parse_tree
+from upl.exceptions import SemanticAnalyzerException
+
+# Number of chunks of function bodies for each worker process. More chunks
+# balance the work better, but every chunk analyzes the value declarations
+# before it again.
+CHUNKS_PER_WORKER = 4
+
+# The program a worker process analyzes, as (parse tree path, signatures),
+# and its BodyAnalyzer. Workers keep them between chunks, so each one loads
+# the parse tree once.
+worker_program = None
+worker_analyzer = None
+
+
+def get_worker_analyzer(parse_tree_path, signatures):
+    """
+    Returns the BodyAnalyzer of a worker process for the encoded parse tree
+    in the given file and the (name, arg_types, return_type) signatures of
+    the external functions. The file is only read if the worker did not
+    analyze the same program before.
+    """
+    global worker_program, worker_analyzer
+    if worker_program != (parse_tree_path, signatures):
+        with open(parse_tree_path, "rb") as f:
+            parse_tree = load_parse_tree(f.read())
+        external_functions = [FuncDefAnalyzeNode(name, arg_types, return_type)
+                              for name, arg_types, return_type in signatures]
+        worker_analyzer = BodyAnalyzer(parse_tree, external_functions)
+        worker_program = (parse_tree_path, signatures)
+    return worker_analyzer
+
+
+def analyze_chunk(parse_tree_path, signatures, statement_indices):
+    """
+    Analyzes the function bodies with the given statement indices in a worker
+    process. See BodyAnalyzer.analyze_bodies().
+    """
+    analyzer = get_worker_analyzer(parse_tree_path, signatures)
+    return analyzer.analyze_bodies(statement_indices)
+
+
+def is_function_decl(statement):
+    return isinstance(statement, DeclNode) and\
+           isinstance(statement.expression, FuncDefNode)
+
+
+class BodyAnalyzer(SemanticAnalyzer):
+    """
+    BodyAnalyzer analyzes function bodies in a worker process, and encodes
+    them so they can be sent back.
+    """
+
+    def __init__(self, parse_tree, external_functions):
+        super(BodyAnalyzer, self).__init__(parse_tree, external_functions)
+        self.func_defs = self.get_func_defs(parse_tree, external_functions)
+        self.function_indices = dict((func_def, index)
+                                     for index, func_def in
+                                     enumerate(self.func_defs))
+
+    def analyze_bodies(self, statement_indices):
+        """
+        Returns a result for each of the function declarations with the
+        given statement indices, in the same order. A result is either the
+        SemanticAnalyzerException raised by the body, or the constants it
+        added and the entries of its encoded tree.
+        """
+        self.constant_pool = ConstantPool()
+        self.consts = self.constant_pool.constants
+        symtab = self.initialize_symtab(self.func_defs)
+
+        # Maps the nodes of top level values to their names.
+        self.global_names = {}
+
+        wanted = set(statement_indices)
+        results = {}
+        for index, s in enumerate(self.parse_tree.statements):
+            if len(results) == len(wanted):
+                break
+            if not isinstance(s, DeclNode):
+                continue
+
+            if is_function_decl(s):
+                if index in wanted:
+                    results[index] = self.analyze_body(s, symtab)
+                continue
+
+            try:
+                self.analyze_global_decl(s, symtab)
+            except SemanticAnalyzerException as e:
+                # The serial analysis stops here, so this is the error of all
+                # the later bodies.
+                for later in wanted.difference(results):
+                    results[later] = e
+                break
+            self.global_names.setdefault(symtab[s.identifier][0], s.identifier)
+
+        return [results[index] for index in statement_indices]
+
+    def analyze_body(self, node, symtab):
+        """
+        Analyzes the body of the given function declaration, and returns its
+        result for analyze_bodies().
+        """
+        start = len(self.consts)
+        try:
+            self.get_declared_function(node)
+            body = self.analyze_function_body(node.expression, symtab.push())
+        except SemanticAnalyzerException as e:
+            return e
+
+        entries = []
+        self.encode_node(body, {}, entries)
+        return self.consts[start:], entries
+
+    def encode_node(self, node, node_indices, entries):
+        """
+        Appends the entries of the given analyze node and of its children
+        which are not encoded yet, and returns the index of its entry.
+        """
+        if node in node_indices:
+            return node_indices[node]
+
+        if node in self.global_names:
+            entry = ("global", self.global_names[node])
+        elif isinstance(node, FuncCallAnalyzeNode):
+            args = [self.encode_node(arg, node_indices, entries)
+                    for arg in node.args]
+            entry = ("call", self.function_indices[node.function], args)
+        elif isinstance(node, ConditionalAnalyzeNode):
+            entry = ("conditional",
+                     self.encode_node(node.condition, node_indices, entries),
+                     self.encode_node(node.on_true, node_indices, entries),
+                     self.encode_node(node.on_false, node_indices, entries))
+        elif isinstance(node, ConstantAnalyzeNode):
+            entry = ("constant", ) + self.consts[node.index]
+        elif isinstance(node, FuncArgAnalyzeNode):
+            entry = ("arg", node.index, node.type)
+        else:
+            raise SemanticAnalyzerException("Cannot encode %s"
+                                            % (type(node).__name__, ))
+
+        node_indices[node] = len(entries)
+        entries.append(entry)
+        return node_indices[node]
+
+
+class ParallelSemanticAnalyzer(SemanticAnalyzer):
+    """
+    ParallelSemanticAnalyzer is a SemanticAnalyzer which analyzes the bodies
+    of top level functions in a pool of worker processes.
+
+    The result is the same as the result of SemanticAnalyzer: the constant
+    table has the same order, and if the program has several errors, the one
+    raised is the first in statement order.
+    """
+
+    def __init__(self, parse_tree, external_functions=None, max_workers=None):
+        """
+        Constructor for ParallelSemanticAnalyzer. parse_tree and
+        external_functions are the same as for SemanticAnalyzer. max_workers
+        is the number of worker processes, which defaults to the number of
+        processors. With one worker, the program is analyzed serially.
+        """
+        super(ParallelSemanticAnalyzer, self).__init__(parse_tree,
+                                                       external_functions)
+        self.max_workers = max_workers
+
+    def analyze_program(self, node, symtab):
+        """
+        Analyze the given program, with the function bodies analyzed by the
+        worker processes.
+        """
+        workers = self.max_workers or multiprocessing.cpu_count()
+        function_indices = [index for index, s in enumerate(node.statements)
+                            if is_function_decl(s)]
+        if workers <= 1 or len(function_indices) < 2:
+            return super(ParallelSemanticAnalyzer, self).analyze_program(node,
+                                                                         symtab)
+
+        # The path names the program for the workers, as temporary files
+        # have unique names while they exist.
+        fd, path = tempfile.mkstemp(suffix=".uplb")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dump_parse_tree(node))
+        except Exception:
+            os.remove(path)
+            raise
+
+        program = (path, [(f.name, f.arg_types, f.return_type)
+                          for f in self.external_functions])
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = {}
+        try:
+            results = self.submit_chunks(executor, workers, program,
+                                         function_indices)
+
+            for index, s in enumerate(node.statements):
+                if not isinstance(s, DeclNode):
+                    continue
+
+                if not is_function_decl(s):
+                    self.analyze_global_decl(s, symtab)
+                    continue
+
+                future, position = results[index]
+                result = future.result()[position]
+                if isinstance(result, SemanticAnalyzerException):
+                    raise result
+
+                constants, entries = result
+                func_body = self.decode_body(constants, entries, symtab)
+                mark_tail_calls(func_body)
+                self.get_declared_function(s).body = func_body
+        finally:
+            # After an error, the chunks which have not started are not needed.
+            for future, _ in results.values():
+                future.cancel()
+            executor.shutdown()
+            os.remove(path)
+
+    def submit_chunks(self, executor, workers, program, function_indices):
+        """
+        Submits the function bodies with the given statement indices to the
+        executor in chunks of consecutive bodies, CHUNKS_PER_WORKER chunks for
+        each of the workers. program is the (parse tree path, signatures) pair
+        sent to the workers. Returns a dict from statement indices to the
+        future of their chunk and their position in it.
+        """
+        size = max(1, -(-len(function_indices) //
+                        (workers * CHUNKS_PER_WORKER)))
+
+        results = {}
+        for start in range(0, len(function_indices), size):
+            chunk = function_indices[start:start + size]
+            future = executor.submit(analyze_chunk, program[0], program[1],
+                                     chunk)
+            for position, index in enumerate(chunk):
+                results[index] = (future, position)
+        return results
+
+    def decode_body(self, constants, entries, symtab):
+        """
+        Returns the function body encoded by BodyAnalyzer, after adding the
+        constants it added to the constant table.
+        """
+        for value_type, value in constants:
+            self.constant_pool.add(value_type, value)
+
+        nodes = []
+        for entry in entries:
+            kind = entry[0]
+            if kind == "global":
+                node = symtab[entry[1]][0]
+            elif kind == "call":
+                node = FuncCallAnalyzeNode(self.func_defs[entry[1]],
+                                           [nodes[i] for i in entry[2]])
+            elif kind == "conditional":
+                node = ConditionalAnalyzeNode(nodes[entry[1]], nodes[entry[2]],
+                                              nodes[entry[3]])
+            elif kind == "constant":
+                node = ConstantAnalyzeNode(self.constant_pool.index(entry[1],
+                                                                    entry[2]),
+                                           self.consts)
+            else:
+                node = FuncArgAnalyzeNode(entry[1], entry[2])
+            nodes.append(node)
+
+        return nodes[-1]
@@ -1,15 +1,18 @@
 from enum import Enum
 
-_next_parse_node_id = 0
-
 class ParseNode(object):
+    # Nodes have slots instead of a __dict__, as large programs create many
+    # of them. Subclasses list the attributes they add.
+    __slots__ = ("id", "location")
+
     def __init__(self, location):
-        global _next_parse_node_id
-        self.id = _next_parse_node_id
-        _next_parse_node_id += 1
+        # Set by the Parser which creates the node, see Parser.make_node().
+        self.id = None
         self.location = location
 
 class ProgramNode(ParseNode):
+    __slots__ = ("statements",)
+
     def __init__(self, location, statements):
         super(ProgramNode, self).__init__(location)
         self.statements = statements
@@ -21,9 +24,11 @@ class ProgramNode(ParseNode):
         )
 
 class StatementNode(ParseNode):
-    pass
+    __slots__ = ()
 
 class DeclNode(StatementNode):
+    __slots__ = ("declarator", "identifier", "expression")
+
     def __init__(self, location, declarator, identifier, expression):
         super(DeclNode, self).__init__(location)
         self.declarator = declarator
@@ -39,9 +44,11 @@ class DeclNode(StatementNode):
         )
 
 class ExpressionNode(StatementNode):
-    pass
+    __slots__ = ()
 
 class ConditionalNode(ExpressionNode):
+    __slots__ = ("condition", "on_true", "on_false")
+
     def __init__(self, location, condition, on_true, on_false):
         super(ConditionalNode, self).__init__(location)
         self.condition = condition
@@ -57,6 +64,8 @@ class ConditionalNode(ExpressionNode):
         )
 
 class FuncDefNode(ExpressionNode):
+    __slots__ = ("statements", "arg_list", "return_type")
+
     def __init__(self, location, arg_list, return_type, statements):
         super(FuncDefNode, self).__init__(location)
         self.statements = statements
@@ -72,6 +81,8 @@ class FuncDefNode(ExpressionNode):
         )
 
 class FuncArgNode(ParseNode):
+    __slots__ = ("name", "type", "index")
+
     def __init__(self, location, name, type, index):
         super(FuncArgNode, self).__init__(location)
         self.name = name
@@ -79,9 +90,11 @@ class FuncArgNode(ParseNode):
         self.index = index
 
 class LiteralNode(ExpressionNode):
-    pass
+    __slots__ = ()
 
 class BoolLiteralNode(LiteralNode):
+    __slots__ = ("value",)
+
     def __init__(self, location, value):
         super(BoolLiteralNode, self).__init__(location)
         self.value = value
@@ -93,6 +106,8 @@ class BoolLiteralNode(LiteralNode):
         )
 
 class IntLiteralNode(LiteralNode):
+    __slots__ = ("value",)
+
     def __init__(self, location, value):
         super(IntLiteralNode, self).__init__(location)
         self.value = value
@@ -104,6 +119,8 @@ class IntLiteralNode(LiteralNode):
         )
 
 class RealLiteralNode(LiteralNode):
+    __slots__ = ("value",)
+
     def __init__(self, location, value):
         super(RealLiteralNode, self).__init__(location)
         self.value = value
@@ -115,6 +132,8 @@ class RealLiteralNode(LiteralNode):
         )
 
 class IdentifierNode(ExpressionNode):
+    __slots__ = ("name",)
+
     def __init__(self, location, name):
         super(IdentifierNode, self).__init__(location)
         self.name = name
@@ -126,6 +145,8 @@ class IdentifierNode(ExpressionNode):
         )
 
 class FuncCallNode(ExpressionNode):
+    __slots__ = ("name", "args")
+
     def __init__(self, location, name, args):
         super(FuncCallNode, self).__init__(location)
         self.name = name
@@ -139,6 +160,8 @@ class FuncCallNode(ExpressionNode):
         )
 
 class BinaryOperationNode(ExpressionNode):
+    __slots__ = ("operator", "left_operand", "right_operand")
+
     def __init__(self, location, operator, left_operand, right_operand):
         super(BinaryOperationNode, self).__init__(location)
         self.operator = operator
@@ -154,6 +177,8 @@ class BinaryOperationNode(ExpressionNode):
         )
 
 class UnaryOperationNode(ExpressionNode):
+    __slots__ = ("operator", "operand")
+
     def __init__(self, location, operator, operand):
         super(UnaryOperationNode, self).__init__(location)
         self.operator = operator
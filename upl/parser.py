@@ -1,6 +1,10 @@
-from upl.token import TokenType, Token
+from bisect import bisect_left
+from functools import wraps
+import itertools
+from upl.token import TokenType, Token, TokenWindow
 from upl.lexer import tokenize_program
 import json
+from enum import Enum
 from upl.parse_nodes import ProgramNode, DeclNode, FuncDefNode, BoolLiteralNode,\
                             IntLiteralNode, RealLiteralNode, FuncCallNode,\
                             BinaryOperationNode, UnaryOperationNode,\
@@ -18,12 +22,271 @@ operator_groups = (
     ('**',)
 )
 
-class Parser(object):
+DEFAULT_OPERATOR_PRIORITY = 100
+
+# Priority of each operator, compiled from operator_groups.
+operator_priorities = dict((operator, priority)
+                           for priority, group in enumerate(operator_groups)
+                           for operator in group)
+
+
+class Associativity(Enum):
+    Left        = 0
+    Right       = 1
+
+open_bracket_types = (TokenType.OpenParen, TokenType.OpenBracket)
+close_bracket_types = (TokenType.CloseParen, TokenType.CloseBracket)
+
+literal_node_types = {
+    TokenType.BoolLiteral: BoolLiteralNode,
+    TokenType.IntLiteral: IntLiteralNode,
+    TokenType.RealLiteral: RealLiteralNode
+}
+
+NO_PRIORITY = float("inf")
+
+# Returned by parse_operator_expression when the tokens can't be parsed as an
+# expression at all, so that parse_expression can skip the cascade.
+PARSE_FAILED = object()
+
+
+class BracketIndex(object):
+    """
+    BracketIndex is built with one pass over a list of tokens, and answers
+    find_delimiters queries on any sub-range of that list without rescanning
+    it. It records:
+
+      * depths: the bracket depth of each token, i.e. the number of open
+        brackets before it minus the number of closed ones. Parens and curly
+        brackets are counted alike, same as in Parser.find_delimiters,
+      * matches: for each bracket the index of its matching bracket, or None,
+      * positions: for each (token type, depth) pair, the sorted list of
+        indices of tokens of that type at that depth,
+      * curly_counts: the number of curly brackets before each token, and
+        before the end of the list.
+    """
     def __init__(self, tokens):
         self.tokens = tokens
+        self.depths = []
+        self.matches = [None] * len(tokens)
+        self.positions = {}
+        self.curly_counts = []
+
+        depth = 0
+        curly_count = 0
+        open_indices = []
+        for i, token in enumerate(tokens):
+            self.depths.append(depth)
+            self.curly_counts.append(curly_count)
+            key = (token.type, depth)
+            if key not in self.positions:
+                self.positions[key] = [i]
+            else:
+                self.positions[key].append(i)
+
+            if token.type in open_bracket_types:
+                open_indices.append(i)
+                depth += 1
+            elif token.type in close_bracket_types:
+                depth -= 1
+                if len(open_indices) > 0:
+                    open_index = open_indices.pop()
+                    self.matches[open_index] = i
+                    self.matches[i] = open_index
+
+            if token.type == TokenType.OpenBracket:
+                curly_count += 1
+
+        self.curly_counts.append(curly_count)
+
+    def has_curly_brackets(self, start, stop):
+        """
+        Returns True if there is a curly bracket in [start, stop).
+        """
+        return self.curly_counts[stop] > self.curly_counts[start]
+
+    def find_delimiters(self, start, stop, type, skip=0, limit=None):
+        """
+        Returns the indices in [start + skip, stop) of the tokens of the given
+        type which have the same depth as the token at start.
+        """
+        if start >= stop:
+            return []
+
+        positions = self.positions.get((type, self.depths[start]))
+        if positions is None:
+            return []
+
+        first = bisect_left(positions, start + skip)
+        last = bisect_left(positions, stop, first)
+        if limit is not None:
+            last = min(last, first + limit)
+
+        return positions[first:last]
+
+def packrat(production):
+    """
+    Decorator for parse methods which take a token range and return a result
+    without side effects. If packrat parsing is enabled and the tokens are a
+    TokenWindow, results are cached per (production, start, stop), so a span
+    is parsed at most once by each production. Exceptions aren't cached, since
+    they abort the whole parse.
+    """
+    name = production.__name__
+
+    @wraps(production)
+    def memoized_production(self, tokens):
+        if not self.packrat or not isinstance(tokens, TokenWindow):
+            return production(self, tokens)
+
+        key = (name, tokens.start, tokens.stop)
+        if key in self.packrat_cache:
+            self.packrat_hits += 1
+            return self.packrat_cache[key]
+
+        self.packrat_misses += 1
+        result = production(self, tokens)
+        self.packrat_cache[key] = result
+        return result
+
+    return memoized_production
+
+
+class Parser(object):
+    def __init__(self, tokens, token_window=True, precedence_climbing=True,
+                 packrat=False):
+        """
+        tokens is either a list of tokens, or any other iterable of tokens such
+        as the generator returned by lexer.iter_tokens(). Iterables are
+        consumed one top level statement at a time, and are never turned into
+        a list.
+
+        If token_window is True, the parse methods receive TokenWindow views
+        over one shared token list, so taking a sub-range doesn't copy tokens.
+        Otherwise they receive plain list slices.
+
+        If precedence_climbing is True, parse_expression first tries
+        parse_operator_expression, which parses operator expressions in
+        linear time. It needs token windows, so it has no effect when
+        token_window is False. The spans parse_expression fails to parse are
+        kept in failed_spans, so operands which parse_operator_expression
+        already failed to parse aren't parsed again when it falls back.
+
+        If packrat is True, the expression productions cache their results
+        per token span (see the packrat decorator), which bounds the parse
+        time of any input by a polynomial. The cache is cleared by each call
+        to parse(), which also resets packrat_hits and packrat_misses. Like
+        precedence_climbing, it needs token windows.
+        """
+        self.tokens = tokens
+        self.token_window = token_window
+        self.precedence_climbing = precedence_climbing
+        self.packrat = packrat
+        self.packrat_cache = {}
+        self.packrat_hits = 0
+        self.packrat_misses = 0
+        self.failed_spans = set()
+        self.bracket_index = None
+        self.node_ids = itertools.count()
+
+        # Operators with equal priority group to the right, so that is the
+        # associativity of all built-in priorities.
+        self.operator_priorities = dict(operator_priorities)
+        self.priority_associativities = dict(
+            (priority, Associativity.Right)
+            for priority in list(operator_priorities.values()) +
+                            [DEFAULT_OPERATOR_PRIORITY])
+
+    def register_operator(self, operator, priority,
+                          associativity=Associativity.Right):
+        """
+        Registers an operator for this parser, or changes the priority of an
+        existing one. Operators with lower priority are split first, i.e.
+        bind less tightly: the built-in groups in operator_groups have
+        priorities 0 to 7, and operators that aren't registered have
+        DEFAULT_OPERATOR_PRIORITY.
+
+        associativity applies to every operator with the given priority, so
+        it must agree with the operators already registered with it.
+        Otherwise a ValueError is raised.
+        """
+        current = self.priority_associativities.get(priority)
+        if current is not None and current != associativity:
+            raise ValueError("Operators with priority %s are %s associative"
+                             % (priority, current.name.lower()))
+
+        self.operator_priorities[operator] = priority
+        self.priority_associativities[priority] = associativity
 
     def parse(self):
-        return self.parse_program(self.tokens)
+        # Node IDs count from zero in every parse, so they don't depend on
+        # what was parsed before.
+        self.node_ids = itertools.count()
+        self.packrat_cache = {}
+        self.packrat_hits = 0
+        self.packrat_misses = 0
+        self.failed_spans = set()
+
+        if isinstance(self.tokens, list):
+            return self.parse_program(self.make_token_range(self.tokens))
+
+        statements = list(self.iter_statements(self.tokens))
+        return self.make_node(ProgramNode, (1, 1), statements)
+
+    def make_node(self, node_type, *args):
+        """
+        Returns a new parse node of the given type, constructed with the given
+        arguments, with the next node ID of this parser.
+        """
+        node = node_type(*args)
+        node.id = next(self.node_ids)
+        return node
+
+    def iter_statements(self, tokens):
+        """
+        Parses the statements in the given iterable of tokens and yields them
+        one at a time. Only the tokens of the current top level statement are
+        kept in memory.
+        """
+        for statement_tokens in self.iter_statement_tokens(tokens):
+            yield self.parse_statement(self.make_token_range(statement_tokens))
+
+    def iter_statement_tokens(self, tokens):
+        """
+        Splits the given iterable of tokens into top level statements, and
+        yields the list of tokens of each one. Empty statements are skipped.
+        """
+        statement_tokens = []
+        balance = 0
+
+        for token in tokens:
+            if token.type == TokenType.StatementSep and balance == 0:
+                if len(statement_tokens) > 0:
+                    yield statement_tokens
+                    statement_tokens = []
+                continue
+
+            statement_tokens.append(token)
+            if token.type in (TokenType.OpenParen, TokenType.OpenBracket):
+                balance += 1
+            elif token.type in (TokenType.CloseParen, TokenType.CloseBracket):
+                balance -= 1
+
+        if len(statement_tokens) > 0:
+            yield statement_tokens
+
+    def make_token_range(self, tokens):
+        """
+        Returns the object the parse methods use to access the given list of
+        tokens.
+        """
+        if self.token_window:
+            # Cached spans refer to the previous list, so drop them.
+            self.packrat_cache = {}
+            self.failed_spans = set()
+            self.bracket_index = BracketIndex(tokens)
+            return TokenWindow(tokens)
+        return tokens
 
     def parse_program(self, tokens):
         """
@@ -36,7 +299,7 @@ class Parser(object):
         except ParserException as e:
             raise e
 
-        program = ProgramNode((1, 1), statements)
+        program = self.make_node(ProgramNode, (1, 1), statements)
 
         return program
 
@@ -120,15 +383,16 @@ class Parser(object):
             raise ParserException("Expected expression",
                                   location=tokens[3].location)
 
-        declaration = DeclNode(tokens[0].location, declarator,
-                               identifier, expression)
+        declaration = self.make_node(DeclNode, tokens[0].location, declarator,
+                                     identifier, expression)
         return declaration
 
     def get_first_statement(self, tokens):
         """
         Returns the statement which starts at the current token.
         """
-        separator_indices = self.find_delimiters(tokens, TokenType.StatementSep)
+        separator_indices = self.find_delimiters(tokens, TokenType.StatementSep,
+                                                 limit=1)
 
         if len(separator_indices) == 0:
             statement_tokens = tokens
@@ -137,6 +401,7 @@ class Parser(object):
 
         return statement_tokens
 
+    @packrat
     def parse_expression(self, tokens):
         """
         On success returns an expression, otherwise returns None.
@@ -144,6 +409,19 @@ class Parser(object):
         expression := binary_operation | unary_operation | func_call | func_def |
                       identifier | literal | "(" expression ")";
         """
+        span = None
+        if self.precedence_climbing and isinstance(tokens, TokenWindow):
+            span = (tokens.start, tokens.stop)
+            if span in self.failed_spans:
+                return None
+
+            expression = self.parse_operator_expression(tokens)
+            if expression is PARSE_FAILED:
+                self.failed_spans.add(span)
+                return None
+            elif expression is not None:
+                return expression
+
         expression = self.parse_conditional(tokens) or\
                      self.parse_binary_operation(tokens) or\
                      self.parse_unary_operation(tokens) or\
@@ -158,8 +436,180 @@ class Parser(object):
            tokens[-1].type == TokenType.CloseParen:
            expression = self.parse_expression(tokens[1:-1])
 
+        if expression is None and span is not None:
+            self.failed_spans.add(span)
         return expression
 
+    def parse_operator_expression(self, tokens):
+        """
+        Precedence climbing parser for expressions which consist of operators
+        and operands, where an operand is an identifier, a literal, a function
+        call, or a parenthesized expression. It reads each token once, and
+        builds the same tree as the parse_binary_operation and
+        parse_unary_operation cascade: operators with the lowest priority are
+        split first, operators with the same priority group to the right, and
+        unary operators bind tighter than binary ones.
+
+        Returns None if the tokens contain anything else, if an operand can't
+        be parsed, or if the cascade would build a different tree, which
+        happens when a unary operator follows an operator with higher priority
+        (as in "a * -b"). parse_expression then falls back to the cascade.
+
+        If an operand can't be parsed and the tokens contain no function
+        definition, the cascade is bound to fail without raising an error, so
+        PARSE_FAILED is returned instead of None.
+        """
+        index = self.get_bracket_index(tokens)
+        if index is None or len(tokens) == 0:
+            return None
+
+        base = tokens.tokens
+        start = tokens.start
+        stop = tokens.stop
+        matches = index.matches
+        Operator = TokenType.Operator
+
+        # Split the tokens into operands and binary operators. Each operand is
+        # stored as (prefix_start, atom_start, atom_stop), where the tokens in
+        # [prefix_start, atom_start) are its unary operators.
+        operands = []
+        operators = []
+        pos = start
+        while True:
+            prefix_start = pos
+            while pos < stop and base[pos].type == Operator:
+                pos += 1
+            if pos == stop:
+                return None
+
+            token_type = base[pos].type
+            if token_type == TokenType.Identifier and pos + 1 < stop and\
+               base[pos + 1].type == TokenType.OpenParen:
+                open_index = pos + 1
+            elif token_type == TokenType.OpenParen:
+                open_index = pos
+            elif token_type == TokenType.Identifier or\
+                 token_type in literal_node_types:
+                open_index = None
+            else:
+                return None
+
+            if open_index is None:
+                atom_stop = pos + 1
+            else:
+                close_index = matches[open_index]
+                if close_index is None or close_index >= stop or\
+                   base[close_index].type != TokenType.CloseParen:
+                    return None
+                atom_stop = close_index + 1
+
+            operands.append((prefix_start, pos, atom_stop))
+            pos = atom_stop
+            if pos == stop:
+                break
+            if base[pos].type != Operator:
+                return None
+            operators.append(pos)
+            pos += 1
+
+        # Find the shape of the tree with a shunting-yard pass, recording it in
+        # reverse polish notation. For each subtree, track the lowest priority
+        # of its unary operators, with and without its first token, to check
+        # that the cascade would pick the same operator at every split.
+        get_priority = self.get_operator_priority
+        rpn = []
+        bounds = []
+        pending = []
+
+        for operand_index, (prefix_start, atom_start, _) in enumerate(operands):
+            if operand_index > 0:
+                operator = operators[operand_index - 1]
+                priority = get_priority(base[operator].value)
+                left = self.priority_associativities.get(priority) ==\
+                       Associativity.Left
+                while len(pending) > 0 and\
+                      (pending[-1][1] > priority or
+                       (left and pending[-1][1] == priority)):
+                    if not self.reduce_operator(pending.pop(), rpn, bounds):
+                        return None
+                pending.append((operator, priority, left))
+
+            rpn.append(operand_index)
+            lowest = inner_lowest = NO_PRIORITY
+            for unary_operator in range(atom_start - 1, prefix_start - 1, -1):
+                rpn.append(-unary_operator - 1)
+                inner_lowest = lowest
+                lowest = min(lowest, get_priority(base[unary_operator].value))
+            bounds.append((lowest, inner_lowest))
+
+        while len(pending) > 0:
+            if not self.reduce_operator(pending.pop(), rpn, bounds):
+                return None
+
+        # Parse the operands from left to right, then build the tree.
+        atoms = []
+        for prefix_start, atom_start, atom_stop in operands:
+            token = base[atom_start]
+            if atom_stop - atom_start == 1:
+                node_type = literal_node_types.get(token.type, IdentifierNode)
+                atom = self.make_node(node_type, token.location, token.value)
+            elif token.type == TokenType.Identifier:
+                atom = self.parse_function_call(tokens[atom_start - start:
+                                                       atom_stop - start])
+            else:
+                atom = self.parse_expression(tokens[atom_start - start + 1:
+                                                    atom_stop - start - 1])
+            if atom is None:
+                if index.has_curly_brackets(start, stop):
+                    return None
+                return PARSE_FAILED
+            atoms.append((atom, atom_start))
+
+        stack = []
+        for item in rpn:
+            if isinstance(item, tuple):
+                right, _ = stack.pop()
+                left, first = stack.pop()
+                node = self.make_node(BinaryOperationNode,
+                                      base[first].location,
+                                      base[item[0]].value, left, right)
+                stack.append((node, first))
+            elif item >= 0:
+                stack.append(atoms[item])
+            else:
+                operator = -item - 1
+                operand, _ = stack.pop()
+                node = self.make_node(UnaryOperationNode,
+                                      base[operator].location,
+                                      base[operator].value, operand)
+                stack.append((node, operator))
+
+        return stack[0][0]
+
+    def reduce_operator(self, operator, rpn, bounds):
+        """
+        Combines the top two subtrees in parse_operator_expression with the
+        given (index, priority, left associative) operator. Returns False if
+        the cascade would pick a unary operator instead, i.e. one with lower
+        priority, or one with the same priority on the side the cascade
+        prefers: the left for right associative operators, and the right for
+        left associative ones.
+        """
+        right_lowest, _ = bounds.pop()
+        left_lowest, left_inner_lowest = bounds.pop()
+        _, priority, left = operator
+        if left:
+            if left_inner_lowest < priority or right_lowest <= priority:
+                return False
+        elif left_inner_lowest <= priority or right_lowest < priority:
+            return False
+
+        rpn.append(operator)
+        bounds.append((min(left_lowest, right_lowest),
+                       min(left_inner_lowest, right_lowest)))
+        return True
+
+    @packrat
     def parse_conditional(self, tokens):
         """
         On success returns a conditional expression, otherwise returns None.
@@ -170,13 +620,14 @@ class Parser(object):
         if len(tokens) < 5 or tokens[0].type != TokenType.KeywordIf:
             return None
 
-        then_idxs = self.find_delimiters(tokens, TokenType.KeywordThen)
+        then_idxs = self.find_delimiters(tokens, TokenType.KeywordThen, limit=1)
         if len(then_idxs) < 1:
             return None
 
         then_idx = then_idxs[0]
 
-        else_idxs = self.find_delimiters(tokens[then_idx:], TokenType.KeywordElse)
+        else_idxs = self.find_delimiters(tokens[then_idx:], TokenType.KeywordElse,
+                                         limit=1)
         if len(else_idxs) < 1:
             return None
 
@@ -189,23 +640,31 @@ class Parser(object):
         if condition is None or on_true is None or on_false is None:
             return None
 
-        conditional = ConditionalNode(tokens[0].location, condition,
-                                      on_true, on_false)
+        conditional = self.make_node(ConditionalNode, tokens[0].location,
+                                     condition, on_true, on_false)
         return conditional
 
+    @packrat
     def parse_binary_operation(self, tokens):
         """
         On success returns a binary operation, otherwise returns None.
 
         binary_operation := expression operator expression;
         """
-        # find highest priority operator
+        # find lowest priority operator, the last one for left associative
+        # priorities and the first one otherwise
         operator_indices = self.find_delimiters(tokens, TokenType.Operator, 1)
         if len(operator_indices) == 0:
             return None
 
-        operator_index = min(operator_indices,
-                             key=lambda i: self.get_operator_priority(tokens[i].value))
+        priorities = [self.get_operator_priority(tokens[i].value)
+                      for i in operator_indices]
+        lowest = min(priorities)
+        if self.priority_associativities.get(lowest) == Associativity.Left:
+            position = len(priorities) - 1 - priorities[::-1].index(lowest)
+        else:
+            position = priorities.index(lowest)
+        operator_index = operator_indices[position]
 
         # parse left operand and right operand
         operator = tokens[operator_index].value
@@ -216,11 +675,13 @@ class Parser(object):
             return None
 
         # create the result
-        binary_operation = BinaryOperationNode(tokens[0].location, operator,
-                                               left_operand, right_operand)
+        binary_operation = self.make_node(BinaryOperationNode,
+                                          tokens[0].location, operator,
+                                          left_operand, right_operand)
 
         return binary_operation
 
+    @packrat
     def parse_unary_operation(self, tokens):
         """
         On success returns a unary operation, otherwise returns None.
@@ -236,10 +697,12 @@ class Parser(object):
         if operand is None:
             return None
 
-        unary_operation = UnaryOperationNode(tokens[0].location, operator, operand)
+        unary_operation = self.make_node(UnaryOperationNode, tokens[0].location,
+                                         operator, operand)
 
         return unary_operation
 
+    @packrat
     def parse_function_call(self, tokens):
         """
         On success returns a function call, otherwise returns None.
@@ -257,9 +720,11 @@ class Parser(object):
         if args is None:
             return None
 
-        function_call = FuncCallNode(tokens[0].location, name, args)
+        function_call = self.make_node(FuncCallNode, tokens[0].location, name,
+                                       args)
         return function_call
 
+    @packrat
     def parse_function_call_args(self, tokens):
         """
         On success returns a list of expressions, otherwise returns None.
@@ -284,13 +749,14 @@ class Parser(object):
 
         return arg_list
 
+    @packrat
     def parse_function_def(self, tokens):
         """
         On success returns a function definition, otherwise returns None.
 
         function_def := function_type "{" function_body "}"
         """
-        idxs = self.find_delimiters(tokens, TokenType.OpenBracket)
+        idxs = self.find_delimiters(tokens, TokenType.OpenBracket, limit=2)
         if len(idxs) != 1 or tokens[-1].type != TokenType.CloseBracket:
             return None
 
@@ -302,8 +768,8 @@ class Parser(object):
            function_body is None:
             return None
 
-        function_def = FuncDefNode(tokens[0].location, arg_list,
-                                   return_type, function_body)
+        function_def = self.make_node(FuncDefNode, tokens[0].location, arg_list,
+                                      return_type, function_body)
 
         return function_def
 
@@ -313,7 +779,7 @@ class Parser(object):
 
         function_type := "(" arg_list ")" "->" type;
         """
-        idxs = self.find_delimiters(tokens, TokenType.ReturnsSep)
+        idxs = self.find_delimiters(tokens, TokenType.ReturnsSep, limit=2)
         if len(idxs) != 1 or idxs[0] < 2 or\
            tokens[0].type != TokenType.OpenParen or\
            tokens[idxs[0] - 1].type != TokenType.CloseParen or\
@@ -373,7 +839,8 @@ class Parser(object):
 
         type = tokens[2].type
         identifier = tokens[0].value
-        typed_var = FuncArgNode(tokens[0].location, identifier, type, index)
+        typed_var = self.make_node(FuncArgNode, tokens[0].location, identifier,
+                                   type, index)
 
         return typed_var
 
@@ -384,7 +851,8 @@ class Parser(object):
         if len(tokens) != 1 or tokens[0].type != TokenType.Identifier:
             return None
 
-        identifier = IdentifierNode(tokens[0].location, tokens[0].value)
+        identifier = self.make_node(IdentifierNode, tokens[0].location,
+                                    tokens[0].value)
         return identifier
 
     def parse_literal(self, tokens):
@@ -397,27 +865,31 @@ class Parser(object):
             return None
 
         literal = None
-        token_to_node_type = {
-            TokenType.BoolLiteral: BoolLiteralNode,
-            TokenType.IntLiteral: IntLiteralNode,
-            TokenType.RealLiteral: RealLiteralNode
-        }
-
-        node_type = token_to_node_type.get(tokens[0].type)
+        node_type = literal_node_types.get(tokens[0].type)
         if node_type is not None:
-            literal = node_type(tokens[0].location, tokens[0].value)
+            literal = self.make_node(node_type, tokens[0].location,
+                                     tokens[0].value)
 
         return literal
 
-    def find_delimiters(self, tokens, type, skip=0):
+    def find_delimiters(self, tokens, type, skip=0, limit=None):
         """
         Returns the indices at which tokens can be split by tokens of given type.
+        If limit is given, at most that many indices are returned.
         """
+        index = self.get_bracket_index(tokens)
+        if index is not None:
+            start = tokens.start
+            return [i - start for i in index.find_delimiters(start, tokens.stop,
+                                                             type, skip, limit)]
+
         result = []
         balance = 0
         for i, token in enumerate(tokens):
             if token.type == type and balance == 0 and i >= skip:
                 result.append(i)
+                if limit is not None and len(result) >= limit:
+                    break
 
             if token.type in (TokenType.OpenParen, TokenType.OpenBracket):
                 balance += 1
@@ -426,11 +898,19 @@ class Parser(object):
 
         return result
 
+    def get_bracket_index(self, tokens):
+        """
+        Returns the bracket index of the list the given tokens are a window
+        of, or None if there is no such index.
+        """
+        if isinstance(tokens, TokenWindow) and\
+           self.bracket_index is not None and\
+           self.bracket_index.tokens is tokens.tokens:
+            return self.bracket_index
+        return None
+
     def get_operator_priority(self, operator):
         """
         Returns the priority of the given operator.
         """
-        for priority, group in enumerate(operator_groups):
-            if operator in group:
-                return priority
-        return 100
+        return self.operator_priorities.get(operator, DEFAULT_OPERATOR_PRIORITY)
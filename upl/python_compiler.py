@@ -0,0 +1,258 @@
+import math
+import operator
+from upl.semantic_analyze_nodes import FuncArgAnalyzeNode, ConstantAnalyzeNode,\
+                                       FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+from upl.interpreter import Interpreter, missing_implementation
+from upl.exceptions import RuntimeException
+from upl.memoization import memoize
+from upl.call_graph import get_self_tail_calls
+
+# External implementations which are written as the Python operator itself
+# instead of a call. The generated code computes exactly the same value, but
+# without the cost of a function call.
+binary_operators = {
+    operator.add: "+",
+    operator.sub: "-",
+    operator.mul: "*",
+    operator.truediv: "/",
+    operator.floordiv: "//",
+    operator.mod: "%",
+    operator.lt: "<",
+    operator.le: "<=",
+    operator.gt: ">",
+    operator.ge: ">=",
+    operator.eq: "==",
+    operator.ne: "!=",
+}
+
+unary_operators = {
+    operator.neg: "-",
+    operator.pos: "+",
+    operator.not_: "not ",
+}
+
+
+def store_temporary(temporaries, index, value):
+    """
+    Stores the value of a shared node in the list of temporaries of a call of
+    a generated function, and returns it. Generated code calls it where the
+    node is first evaluated, so it works without assignment expressions.
+    """
+    temporaries[index] = value
+    return value
+
+
+class PythonCompiler(Interpreter):
+    """
+    PythonCompiler generates Python source code for the analyzed functions
+    and compiles it with compile(), so a call runs Python bytecode instead of
+    walking the analyze tree. Every UPL function becomes a Python function,
+    and calls to external functions call their implementation directly.
+
+    It has the same interface as Interpreter: get_function() and call().
+    """
+
+    def __init__(self, consts, func_defs, **options):
+        """
+        Constructor for PythonCompiler. Arguments are the same as for
+        Interpreter.
+        """
+        super(PythonCompiler, self).__init__(consts, func_defs, **options)
+
+        # Maps function definitions to the names of the Python functions (or
+        # implementations of the external functions) in the namespace.
+        self.names = dict((func_def, "f%d" % (i, ))
+                          for i, func_def in enumerate(func_defs))
+        self.namespace = {"store_temporary": store_temporary}
+
+        self.source = "\n".join(self.compile_function(func_def)
+                                for func_def in func_defs)
+        exec(compile(self.source, "<upl>", "exec"), self.namespace)
+
+        # Memoized functions call each other through the cache as well.
+        for func_def, cache in self.caches.items():
+            name = self.names[func_def]
+            self.namespace[name] = memoize(self.namespace[name], cache)
+
+        self.callables = dict((func_def, self.namespace[name])
+                              for func_def, name in self.names.items())
+
+    def call_function(self, func_def, args):
+        """
+        Runs the given function without checking its arguments.
+        """
+        return self.get_callable(func_def)(*args)
+
+    def get_callable(self, func_def):
+        """
+        Returns the Python callable which runs the given function.
+        """
+        if func_def not in self.callables:
+            self.callables[func_def] = self.namespace[self.get_name(func_def)]
+        return self.callables[func_def]
+
+    def get_name(self, func_def):
+        """
+        Returns the name which refers to the given function in the generated
+        code. External functions are bound to their implementation.
+        """
+        if func_def not in self.names:
+            name = "e%d" % (len(self.names), )
+            self.names[func_def] = name
+            self.namespace[name] = self.get_implementation(func_def)
+        return self.names[func_def]
+
+    def get_implementation(self, func_def):
+        """
+        Returns the implementation of the given external function, or a
+        function which fails if it has none.
+        """
+        if func_def.implementation is not None:
+            return func_def.implementation
+        return missing_implementation(func_def)
+
+    def compile_function(self, func_def):
+        """
+        Returns the Python source of the given function.
+        """
+        # Shared nodes are stored in the list t when they are first
+        # evaluated, and later uses read the list if the store happens on
+        # every path which leads to them.
+        self.temporaries = {}
+        self.available = set()
+
+        args = ", ".join("a%d" % (i, ) for i in range(len(func_def.arg_types)))
+
+        if not get_self_tail_calls(func_def):
+            body = ["    return %s" % (self.compile_expression(func_def.body), )]
+        else:
+            # Tail calls to the function itself assign the new arguments and
+            # continue the loop.
+            body = ["    while True:"]
+            body.extend(self.compile_tail(func_def, func_def.body, "        "))
+
+        lines = ["def %s(%s):" % (self.names[func_def], args)]
+        if self.temporaries:
+            lines.append("    t = [None] * %d" % (len(self.temporaries), ))
+        return "\n".join(lines + body) + "\n"
+
+    def compile_tail(self, func_def, node, indent):
+        """
+        Returns the lines of Python source which return the value of the given
+        analyze node, which is in a tail position of the function.
+        """
+        if isinstance(node, ConditionalAnalyzeNode) and\
+           not node in self.available:
+            condition = self.compile_expression(node.condition)
+            available = self.available
+
+            self.available = set(available)
+            lines = ["%sif %s:" % (indent, condition)]
+            lines.extend(self.compile_tail(func_def, node.on_true,
+                                           indent + "    "))
+
+            self.available = set(available)
+            lines.append("%selse:" % (indent, ))
+            lines.extend(self.compile_tail(func_def, node.on_false,
+                                           indent + "    "))
+            return lines
+
+        elif isinstance(node, FuncCallAnalyzeNode) and node.is_tail_call and\
+             node.function is func_def and not node in self.available:
+            if not node.args:
+                return ["%scontinue" % (indent, )]
+
+            # The values are computed before any argument is assigned.
+            names = ", ".join("a%d" % (i, ) for i in range(len(node.args)))
+            values = ", ".join(self.compile_expression(arg)
+                               for arg in node.args)
+            return ["%s%s, = %s," % (indent, names, values),
+                    "%scontinue" % (indent, )]
+
+        else:
+            return ["%sreturn %s" % (indent, self.compile_expression(node))]
+
+    def compile_expression(self, node):
+        """
+        Returns the Python source of the given analyze node as an expression.
+        """
+        if not node.shared:
+            return self.compile_node(node)
+
+        if node in self.available:
+            return "t[%d]" % (self.temporaries[node], )
+
+        if node not in self.temporaries:
+            self.temporaries[node] = len(self.temporaries)
+        source = "store_temporary(t, %d, %s)" % (self.temporaries[node],
+                                                 self.compile_node(node))
+        self.available.add(node)
+        return source
+
+    def compile_node(self, node):
+        """
+        Returns the Python source which computes the given analyze node.
+        """
+        if isinstance(node, FuncCallAnalyzeNode):
+            args = [self.compile_expression(arg) for arg in node.args]
+            return self.compile_call(node.function, args)
+
+        elif isinstance(node, FuncArgAnalyzeNode):
+            return "a%d" % (node.index, )
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            return self.compile_constant(node.const_table[node.index][1])
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            # Compile in evaluation order, so shared nodes are assigned
+            # before they are read.
+            condition = self.compile_expression(node.condition)
+            available = self.available
+
+            self.available = set(available)
+            on_true = self.compile_expression(node.on_true)
+            true_available = self.available
+
+            self.available = set(available)
+            on_false = self.compile_expression(node.on_false)
+            self.available &= true_available
+
+            return "(%s if %s else %s)" % (on_true, condition, on_false)
+
+        else:
+            raise RuntimeException("Cannot compile %s" % (type(node).__name__, ))
+
+    def compile_call(self, func_def, args):
+        """
+        Returns the Python source which calls the given function with the
+        given argument expressions.
+        """
+        implementation = func_def.body is None and func_def.implementation
+
+        # Only builtins can be operators, and unlike arbitrary callables they
+        # are always hashable.
+        if not isinstance(implementation, type(operator.add)):
+            implementation = None
+
+        if len(args) == 2 and implementation in binary_operators:
+            return "(%s %s %s)" % (args[0], binary_operators[implementation],
+                                   args[1])
+        elif len(args) == 1 and implementation in unary_operators:
+            return "(%s%s)" % (unary_operators[implementation], args[0])
+
+        return "%s(%s)" % (self.get_name(func_def), ", ".join(args))
+
+    def compile_constant(self, value):
+        """
+        Returns the Python source of the given constant value.
+        """
+        if isinstance(value, float) and not math.isinf(value) and\
+           not math.isnan(value):
+            return repr(value)
+        elif isinstance(value, (bool, int)):
+            return repr(value)
+
+        name = "c%d" % (len(self.namespace), )
+        self.namespace[name] = value
+        return name
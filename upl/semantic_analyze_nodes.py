@@ -6,13 +6,38 @@ class BasicType(Enum):
     Real        = 2
 
 class AnalyzeNode(object):
-    pass
+    # Nodes have slots instead of a __dict__, as large programs create many
+    # of them. Subclasses list the attributes they add.
+    __slots__ = ("shared",)
+
+    def __init__(self):
+        # Whether the node is used more than once in a function body, so its
+        # value can be computed once and reused.
+        self.shared = False
 
 class FuncDefAnalyzeNode(AnalyzeNode):
-    def __init__(self, name, arg_types, return_type):
+    __slots__ = ("name", "arg_types", "return_type", "implementation", "pure",
+                 "foldable", "body")
+
+    def __init__(self, name, arg_types, return_type, implementation=None,
+                 pure=False, foldable=False):
+        """
+        implementation is the Python callable which runs an external
+        function. It receives the argument values and returns the result.
+
+        pure tells that an external function has no side effects, and that
+        its result depends only on its arguments.
+
+        foldable tells that calls to an external function with constant
+        arguments can be computed at compile time.
+        """
+        super(FuncDefAnalyzeNode, self).__init__()
         self.name = name
         self.arg_types = arg_types
         self.return_type = return_type
+        self.implementation = implementation
+        self.pure = pure
+        self.foldable = foldable
         self.body = None
 
     def to_dict(self):
@@ -25,7 +50,10 @@ class FuncDefAnalyzeNode(AnalyzeNode):
         )
 
 class FuncArgAnalyzeNode(AnalyzeNode):
+    __slots__ = ("index", "type")
+
     def __init__(self, index, type):
+        super(FuncArgAnalyzeNode, self).__init__()
         self.index = index
         self.type = type
 
@@ -37,7 +65,10 @@ class FuncArgAnalyzeNode(AnalyzeNode):
         )
 
 class ConstantAnalyzeNode(AnalyzeNode):
+    __slots__ = ("index", "const_table")
+
     def __init__(self, index, const_table):
+        super(ConstantAnalyzeNode, self).__init__()
         self.index = index
         self.const_table = const_table
 
@@ -49,19 +80,30 @@ class ConstantAnalyzeNode(AnalyzeNode):
         )
 
 class FuncCallAnalyzeNode(AnalyzeNode):
+    __slots__ = ("function", "args", "is_tail_call")
+
     def __init__(self, function, args):
+        super(FuncCallAnalyzeNode, self).__init__()
         self.function = function
         self.args = args
 
+        # Whether the call is in a tail position of a function body, so its
+        # result is the result of the function.
+        self.is_tail_call = False
+
     def to_dict(self):
         return dict(
             type = "FuncCallAnalyzeNode",
             function = self.function.name,
-            args = [arg.to_dict() for arg in self.args]
+            args = [arg.to_dict() for arg in self.args],
+            is_tail_call = self.is_tail_call
         )
 
 class ConditionalAnalyzeNode(AnalyzeNode):
+    __slots__ = ("condition", "on_true", "on_false")
+
     def __init__(self, condition, on_true, on_false):
+        super(ConditionalAnalyzeNode, self).__init__()
         self.condition = condition
         self.on_true = on_true
         self.on_false = on_false
@@ -1,6 +1,6 @@
-from itertools import chain
+from upl.call_graph import mark_tail_calls
 from upl.token import TokenType, Token
-from upl.parse_nodes import ProgramNode, DeclNode, FuncDefNode, BoolLiteralNode,\
+from upl.parse_nodes import DeclNode, FuncDefNode, BoolLiteralNode,\
                             IntLiteralNode, RealLiteralNode, FuncCallNode,\
                             BinaryOperationNode, UnaryOperationNode,\
                             IdentifierNode, ExpressionNode, ConditionalNode
@@ -8,6 +8,16 @@ from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode,\
                                        FuncArgAnalyzeNode, ConstantAnalyzeNode,\
                                        FuncCallAnalyzeNode, ConditionalAnalyzeNode
 from upl.exceptions import SemanticAnalyzerException
+from upl.constant_pool import ConstantPool
+from upl.symbol_table import SymbolTable
+from upl.visitor import NodeDispatcher
+
+
+def ignore_node(analyzer, node, *args):
+    """
+    Handler for the nodes which the analyzer does not handle.
+    """
+    return None
 
 
 class SemanticAnalyzer(object):
@@ -54,9 +64,10 @@ class SemanticAnalyzer(object):
         self.func_defs = self.get_func_defs(self.parse_tree,
                                             self.external_functions)
         
-        # Create a unique list of constants.
-        self.consts = self.get_consts(self.parse_tree)
-        self.consts = list(set(self.consts))
+        # Constants are added to the pool as the literals are analyzed, in
+        # the order they appear in.
+        self.constant_pool = ConstantPool()
+        self.consts = self.constant_pool.constants
 
         # Initialize symbol table.
         symtab = self.initialize_symtab(self.func_defs)
@@ -72,12 +83,20 @@ class SemanticAnalyzer(object):
     def get_func_defs(self, node, external_functions):
         """
         Returns a list of all functions in the given parse tree, pluse the
-        given list of external functions.
+        given list of external functions. It also builds the overload index
+        which resolve_function() uses.
 
         This function raises a SemanticAnalyzerException if there are two
         functions with the same signature.
         """
         func_defs = list(external_functions)
+
+        # Maps function names to dicts from argument type tuples to function
+        # definitions. The first definition of a signature wins.
+        self.overloads = {}
+        for func_def in func_defs:
+            self.add_overload(func_def)
+
         for s in node.statements:
             if isinstance(s, DeclNode) and\
                isinstance(s.expression, FuncDefNode):
@@ -86,64 +105,37 @@ class SemanticAnalyzer(object):
                              for arg in s.expression.arg_list]
                 return_type = self.parse_to_analyze_type(s.expression.return_type)
 
-                try:
-                    self.resolve_function(func_defs, name, arg_types)
-                except SemanticAnalyzerException:
-                    func_def_node = FuncDefAnalyzeNode(name, arg_types,
-                                                       return_type)
-                    func_defs.append(func_def_node)
-                else:
+                if tuple(arg_types) in self.overloads.get(name, {}):
                     raise SemanticAnalyzerException("Duplicate function %s" %\
                                                     (name, ))
 
+                func_def_node = self.make_func_def(name, arg_types,
+                                                   return_type)
+                func_defs.append(func_def_node)
+                self.add_overload(func_def_node)
+
         return func_defs
 
-    def get_consts(self, node):
+    def make_func_def(self, name, arg_types, return_type):
         """
-        Recursively returns list of all constants in the parse tree. The result
-        is a list of (type, value) pairs.
+        Returns the function definition of a function declared in the
+        program, which has no body yet.
         """
-        if isinstance(node, ProgramNode):
-            return list(chain(*[self.get_consts(s) for s in node.statements]))
-
-        elif isinstance(node, DeclNode):
-            return self.get_consts(node.expression)
-
-        elif isinstance(node, FuncDefNode):
-            return list(chain(*[self.get_consts(s) for s in node.statements]))
-        
-        elif isinstance(node, FuncCallNode):
-            return list(chain(*[self.get_consts(s) for s in node.args]))
-        
-        elif isinstance(node, ConditionalNode):
-            return self.get_consts(node.condition) +\
-                   self.get_consts(node.on_true) +\
-                   self.get_consts(node.on_false)
-
-        elif isinstance(node, BinaryOperationNode):
-            return self.get_consts(node.left_operand) +\
-                   self.get_consts(node.right_operand)
-
-        elif isinstance(node, UnaryOperationNode):
-            return self.get_consts(node.operand)
-        
-        elif isinstance(node, BoolLiteralNode):
-            return [(BasicType.Bool, node.value)]
-        
-        elif isinstance(node, IntLiteralNode):
-            return [(BasicType.Int, node.value)]
-        
-        elif isinstance(node, RealLiteralNode):
-            return [(BasicType.Real, node.value)]
+        return FuncDefAnalyzeNode(name, arg_types, return_type)
 
-        else:
-            return []
+    def add_overload(self, func_def):
+        """
+        Adds the given function to the overload index, unless a function with
+        the same signature is already in it.
+        """
+        signatures = self.overloads.setdefault(func_def.name, {})
+        signatures.setdefault(tuple(func_def.arg_types), func_def)
 
     def initialize_symtab(self, func_defs):
         """
         Given function definitions, returns a symbol table. A symbol table is:
 
-          * A dictionary,
+          * A SymbolTable, whose scopes are dictionaries,
           * Keys are names,
           * Values are list of analyze nodes,
           * If a value can contain multiple function definitions with same name
@@ -151,7 +143,7 @@ class SemanticAnalyzer(object):
           * If a value contains something other than a function definition, it
             contains only one item.
         """
-        symtab = {}
+        symtab = SymbolTable()
         for func_def in func_defs:
             if func_def.name not in symtab:
                 symtab[func_def.name] = [func_def]
@@ -168,23 +160,50 @@ class SemanticAnalyzer(object):
                 continue
 
             if isinstance(s.expression, FuncDefNode):
-                arg_types = [self.parse_to_analyze_type(arg.type)\
-                             for arg in s.expression.arg_list]
-                func_def = self.resolve_function(self.func_defs,
-                                                 s.identifier, arg_types)
-                func_body = self.analyze_function_body(s.expression,
-                                                       symtab.copy())
-                func_def.body = func_body
-            elif s.identifier in symtab:
-                raise SemanticAnalyzerException("Duplicate identifier %s"\
-                                                 % (s.identifier, ), s.location)
+                self.analyze_function_decl(s, symtab)
             else:
-                symtab[s.identifier] = [self.analyze_expression(s.expression,
-                                                                symtab.copy())]
+                self.analyze_global_decl(s, symtab)
+
+    def analyze_function_decl(self, node, symtab):
+        """
+        Analyze the body of the given top level function declaration, and
+        store it in its function definition.
+        """
+        func_def = self.get_declared_function(node)
+        func_body = self.analyze_function_body(node.expression, symtab.push())
+        mark_tail_calls(func_body)
+        func_def.body = func_body
+
+    def analyze_global_decl(self, node, symtab):
+        """
+        Analyze the given top level declaration of a value, and add it to the
+        symbol table.
+        """
+        if node.identifier in symtab:
+            raise SemanticAnalyzerException("Duplicate identifier %s"\
+                                             % (node.identifier, ), node.location)
+
+        symtab[node.identifier] = [self.analyze_global_value(node, symtab)]
+
+    def analyze_global_value(self, node, symtab):
+        """
+        Returns the analyzed value of the given top level declaration.
+        """
+        return self.analyze_expression(node.expression, symtab)
+
+    def get_declared_function(self, node):
+        """
+        Returns the function definition of the given function declaration.
+        """
+        arg_types = [self.parse_to_analyze_type(arg.type)\
+                     for arg in node.expression.arg_list]
+        return self.resolve_function(node.identifier, arg_types)
 
     def analyze_function_body(self, node, symtab):
         """
-        Analyze the given function body.
+        Analyze the given function body. The arguments and the local
+        declarations are added to the given symbol table, which should be a
+        new scope.
         """
         if len(node.statements) == 0:
             raise SemanticAnalyzerException("Empty function body", node.location)
@@ -208,12 +227,12 @@ class SemanticAnalyzer(object):
                                                 s.location)
             else:
                 symtab[s.identifier] = [self.analyze_expression(s.expression,
-                                                                symtab.copy())]
+                                                                symtab)]
 
         if not isinstance(node.statements[-1], ExpressionNode):
             raise SemanticAnalyzerException("Return value must be an expression")
 
-        result = self.analyze_expression(node.statements[-1], symtab.copy())
+        result = self.analyze_expression(node.statements[-1], symtab)
         result_type = self.resolve_type(result)
 
         if result_type != self.parse_to_analyze_type(node.return_type):
@@ -223,48 +242,57 @@ class SemanticAnalyzer(object):
 
         return result
 
-    def resolve_function(self, func_defs, name, arg_types):
-        for func_def in func_defs:
-            if (func_def.name, func_def.arg_types) == (name, arg_types):
-                return func_def
-        
-        raise SemanticAnalyzerException("Could not resolve function %s %s" % (name, str(arg_types)))
-
-    def analyze_expression(self, node, symtab):
+    def resolve_function(self, name, arg_types):
         """
-        Analyze the given expression.
+        Returns the function with the given name and argument types from the
+        overload index.
         """
-        if isinstance(node, BoolLiteralNode):
-            return self.analyze_literal(BasicType.Bool, node.value)
+        func_def = self.overloads.get(name, {}).get(tuple(arg_types))
+        if func_def is None:
+            raise SemanticAnalyzerException("Could not resolve function %s %s" % (name, str(arg_types)))
 
-        elif isinstance(node, IntLiteralNode):
-            return self.analyze_literal(BasicType.Int, node.value)
+        return func_def
 
-        elif isinstance(node, RealLiteralNode):
-            return self.analyze_literal(BasicType.Real, node.value)
+    # Analyze the given expression. Statements which are not expressions
+    # analyze to None.
+    analyze_expression = NodeDispatcher("analyze_expression",
+                                        default=ignore_node)
 
-        elif isinstance(node, IdentifierNode):
-            return self.analyze_identifier(node.name, symtab)
+    @analyze_expression.register(BoolLiteralNode)
+    def analyze_bool_literal(self, node, symtab):
+        return self.analyze_literal(BasicType.Bool, node.value)
 
-        elif isinstance(node, FuncCallNode):
-            return self.analyze_func_call(node.name, node.args, symtab)
+    @analyze_expression.register(IntLiteralNode)
+    def analyze_int_literal(self, node, symtab):
+        return self.analyze_literal(BasicType.Int, node.value)
 
-        elif isinstance(node, BinaryOperationNode):
-            args = [node.left_operand, node.right_operand]
-            return self.analyze_func_call(node.operator, args, symtab)
+    @analyze_expression.register(RealLiteralNode)
+    def analyze_real_literal(self, node, symtab):
+        return self.analyze_literal(BasicType.Real, node.value)
 
-        elif isinstance(node, UnaryOperationNode):
-            args = [node.operand]
-            return self.analyze_func_call(node.operator, args, symtab)
+    @analyze_expression.register(IdentifierNode)
+    def analyze_identifier_node(self, node, symtab):
+        return self.analyze_identifier(node.name, symtab)
 
-        elif isinstance(node, ConditionalNode):
-            return self.analyze_conditional(node, symtab)
+    @analyze_expression.register(FuncCallNode)
+    def analyze_func_call_node(self, node, symtab):
+        return self.analyze_func_call(node.name, node.args, symtab)
+
+    @analyze_expression.register(BinaryOperationNode)
+    def analyze_binary_operation(self, node, symtab):
+        args = [node.left_operand, node.right_operand]
+        return self.analyze_func_call(node.operator, args, symtab)
+
+    @analyze_expression.register(UnaryOperationNode)
+    def analyze_unary_operation(self, node, symtab):
+        args = [node.operand]
+        return self.analyze_func_call(node.operator, args, symtab)
 
     def analyze_literal(self, type, value):
         """
-        Analyze the given constant.
+        Analyze the given constant, and add it to the constant table.
         """
-        return ConstantAnalyzeNode(self.consts.index((type, value)),
+        return ConstantAnalyzeNode(self.constant_pool.add(type, value),
                                    self.consts)
 
     def analyze_identifier(self, name, symtab):
@@ -285,10 +313,11 @@ class SemanticAnalyzer(object):
         """
         analyzed_args = [self.analyze_expression(arg, symtab) for arg in args]
         arg_types = [self.resolve_type(arg) for arg in analyzed_args]
-        resolved_func = self.resolve_function(self.func_defs, name, arg_types)
+        resolved_func = self.resolve_function(name, arg_types)
 
         return FuncCallAnalyzeNode(resolved_func, analyzed_args)
 
+    @analyze_expression.register(ConditionalNode)
     def analyze_conditional(self, node, symtab):
         """
         Analyze the given conditional.
@@ -318,18 +347,21 @@ class SemanticAnalyzer(object):
         elif parse_type == TokenType.KeywordReal:
             return BasicType.Real
 
-    def resolve_type(self, node):
-        """
-        Returns the value type of given analyze node.
-        """
-        if isinstance(node, FuncArgAnalyzeNode):
-            return node.type
+    # Returns the value type of given analyze node.
+    resolve_type = NodeDispatcher("resolve_type", default=ignore_node)
+
+    @resolve_type.register(FuncArgAnalyzeNode)
+    def resolve_arg_type(self, node):
+        return node.type
 
-        elif isinstance(node, ConstantAnalyzeNode):
-            return self.consts[node.index][0]
+    @resolve_type.register(ConstantAnalyzeNode)
+    def resolve_constant_type(self, node):
+        return node.const_table[node.index][0]
 
-        elif isinstance(node, FuncCallAnalyzeNode):
-            return node.function.return_type
+    @resolve_type.register(FuncCallAnalyzeNode)
+    def resolve_call_type(self, node):
+        return node.function.return_type
 
-        elif isinstance(node, ConditionalAnalyzeNode):
-            return self.resolve_type(node.on_true)
+    @resolve_type.register(ConditionalAnalyzeNode)
+    def resolve_conditional_type(self, node):
+        return self.resolve_type(node.on_true)
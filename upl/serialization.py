@@ -0,0 +1,555 @@
+"""
+Compact binary encoding of parse trees and analyzed programs.
+
+Data starts with a header of the magic bytes, the format version and the
+kind of tree it holds. The header is followed by a string table and a flat
+table of integers, both little endian. Integers take 1, 2, 4 or 8 bytes,
+whichever holds the largest value of the table:
+
+  * The string table holds identifiers, operators and literal values once
+    each. Values are stored by their repr, so they load back exactly.
+  * The integer table holds entries of a length followed by that many
+    values. Nodes are written in post-order, so the children of a node
+    always come before it and are referenced by their node index. Every
+    node starts with its tag, and parse nodes follow it with their ID and
+    location.
+
+Shared nodes are written once, so they stay shared when they are loaded.
+"""
+import struct
+import sys
+from array import array
+from upl.token import TokenType
+from upl.parse_nodes import ProgramNode, DeclNode, ConditionalNode,\
+                            FuncDefNode, FuncArgNode, BoolLiteralNode,\
+                            IntLiteralNode, RealLiteralNode, IdentifierNode,\
+                            FuncCallNode, BinaryOperationNode,\
+                            UnaryOperationNode
+from upl.semantic_analyze_nodes import BasicType, FuncDefAnalyzeNode,\
+                                       FuncArgAnalyzeNode, ConstantAnalyzeNode,\
+                                       FuncCallAnalyzeNode,\
+                                       ConditionalAnalyzeNode
+
+MAGIC = b"UPLB"
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct("<4sHB")
+COUNT = struct.Struct("<I")
+
+# Integer tables are stored with the smallest of these types which holds all
+# of their values. They are named by their struct format characters, which
+# have the same size everywhere.
+INT_TYPECODES = "bhiq"
+
+
+
+def get_array_typecode(size):
+    """
+    Returns the typecode of the signed integer arrays of the given item size,
+    or None if there is none. "q" arrays are not available before Python 3.3,
+    but "l" arrays hold 8 bytes on most 64 bit platforms.
+    """
+    for typecode in "bhilq":
+        try:
+            if array(typecode).itemsize == size:
+                return typecode
+        except ValueError:
+            pass
+    return None
+
+# Maps the integer types to the array typecodes which hold them here.
+ARRAY_TYPECODES = dict((typecode,
+                        get_array_typecode(struct.calcsize("<" + typecode)))
+                       for typecode in INT_TYPECODES)
+
+
+def array_to_bytes(values):
+    """
+    Returns the bytes of the given array, with the method of this Python.
+    """
+    if hasattr(values, "tobytes"):
+        return values.tobytes()
+    return values.tostring()
+
+
+def array_from_bytes(values, data):
+    """
+    Appends the items in the given bytes to the given array.
+    """
+    if hasattr(values, "frombytes"):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+
+# Kinds of trees
+PARSE_TREE = 0
+ANALYZED_PROGRAM = 1
+
+# Tags of parse nodes
+PROGRAM = 0
+DECL = 1
+CONDITIONAL = 2
+FUNC_DEF = 3
+FUNC_ARG = 4
+BOOL_LITERAL = 5
+INT_LITERAL = 6
+REAL_LITERAL = 7
+IDENTIFIER = 8
+FUNC_CALL = 9
+BINARY_OPERATION = 10
+UNARY_OPERATION = 11
+
+# Tags of analyze nodes
+ANALYZED_CALL = 0
+ANALYZED_CONDITIONAL = 1
+ANALYZED_CONSTANT = 2
+ANALYZED_ARG = 3
+
+# Flags of analyze nodes
+SHARED = 1
+TAIL_CALL = 2
+
+
+class Writer(object):
+    """
+    Writer collects the string table and the integer table of encoded data.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.strings = []
+        self.string_indices = {}
+        # Without an 8 byte array type, a list holds the values instead.
+        typecode = ARRAY_TYPECODES["q"]
+        self.ints = array(typecode) if typecode is not None else []
+        self.node_indices = {}
+
+    def string(self, value):
+        """
+        Returns the index of the given string in the string table.
+        """
+        index = self.string_indices.get(value)
+        if index is None:
+            index = self.string_indices[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def entry(self, *values):
+        """
+        Appends an entry with the given values to the integer table.
+        """
+        self.ints.append(len(values))
+        self.ints.extend(values)
+
+    def node(self, node, *values):
+        """
+        Appends the entry of the given node to the integer table, and returns
+        the index of the node.
+        """
+        self.entry(*values)
+        self.node_indices[node] = len(self.node_indices)
+        return self.node_indices[node]
+
+    def to_bytes(self):
+        """
+        Returns the encoded data.
+        """
+        low = min(self.ints) if self.ints else 0
+        high = max(self.ints) if self.ints else 0
+        for typecode in INT_TYPECODES:
+            limit = 1 << (8 * struct.calcsize("<" + typecode) - 1)
+            if -limit <= low and high < limit:
+                break
+
+        if ARRAY_TYPECODES[typecode] is not None:
+            ints = array(ARRAY_TYPECODES[typecode], self.ints)
+            if sys.byteorder == "big":
+                ints.byteswap()
+            ints = array_to_bytes(ints)
+        else:
+            ints = struct.pack("<%d%s" % (len(self.ints), typecode),
+                               *self.ints)
+
+        lengths = array("I", [len(s) for s in self.strings])
+        if sys.byteorder == "big":
+            lengths.byteswap()
+
+        return b"".join((HEADER.pack(MAGIC, FORMAT_VERSION, self.kind),
+                         COUNT.pack(len(self.strings)),
+                         array_to_bytes(lengths), typecode.encode("ascii"),
+                         COUNT.pack(len(self.ints)), ints,
+                         "".join(self.strings).encode("utf-8")))
+
+
+class Reader(object):
+    """
+    Reader splits encoded data into the string table and the nodes.
+    """
+
+    def __init__(self, data, kind):
+        magic, version, data_kind = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not UPL binary data")
+        if version != FORMAT_VERSION:
+            raise ValueError("Unsupported UPL binary format version %d"
+                             % (version, ))
+        if data_kind != kind:
+            raise ValueError("UPL binary data holds a different kind of tree")
+
+        offset = HEADER.size
+        lengths, offset = self.read_array("I", data, offset)
+        typecode = data[offset:offset + 1].decode("ascii")
+        if len(typecode) != 1 or typecode not in INT_TYPECODES:
+            raise ValueError("Invalid UPL binary integer type")
+        ints, offset = self.read_array(typecode, data, offset + 1)
+        text = data[offset:].decode("utf-8")
+        if len(text) != sum(lengths):
+            raise ValueError("Truncated UPL binary data")
+
+        self.strings = []
+        start = 0
+        for length in lengths:
+            self.strings.append(text[start:start + length])
+            start += length
+
+        self.ints = ints
+
+    def read_array(self, typecode, data, offset):
+        """
+        Returns the array of the given type stored at the given offset, and
+        the offset after it.
+        """
+        count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+
+        end = offset + count * struct.calcsize("<" + typecode)
+        if end > len(data):
+            raise ValueError("Truncated UPL binary data")
+
+        array_typecode = ARRAY_TYPECODES.get(typecode, typecode)
+        if array_typecode is None:
+            values = list(struct.unpack_from("<%d%s" % (count, typecode),
+                                             data, offset))
+            return values, end
+
+        values = array(array_typecode)
+        array_from_bytes(values, data[offset:end])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values, end
+
+    def iter_entries(self):
+        """
+        Yields the values of every entry in the integer table.
+        """
+        ints = self.ints
+        position = 0
+        while position < len(ints):
+            count = ints[position]
+            yield ints[position + 1:position + 1 + count]
+            position += 1 + count
+
+
+def dump_parse_tree(program):
+    """
+    Returns the binary encoding of the given ProgramNode.
+    """
+    writer = Writer(PARSE_TREE)
+
+    def dump(node):
+        if node in writer.node_indices:
+            return writer.node_indices[node]
+
+        row, col = node.location
+        node_id = -1 if node.id is None else node.id
+        if isinstance(node, ProgramNode):
+            statements = [dump(s) for s in node.statements]
+            return writer.node(node, PROGRAM, node_id, row, col, *statements)
+
+        elif isinstance(node, DeclNode):
+            expression = dump(node.expression)
+            return writer.node(node, DECL, node_id, row, col,
+                               node.declarator.value,
+                               writer.string(node.identifier), expression)
+
+        elif isinstance(node, ConditionalNode):
+            condition = dump(node.condition)
+            on_true = dump(node.on_true)
+            on_false = dump(node.on_false)
+            return writer.node(node, CONDITIONAL, node_id, row, col,
+                               condition, on_true, on_false)
+
+        elif isinstance(node, FuncDefNode):
+            args = [dump(arg) for arg in node.arg_list]
+            statements = [dump(s) for s in node.statements]
+            return writer.node(node, FUNC_DEF, node_id, row, col,
+                               node.return_type.value, len(args),
+                               *(args + statements))
+
+        elif isinstance(node, FuncArgNode):
+            return writer.node(node, FUNC_ARG, node_id, row, col,
+                               writer.string(node.name), node.type.value,
+                               node.index)
+
+        elif isinstance(node, BoolLiteralNode):
+            return writer.node(node, BOOL_LITERAL, node_id, row, col,
+                               int(node.value))
+
+        elif isinstance(node, IntLiteralNode):
+            return writer.node(node, INT_LITERAL, node_id, row, col,
+                               writer.string(repr(node.value)))
+
+        elif isinstance(node, RealLiteralNode):
+            return writer.node(node, REAL_LITERAL, node_id, row, col,
+                               writer.string(repr(node.value)))
+
+        elif isinstance(node, IdentifierNode):
+            return writer.node(node, IDENTIFIER, node_id, row, col,
+                               writer.string(node.name))
+
+        elif isinstance(node, FuncCallNode):
+            args = [dump(arg) for arg in node.args]
+            return writer.node(node, FUNC_CALL, node_id, row, col,
+                               writer.string(node.name), *args)
+
+        elif isinstance(node, BinaryOperationNode):
+            left_operand = dump(node.left_operand)
+            right_operand = dump(node.right_operand)
+            return writer.node(node, BINARY_OPERATION, node_id, row, col,
+                               writer.string(node.operator), left_operand,
+                               right_operand)
+
+        elif isinstance(node, UnaryOperationNode):
+            operand = dump(node.operand)
+            return writer.node(node, UNARY_OPERATION, node_id, row, col,
+                               writer.string(node.operator), operand)
+
+        else:
+            raise ValueError("Cannot dump %s" % (type(node).__name__, ))
+
+    dump(program)
+    return writer.to_bytes()
+
+
+def load_parse_tree(data):
+    """
+    Returns the ProgramNode encoded in the given data by dump_parse_tree().
+    Raises ValueError if the data is not a valid encoding.
+    """
+    try:
+        reader = Reader(data, PARSE_TREE)
+        strings = reader.strings
+        nodes = []
+
+        for values in reader.iter_entries():
+            tag, node_id = values[0], values[1]
+            location = (values[2], values[3])
+
+            if tag == PROGRAM:
+                node = ProgramNode(location, [nodes[i] for i in values[4:]])
+            elif tag == DECL:
+                node = DeclNode(location, TokenType(values[4]),
+                                strings[values[5]], nodes[values[6]])
+            elif tag == CONDITIONAL:
+                node = ConditionalNode(location, nodes[values[4]],
+                                       nodes[values[5]], nodes[values[6]])
+            elif tag == FUNC_DEF:
+                arg_count = values[5]
+                node = FuncDefNode(location,
+                                   [nodes[i] for i in values[6:6 + arg_count]],
+                                   TokenType(values[4]),
+                                   [nodes[i] for i in values[6 + arg_count:]])
+            elif tag == FUNC_ARG:
+                node = FuncArgNode(location, strings[values[4]],
+                                   TokenType(values[5]), values[6])
+            elif tag == BOOL_LITERAL:
+                node = BoolLiteralNode(location, bool(values[4]))
+            elif tag == INT_LITERAL:
+                node = IntLiteralNode(location, int(strings[values[4]]))
+            elif tag == REAL_LITERAL:
+                node = RealLiteralNode(location, float(strings[values[4]]))
+            elif tag == IDENTIFIER:
+                node = IdentifierNode(location, strings[values[4]])
+            elif tag == FUNC_CALL:
+                node = FuncCallNode(location, strings[values[4]],
+                                    [nodes[i] for i in values[5:]])
+            elif tag == BINARY_OPERATION:
+                node = BinaryOperationNode(location, strings[values[4]],
+                                           nodes[values[5]], nodes[values[6]])
+            elif tag == UNARY_OPERATION:
+                node = UnaryOperationNode(location, strings[values[4]],
+                                          nodes[values[5]])
+            else:
+                raise ValueError("Unknown parse node tag %d" % (tag, ))
+
+            if node_id >= 0:
+                node.id = node_id
+            nodes.append(node)
+
+        # The program is written last.
+        if not nodes or not isinstance(nodes[-1], ProgramNode):
+            raise ValueError("UPL binary data holds no program")
+        return nodes[-1]
+
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid UPL binary data: %s" % (e, ))
+
+
+def dump_analyzed(consts, func_defs):
+    """
+    Returns the binary encoding of the output of SemanticAnalyzer.analyze().
+
+    Calls reference functions of the program by their index, and external
+    functions by their signature.
+    """
+    writer = Writer(ANALYZED_PROGRAM)
+    function_refs = dict((func_def, i) for i, func_def in enumerate(func_defs))
+    externals = []
+
+    def dump_signature(func_def):
+        return [writer.string(func_def.name), func_def.return_type.value,
+                len(func_def.arg_types)] +\
+               [arg_type.value for arg_type in func_def.arg_types]
+
+    def dump(node):
+        if node in writer.node_indices:
+            return writer.node_indices[node]
+
+        flags = SHARED if node.shared else 0
+        if isinstance(node, FuncCallAnalyzeNode):
+            args = [dump(arg) for arg in node.args]
+            if node.function not in function_refs:
+                # External functions get negative references.
+                externals.append(node.function)
+                function_refs[node.function] = -len(externals)
+            if node.is_tail_call:
+                flags |= TAIL_CALL
+            return writer.node(node, ANALYZED_CALL, flags,
+                               function_refs[node.function], *args)
+
+        elif isinstance(node, ConditionalAnalyzeNode):
+            condition = dump(node.condition)
+            on_true = dump(node.on_true)
+            on_false = dump(node.on_false)
+            return writer.node(node, ANALYZED_CONDITIONAL, flags, condition,
+                               on_true, on_false)
+
+        elif isinstance(node, ConstantAnalyzeNode):
+            return writer.node(node, ANALYZED_CONSTANT, flags, node.index)
+
+        elif isinstance(node, FuncArgAnalyzeNode):
+            return writer.node(node, ANALYZED_ARG, flags, node.index,
+                               node.type.value)
+
+        else:
+            raise ValueError("Cannot dump %s" % (type(node).__name__, ))
+
+    bodies = [dump(func_def.body) for func_def in func_defs]
+
+    # The constant, function and external function tables follow the nodes,
+    # and the last entry holds their sizes.
+    for value_type, value in consts:
+        writer.entry(value_type.value, writer.string(repr(value)))
+    for func_def, body in zip(func_defs, bodies):
+        writer.entry(body, *dump_signature(func_def))
+    for func_def in externals:
+        writer.entry(*dump_signature(func_def))
+    writer.entry(len(consts), len(func_defs), len(externals))
+
+    return writer.to_bytes()
+
+
+def load_analyzed(data, external_functions):
+    """
+    Returns the constant table and the function definitions encoded in the
+    given data by dump_analyzed(). External functions are looked up by their
+    signature in the given list.
+
+    Raises ValueError if the data is not a valid encoding, or if it calls an
+    external function which is not in the list.
+    """
+    try:
+        reader = Reader(data, ANALYZED_PROGRAM)
+        strings = reader.strings
+        entries = list(reader.iter_entries())
+        const_count, function_count, external_count = entries.pop()
+
+        def load_signature(values):
+            name, return_type, arg_count = values[:3]
+            return (strings[name],
+                    tuple(BasicType(t) for t in values[3:3 + arg_count]),
+                    BasicType(return_type))
+
+        table_start = len(entries) - const_count - function_count -\
+                      external_count
+        if table_start < 0:
+            raise ValueError("Truncated UPL binary data")
+
+        const_entries = entries[table_start:table_start + const_count]
+        function_entries = entries[table_start + const_count:
+                                   table_start + const_count + function_count]
+        external_entries = entries[table_start + const_count + function_count:]
+
+        consts = []
+        for value_type, value in const_entries:
+            value_type = BasicType(value_type)
+            value = strings[value]
+            if value_type == BasicType.Bool:
+                consts.append((value_type, value == "True"))
+            elif value_type == BasicType.Int:
+                consts.append((value_type, int(value)))
+            else:
+                consts.append((value_type, float(value)))
+
+        func_defs = []
+        for values in function_entries:
+            name, arg_types, return_type = load_signature(values[1:])
+            func_defs.append(FuncDefAnalyzeNode(name, list(arg_types),
+                                                return_type))
+
+        # The analyzer resolves calls to the first of several functions with
+        # the same signature, so that is the one calls are bound to.
+        signatures = {}
+        for f in external_functions:
+            signatures.setdefault((f.name, tuple(f.arg_types), f.return_type),
+                                  f)
+        externals = []
+        for values in external_entries:
+            signature = load_signature(values)
+            if signature not in signatures:
+                raise ValueError("Unknown external function %s %s"
+                                 % (signature[0], list(signature[1])))
+            externals.append(signatures[signature])
+
+        nodes = []
+        for values in entries[:table_start]:
+            tag, flags = values[0], values[1]
+
+            if tag == ANALYZED_CALL:
+                ref = values[2]
+                function = func_defs[ref] if ref >= 0 else externals[-ref - 1]
+                node = FuncCallAnalyzeNode(function,
+                                           [nodes[i] for i in values[3:]])
+                node.is_tail_call = bool(flags & TAIL_CALL)
+            elif tag == ANALYZED_CONDITIONAL:
+                node = ConditionalAnalyzeNode(nodes[values[2]],
+                                              nodes[values[3]],
+                                              nodes[values[4]])
+            elif tag == ANALYZED_CONSTANT:
+                node = ConstantAnalyzeNode(values[2], consts)
+            elif tag == ANALYZED_ARG:
+                node = FuncArgAnalyzeNode(values[2], BasicType(values[3]))
+            else:
+                raise ValueError("Unknown analyze node tag %d" % (tag, ))
+
+            if flags & SHARED:
+                node.shared = True
+            nodes.append(node)
+
+        for func_def, values in zip(func_defs, function_entries):
+            func_def.body = nodes[values[0]]
+
+        return consts, func_defs
+
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid UPL binary data: %s" % (e, ))
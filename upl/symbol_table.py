@@ -0,0 +1,45 @@
+class SymbolTable(object):
+    """
+    SymbolTable is a scope of the symbol table used by the semantic analyzer.
+    It maps names to lists of analyze nodes like a dictionary, and looks up
+    names which it does not define in its parent scopes.
+
+    Opening a scope with push() creates an empty child, so it takes constant
+    time however many symbols the outer scopes hold. Names are only added to
+    the innermost scope, and a scope is closed by dropping it, or with pop().
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.symbols = {}
+
+    def __contains__(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.symbols:
+                return True
+            scope = scope.parent
+        return False
+
+    def __getitem__(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.symbols:
+                return scope.symbols[name]
+            scope = scope.parent
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        self.symbols[name] = value
+
+    def push(self):
+        """
+        Returns a new scope whose parent is this scope.
+        """
+        return SymbolTable(self)
+
+    def pop(self):
+        """
+        Returns the parent of this scope.
+        """
+        return self.parent
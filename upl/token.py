@@ -38,3 +38,37 @@ class Token:
             return "%s, %s" % (str(self.type), self.value)
         else:
             return str(self.type)
+
+
+class TokenWindow(object):
+    """
+    A read-only view of tokens[start:stop] which doesn't copy the tokens.
+    Slicing a window returns another window over the same list, so the parser
+    can pass sub-ranges around at constant cost.
+    """
+    def __init__(self, tokens, start=0, stop=None):
+        self.tokens = tokens
+        self.start = start
+        self.stop = len(tokens) if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.stop - self.start)
+            if step != 1:
+                raise ValueError("TokenWindow doesn't support slice steps")
+            return TokenWindow(self.tokens, self.start + start,
+                               self.start + max(start, stop))
+
+        if key < 0:
+            key += self.stop - self.start
+        if key < 0 or key >= self.stop - self.start:
+            raise IndexError("TokenWindow index out of range")
+        return self.tokens[self.start + key]
+
+    def __iter__(self):
+        tokens = self.tokens
+        for i in range(self.start, self.stop):
+            yield tokens[i]
@@ -0,0 +1,76 @@
+from types import MethodType
+
+
+class NodeDispatcher(object):
+    """
+    NodeDispatcher chooses the method which handles a node by the class of
+    the node, with one dict lookup instead of a chain of isinstance() checks.
+
+    Methods are registered with the register() decorator in a class body:
+
+        class Printer(object):
+            print_node = NodeDispatcher("print_node")
+
+            @print_node.register(IntLiteralNode, RealLiteralNode)
+            def print_number(self, node):
+                ...
+
+    Calling print_node(node) on an instance calls the method registered for
+    the class of the node, or for its nearest registered base class. If there
+    is none, the default is called with the same arguments, and if there is no
+    default either, a TypeError is raised.
+
+    Handlers are looked up by name on the class of the instance, so a
+    subclass which overrides a registered method gets its own version called.
+    """
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+        self.handlers = {}
+        self.resolved = {}
+
+    def register(self, *node_types):
+        """
+        Returns a decorator which registers a method for the given node
+        classes. The method is returned unchanged.
+        """
+        def decorator(handler):
+            for node_type in node_types:
+                self.handlers[node_type] = handler.__name__
+            self.resolved.clear()
+            return handler
+        return decorator
+
+    def get_handler(self, owner, node_type):
+        """
+        Returns the function which handles nodes of the given class for
+        instances of the given class.
+        """
+        key = (owner, node_type)
+        handler = self.resolved.get(key)
+        if handler is None:
+            for base in node_type.__mro__:
+                if base in self.handlers:
+                    handler = getattr(owner, self.handlers[base])
+                    break
+            else:
+                if self.default is None:
+                    raise TypeError("%s cannot handle %s"
+                                    % (self.name, node_type.__name__))
+                handler = self.default
+            self.resolved[key] = handler
+        return handler
+
+    def __call__(self, instance, node, *args):
+        """
+        Calls the handler of the given node as a method of the given instance.
+        """
+        key = (type(instance), type(node))
+        handler = self.resolved.get(key) or self.get_handler(*key)
+        return handler(instance, node, *args)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return MethodType(self, instance)